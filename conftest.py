@@ -3,7 +3,10 @@ import multiprocessing
 import os
 import pathlib
 import queue
+import threading
 from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
 
 import ckanapi
 import pytest
@@ -14,10 +17,11 @@ from tests.ckool.data.inputs.ckan_entity_data import (
     resource_data,
 )
 
-from ckool import HashTypes
+from ckool import USER_CACHE_FOLDER_ENV_VARIABLE, HashTypes
 from ckool.ckan.ckan import CKAN
 from ckool.ckan.upload import upload_resource
 from ckool.datacite.datacite import DataCiteAPI
+from ckool.interfaces.http_cache import HttpCache
 
 ckan_instance_names_of_fixtures = [
     pytest.param(
@@ -104,6 +108,14 @@ def pytest_collection_modifyitems(config, items):
             item.add_marker(skip_open)
 
 
+@pytest.fixture(autouse=True)
+def user_cache_folder(tmp_path_factory, monkeypatch):
+    """Keeps the indices and caches written by the tests out of the home directory."""
+    folder = tmp_path_factory.mktemp("user-cache")
+    monkeypatch.setenv(USER_CACHE_FOLDER_ENV_VARIABLE, folder.as_posix())
+    return folder
+
+
 @pytest.fixture
 def data_directory():
     return (
@@ -588,6 +600,136 @@ def cache_file(tmp_path):
     return tmp_path / "cache.json"
 
 
+@pytest.fixture
+def http_cache(tmp_path, data_directory, monkeypatch):
+    """HTTP cache in tmp_path, pre-filled with the recorded responses of 'http_responses.json'."""
+    cache = HttpCache(tmp_path / "http-cache.sqlite")
+    with (data_directory / "http_responses.json").open() as f:
+        for response in json.load(f):
+            cache.record(**response)
+    monkeypatch.setattr("ckool.interfaces.http_cache.HTTP_CACHE", cache)
+    return cache
+
+
+class MockDataCite(ThreadingHTTPServer):
+    """
+    Minimal local stand-in for the DataCite REST API (/dois and /dois/<doi>).
+    failures: {doi: [status codes]} are answered (in order) before a request for the doi succeeds.
+    """
+
+    request_queue_size = 64
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), MockDataCiteHandler)
+        self.dois = {}
+        self.failures = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+
+class MockDataCiteHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/vnd.api+json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        url = urlparse(self.path)
+        doi = unquote(url.path.removeprefix("/dois").lstrip("/")).upper()
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length)) if length else None
+        if not doi and method == "POST":
+            doi = body["data"]["attributes"]["doi"].upper()
+        server = self.server
+        with server.lock:
+            server.requests.append((method, doi or None))
+            if failures := server.failures.get(doi):
+                status = failures.pop(0)
+                return self._send(status, {}, {"Retry-After": "0"})
+            if not doi and method == "GET":
+                query = parse_qs(url.query)
+                size = int(query.get("page[size]", ["1000"])[0])
+                number = int(query.get("page[number]", ["1"])[0])
+                dois = sorted(server.dois)[(number - 1) * size : number * size]
+                return self._send(
+                    200,
+                    {
+                        "data": [{"id": d.lower(), "type": "dois"} for d in dois],
+                        "meta": {"total": len(server.dois)},
+                        "links": {},
+                    },
+                )
+            if method == "POST":
+                if doi in server.dois:
+                    return self._send(
+                        422,
+                        {
+                            "errors": [
+                                {
+                                    "source": "doi",
+                                    "title": "This DOI has already been taken",
+                                }
+                            ]
+                        },
+                    )
+                server.dois[doi] = {"doi": doi.lower(), "state": "draft"}
+                return self._send(
+                    201, {"data": {"id": doi.lower(), "attributes": server.dois[doi]}}
+                )
+            if doi not in server.dois:
+                return self._send(404, {"errors": [{"title": "not found"}]})
+            if method == "PUT":
+                server.dois[doi].update(body["data"]["attributes"])
+            if method == "DELETE":
+                del server.dois[doi]
+                return self._send(204)
+            return self._send(
+                200, {"data": {"id": doi.lower(), "attributes": server.dois[doi]}}
+            )
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+@pytest.fixture
+def mock_datacite(tmp_path, monkeypatch):
+    """A DataCiteAPI talking to a local MockDataCite server, retries do not wait."""
+    monkeypatch.setattr("ckool.datacite.datacite.DATACITE_BACKOFF_FACTOR", 0)
+    server = MockDataCite()
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    server.api = DataCiteAPI(
+        host=f"http://127.0.0.1:{server.server_port}/",
+        prefix="10.5524",
+        user="user",
+        password="password",
+        registry_cache_file=tmp_path / "registry.json",
+        timeout=5,
+    )
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
 @pytest.fixture()
 def local_structure_doi(tmp_path):
     (tmp_path / "strange-file").touch()
@@ -1,5 +1,6 @@
-import time
+import pathlib
 
+from ckool.ckan.bulk import bulk_patch
 from ckool.ckan.ckan import CKAN
 
 if __name__ == "__main__":
@@ -9,24 +10,14 @@ if __name__ == "__main__":
         verify_certificate=True,
     )
 
-    packages = ckan.get_all_packages()["results"]
+    to_fix = [
+        {"id": pkg["id"], "patch": {"spatial": ""}, "type": "package"}
+        for pkg in ckan.iter_all_packages()
+        if pkg["spatial"] == "{}"
+    ]
+    print(f"{len(to_fix)} packages to fix")
 
-    to_fix = []
-    for pkg in packages:
-        if pkg["spatial"] == "{}":
-            to_fix.append(
-                {"id": pkg["id"], "name": pkg["name"], "spatial": pkg["spatial"]}
-            )
-    len_fixes = len(to_fix)
-    for i, fix in enumerate(to_fix):
-        try:
-            print(f"{i}/{len_fixes}", fix)
-            time.sleep(0.3)
-            ckan.patch_package_metadata(package_id=fix["id"], data={"spatial": ""})
-
-        except Exception:
-            print(fix)
-            raise
-
-    print("FIXED")
-    print(to_fix)
+    result = bulk_patch(
+        ckan, to_fix, pathlib.Path("fix_all_spatial_strings.progress"), rate=3
+    )
+    print("FIXED", result)
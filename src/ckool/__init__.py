@@ -11,14 +11,87 @@ LOGGER = MainLogger()
 HASH_TYPE = HashTypes.sha256
 HASH_BLOCK_SIZE = 65536
 COMPRESSION_TYPE = CompressionTypes.zip
+ALREADY_COMPRESSED_SUFFIXES = (
+    ".zip",
+    ".gz",
+    ".tgz",
+    ".bz2",
+    ".xz",
+    ".zst",
+    ".7z",
+    ".rar",
+    ".nc",
+    ".h5",
+    ".hdf5",
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".gif",
+    ".mp3",
+    ".mp4",
+    ".mov",
+    ".avi",
+    ".mkv",
+    ".parquet",
+    ".docx",
+    ".xlsx",
+    ".pptx",
+)
+COMPRESSIBILITY_PROBE_SIZE = 65536
+COMPRESSIBILITY_THRESHOLD = 0.9
+PARALLEL_ZIP_MAX_MEMBER_SIZE = 256 * 1024**2
 OVERWRITE_FILE_STATS = True
 DOWNLOAD_CHUNK_SIZE = 8192
 PACKAGE_META_DATA_FILE_ENDING = ".json.meta"
-PUBLICATION_INTEGRITY_CHECK_CACHE = "integrity-check-cache.json"
+ARCHIVE_MANIFEST_FILE_ENDING = ".json.manifest"
+BUNDLE_ARCHIVE_NAME = "bundled-small-files"
+BUNDLE_INDEX_FILE_NAME = "bundle-index.csv"
+PUBLICATION_INTEGRITY_CHECK_CACHE = "integrity-check-cache.sqlite"
+CACHE_DATABASE_SUFFIXES = (".sqlite", ".db")
+CACHE_DATABASE_TIMEOUT = 60
+CORRUPT_CACHE_FILE_ENDING = ".corrupt"
+TEMPORARY_WRITE_FILE_ENDING = ".tmp-write"
 UPLOAD_FUNC_FACTOR = 4.8
 UPLOAD_IN_PROGRESS_STRING = "-- scp overwrite in progress --"
+UPLOAD_JOURNAL_FILE_PREFIX = ".upload-journal-"
+METADATA_MIRROR_FILE_PREFIX = "mirror-"
+METADATA_MIRROR_SAFETY_MARGIN_SECONDS = 300
+BULK_PATCH_MAX_RETRIES = 5
+BULK_PATCH_BACKOFF_SECONDS = 1.0
+BULK_PATCH_PROGRESS_FILE_ENDING = ".progress"
 
-LOCAL_DOI_STORE_FOLDERS_TO_IGNORE = (".git",)
+USER_CACHE_FOLDER_NAME = ".ckool-cache"
+USER_CACHE_FOLDER_ENV_VARIABLE = "CKOOL_CACHE_FOLDER"  # overrides ~/.ckool-cache
+HTTP_CACHE_FILE_NAME = "http-cache.sqlite"
+HTTP_CACHE_TTLS = {  # seconds, per source
+    "citation": 30 * 24 * 3600,
+    "doi": 7 * 24 * 3600,
+    "orcid": 24 * 3600,
+    "dora": 24 * 3600,
+    "url": 3600,
+}
+HTTP_CACHE_DEFAULT_TTL = 3600
+HTTP_CACHE_NEGATIVE_TTL = 600
+
+DATACITE_MAX_PAGED_RECORDS = 10000
+DATACITE_REQUEST_TIMEOUT = 30.0
+DATACITE_MAX_RETRIES = 5
+DATACITE_BACKOFF_FACTOR = (
+    1.0  # the first retry is immediate, then it waits 2, 4, 8, ... seconds
+)
+DATACITE_CONNECTION_POOL_SIZE = 16
+DATACITE_REGISTRY_CACHE_FILE_PREFIX = "datacite-registry-"
+DATACITE_REGISTRY_REFRESH_OVERLAP_SECONDS = 3600
+DATACITE_DOI_TAKEN_MESSAGE = "has already been taken"  # in the 422 response body
+DOI_LEDGER_FILE_PREFIX = "doi-ledger-"
+DOI_LEDGER_SYNC_INTERVAL_SECONDS = 24 * 3600
+
+LOCAL_DOI_STORE_INDEX_FOLDER = ".ckool"
+LOCAL_DOI_STORE_INDEX_FILE_PREFIX = "doi-store-index-"
+LOCAL_DOI_STORE_AUDIT_CACHE_FILE_PREFIX = "doi-store-audit-"
+LOCAL_DOI_STORE_AUTHOR_ORCID_INDEX_FILE_PREFIX = "author-orcid-index-"
+LOCAL_DOI_STORE_ORCID_SEARCH_TTL = 30 * 24 * 3600  # seconds
+LOCAL_DOI_STORE_FOLDERS_TO_IGNORE = (".git", LOCAL_DOI_STORE_INDEX_FOLDER)
 LOCAL_DOI_STORE_DOI_FILE_NAME = "doi.txt"
 LOCAL_DOI_STORE_AFFILIATION_FILE_NAME = "affiliations.json"
 LOCAL_DOI_STORE_ORCIDS_FILE_NAME = "orcids.json"
@@ -3,8 +3,9 @@ import pathlib
 import typer
 from rich.prompt import Prompt
 
-from ckool import LOGGER
+from ckool import BUNDLE_ARCHIVE_NAME, LOGGER
 from ckool.api import (
+    _audit_doi_store,
     _delete_package,
     _delete_resource,
     _download_all_metadata,
@@ -13,6 +14,7 @@ from ckool.api import (
     _download_resource,
     _get_local_resource_location,
     _patch_all_resource_hashes_in_package,
+    _patch_bulk,
     _patch_datacite,
     _patch_metadata,
     _patch_package,
@@ -24,6 +26,9 @@ from ckool.api import (
     _publish_organization,
     _publish_package,
     _publish_project,
+    _render_all_metadata,
+    _reserve_dois,
+    _sync_metadata,
     _upload_package,
     _upload_resource,
 )
@@ -100,6 +105,27 @@ app.add_typer(
     help="Publish an organization, project or a data package.",
 )
 
+doi_store_app = typer.Typer()
+app.add_typer(
+    doi_store_app,
+    name="doi-store",
+    help="Inspect the local doi store.",
+)
+
+datacite_app = typer.Typer()
+app.add_typer(
+    datacite_app,
+    name="datacite",
+    help="Render and register the DataCite metadata of the local doi store.",
+)
+
+sync_app = typer.Typer()
+app.add_typer(
+    sync_app,
+    name="sync",
+    help="Keep a local copy of the metadata of a ckan instance up to date.",
+)
+
 
 @create_app.callback()
 @get_app.callback()
@@ -107,6 +133,9 @@ app.add_typer(
 @prepare_app.callback()
 @publish_app.callback()
 @delete_app.callback()
+@sync_app.callback()
+@doi_store_app.callback()
+@datacite_app.callback()
 def main(
     config_file: str = typer.Option(
         get_default_conf_location().as_posix(), "-c", "--config-file"
@@ -209,6 +238,35 @@ def prepare_package(
         "-ip",
         help="If the resource had already been prepared, should the previous work be ignored?",
     ),
+    adaptive_compression: bool = typer.Option(
+        False,
+        "--adaptive-compression",
+        "-ac",
+        help="Only compress files that are likely to shrink. Already compressed files "
+        "(zip, gz, nc, h5, jpg, mp4, ...) are stored as they are, which saves a lot of CPU time.",
+    ),
+    compression_workers: int = typer.Option(
+        1,
+        "--compression-workers",
+        "-cw",
+        help="How many threads read and compress the members of a single zip archive. "
+        "Only members selected by --adaptive-compression are compressed, the archive content is the same for any number of workers. "
+        "Has no effect for tar archives.",
+    ),
+    max_archive_size: str = typer.Option(
+        None,
+        "--max-archive-size",
+        "-mas",
+        help="Split folders that are larger than this into multiple archives (name.part001.zip, ...) "
+        "of similar size, e.g. '50GB'. By default, each folder becomes a single archive.",
+    ),
+    bundle_small_files_below: str = typer.Option(
+        None,
+        "--bundle-small-files-below",
+        "-bsf",
+        help="Top-level files smaller than this (e.g. '1MB') are not uploaded one by one, "
+        f"but bundled into a single '{BUNDLE_ARCHIVE_NAME}' archive, together with an index of its members.",
+    ),
 ):
     return _prepare_package(
         package_folder,
@@ -219,6 +277,10 @@ def prepare_package(
         hash_algorithm,
         parallel,
         ignore_prepared,
+        adaptive_compression=adaptive_compression,
+        compression_workers=compression_workers,
+        max_archive_size=max_archive_size,
+        bundle_small_files_below=bundle_small_files_below,
     )
 
 
@@ -285,6 +347,35 @@ def upload_package(
         "-w",
         help="How many workers to run in parallel.",
     ),
+    adaptive_compression: bool = typer.Option(
+        False,
+        "--adaptive-compression",
+        "-ac",
+        help="Only compress files that are likely to shrink. Already compressed files "
+        "(zip, gz, nc, h5, jpg, mp4, ...) are stored as they are, which saves a lot of CPU time.",
+    ),
+    compression_workers: int = typer.Option(
+        1,
+        "--compression-workers",
+        "-cw",
+        help="How many threads read and compress the members of a single zip archive. "
+        "Only members selected by --adaptive-compression are compressed, the archive content is the same for any number of workers. "
+        "Has no effect for tar archives.",
+    ),
+    max_archive_size: str = typer.Option(
+        None,
+        "--max-archive-size",
+        "-mas",
+        help="Split folders that are larger than this into multiple archives (name.part001.zip, ...) "
+        "of similar size, e.g. '50GB'. By default, each folder becomes a single archive.",
+    ),
+    bundle_small_files_below: str = typer.Option(
+        None,
+        "--bundle-small-files-below",
+        "-bsf",
+        help="Top-level files smaller than this (e.g. '1MB') are not uploaded one by one, "
+        f"but bundled into a single '{BUNDLE_ARCHIVE_NAME}' archive, together with an index of its members.",
+    ),
 ):
     return _upload_package(
         package_name,
@@ -301,6 +392,10 @@ def upload_package(
         OPTIONS["ckan-instance-name"],
         OPTIONS["verify"],
         OPTIONS["test"],
+        adaptive_compression=adaptive_compression,
+        compression_workers=compression_workers,
+        max_archive_size=max_archive_size,
+        bundle_small_files_below=bundle_small_files_below,
     )
 
 
@@ -440,6 +535,18 @@ def get_all_metadata(
         "-ip",
         help="Also return private packages.",
     ),
+    output_file: str = typer.Option(
+        None,
+        "--output-file",
+        "-o",
+        help="File to write the metadata to, one package per line (NDJSON). Default is stdout.",
+    ),
+    workers: int = typer.Option(
+        4,
+        "--workers",
+        "-w",
+        help="How many pages of packages are requested concurrently.",
+    ),
 ):
     return _download_all_metadata(
         include_private,
@@ -447,6 +554,125 @@ def get_all_metadata(
         OPTIONS["ckan-instance-name"],
         OPTIONS["verify"],
         OPTIONS["test"],
+        output_file=output_file,
+        workers=workers,
+    )
+
+
+@doi_store_app.command(
+    "audit",
+    help="Validate all doi files of the local doi store and report missing, invalid and duplicate dois.",
+)
+def audit_doi_store(
+    check_datacite: bool = typer.Option(
+        True,
+        "--check-datacite/--no-check-datacite",
+        help="Cross-check the dois of the store with the ones registered at DataCite.",
+    ),
+    workers: int = typer.Option(
+        8, "--workers", "-w", help="How many folders are scanned in parallel."
+    ),
+):
+    return _audit_doi_store(
+        check_datacite,
+        workers,
+        OPTIONS["config"],
+        OPTIONS["ckan-instance-name"],
+        OPTIONS["verify"],
+        OPTIONS["test"],
+    )
+
+
+@datacite_app.command(
+    "render-all",
+    help="Render the DataCite json and xml of all packages of the local doi store from a local metadata snapshot.",
+)
+def render_all_metadata(
+    snapshot: str = typer.Option(
+        None,
+        "--snapshot",
+        "-s",
+        help="Metadata mirror (see 'sync metadata') or newline delimited json (see 'get all_metadata -o'). "
+        "Default is the mirror of the ckan instance.",
+    ),
+    workers: int = typer.Option(
+        4, "--workers", "-w", help="How many packages are rendered in parallel."
+    ),
+    validate: bool = typer.Option(
+        True,
+        "--validate/--no-validate",
+        help="Validate the xml against the DataCite schema before it is written.",
+    ),
+):
+    return _render_all_metadata(
+        snapshot,
+        workers,
+        validate,
+        OPTIONS["config"],
+        OPTIONS["ckan-instance-name"],
+        OPTIONS["verify"],
+        OPTIONS["test"],
+    )
+
+
+@datacite_app.command(
+    "reserve",
+    help="Reserve new dois at DataCite, the dois are taken from the local doi ledger without listing DataCite.",
+)
+def reserve_dois(
+    number: int = typer.Option(
+        1, "--number", "-n", help="How many dois should be reserved."
+    ),
+    offset: int = typer.Option(
+        None,
+        "--offset",
+        "-o",
+        help="Offset of the doi range (0, 2e6, 4e6, ...), default is the one of the config.",
+    ),
+):
+    return _reserve_dois(
+        number,
+        offset,
+        OPTIONS["config"],
+        OPTIONS["ckan-instance-name"],
+        OPTIONS["verify"],
+        OPTIONS["test"],
+    )
+
+
+@sync_app.command(
+    "metadata",
+    help="Sync the metadata of all packages to a local SQLite mirror, only changed packages are requested.",
+)
+def sync_metadata(
+    include_private: bool = typer.Option(
+        False,
+        "--include-private",
+        "-ip",
+        help="Also mirror private packages.",
+    ),
+    database: str = typer.Option(
+        None,
+        "--database",
+        "-db",
+        help="SQLite file of the mirror. "
+        "Default is 'mirror-<production|test>-<ckan-instance>.sqlite' in the user cache folder (~/.ckool-cache).",
+    ),
+    workers: int = typer.Option(
+        4,
+        "--workers",
+        "-w",
+        help="How many pages of packages are requested concurrently.",
+    ),
+):
+    return _sync_metadata(
+        include_private,
+        database,
+        OPTIONS["config"],
+        OPTIONS["ckan-instance-name"],
+        OPTIONS["verify"],
+        OPTIONS["test"],
+        workers=workers,
     )
 
 
@@ -469,6 +695,40 @@ def patch_package(
     )
 
 
+@patch_app.command(
+    "bulk",
+    help="Patch many packages or resources, rate limited and resumable.",
+)
+def patch_bulk(
+    records_file: str = typer.Argument(
+        help='JSONL file, one record per line: {"id": ..., "patch": {...}, "type": "package" | "resource"}.',
+    ),
+    progress_file: str = typer.Option(
+        None,
+        "--progress-file",
+        "-pf",
+        help="File keeping track of the patched records, rerunning the command skips them. "
+        "Default is '<records_file>.progress'.",
+    ),
+    rate: float = typer.Option(
+        5, "--rate", "-r", help="Maximal number of patch calls per second."
+    ),
+    workers: int = typer.Option(
+        4, "--workers", "-w", help="Maximal number of concurrent patch calls."
+    ),
+):
+    return _patch_bulk(
+        records_file,
+        progress_file,
+        rate,
+        workers,
+        OPTIONS["config"],
+        OPTIONS["ckan-instance-name"],
+        OPTIONS["verify"],
+        OPTIONS["test"],
+    )
+
+
 @patch_app.command("resource", help="Update specified file and fields of resource.")
 def patch_resource(
     metadata_file: str = typer.Argument(
@@ -1,3 +1,4 @@
+import contextlib
 import json
 import pathlib
 import shutil
@@ -7,35 +8,47 @@ from rich import print as rprint
 from rich.prompt import Prompt
 
 from ckool import (
+    BULK_PATCH_PROGRESS_FILE_ENDING,
+    CACHE_DATABASE_SUFFIXES,
     DOWNLOAD_CHUNK_SIZE,
     HASH_BLOCK_SIZE,
     HASH_TYPE,
     LOGGER,
+    METADATA_MIRROR_FILE_PREFIX,
     PACKAGE_META_DATA_FILE_ENDING,
     TEMPORARY_DIRECTORY_NAME,
     UPLOAD_FUNC_FACTOR,
 )
+from ckool.ckan.bulk import bulk_patch, read_bulk_patch_records
 from ckool.ckan.ckan import CKAN
+from ckool.ckan.mirror import MetadataMirror
 from ckool.ckan.publishing import (
     create_organization_raw,
     create_package_raw,
     create_project_raw,
     create_resource_raw,
     enrich_and_store_metadata,
+    format_resource_metadata_raw,
     patch_package_raw,
-    patch_resource_metadata_raw,
     publish_datacite_doi,
+    render_all_metadata,
     update_datacite_doi,
 )
 from ckool.datacite.datacite import DataCiteAPI
 from ckool.datacite.doi_store import LocalDoiStore
+from ckool.datacite.metadata_formatter import try_splitting_authors
 from ckool.interfaces.mixed_requests import get_citation_from_doi
-from ckool.other.caching import read_cache
+from ckool.interfaces.prefetch import LookupPrefetcher, prefetch_publication_lookups
+from ckool.other.caching import (
+    read_cache,
+    recover_cache_directory,
+    user_cache_folder,
+)
 from ckool.other.config_parser import config_for_instance, parse_config_for_use
 from ckool.other.file_management import get_compression_func, iter_package
 from ckool.other.hashing import get_hash_func
 from ckool.other.types import CompressionTypes, HashTypes
-from ckool.other.utilities import resource_is_link
+from ckool.other.utilities import parse_size, resource_is_link
 from ckool.parallel_runner import (
     map_function_with_processpool,
 )
@@ -76,6 +89,10 @@ def _upload_package(
     verify: bool,
     test: bool,
     progressbar: bool = True,
+    adaptive_compression: bool = False,
+    compression_workers: int = 1,
+    max_archive_size: str | None = None,
+    bundle_small_files_below: str | None = None,
 ):
     """
     Example calls here:
@@ -96,7 +113,15 @@ def _upload_package(
 
     package_folder = pathlib.Path(package_folder)
     hash_func = get_hash_func(hash_algorithm)
-    compression_func = get_compression_func(compression_type)
+    compression_func = get_compression_func(
+        compression_type, adaptive=adaptive_compression, workers=compression_workers
+    )
+    if max_archive_size is not None:
+        max_archive_size = parse_size(max_archive_size)
+    if bundle_small_files_below is not None:
+        bundle_small_files_below = parse_size(bundle_small_files_below)
+
+    recover_cache_directory(package_folder / TEMPORARY_DIRECTORY_NAME)
 
     if not parallel:
         something_to_upload = False
@@ -106,6 +131,8 @@ def _upload_package(
             ignore_folders=not include_sub_folders,
             include_pattern=include_pattern,
             exclude_pattern=exclude_pattern,
+            max_archive_size=max_archive_size,
+            bundle_small_files_below=bundle_small_files_below,
         ):
             if file := info["file"]:  # files are hashed
                 LOGGER.info(f"Handling file '{file.name}'.")
@@ -120,9 +147,9 @@ def _upload_package(
                 something_to_upload = True
 
             elif folder := info["folder"]:  # folders are archived and then hashed
-                if not include_sub_folders:
+                if not include_sub_folders and not folder.get("bundle"):
                     continue
-                LOGGER.info(f"Handling folder '{folder.name}'.")
+                LOGGER.info(f"Handling folder '{folder['archive_destination'].name}'.")
                 handle_folder(
                     folder,
                     hash_func,
@@ -167,12 +194,16 @@ def _upload_package(
                     section=section,
                     progressbar=progressbar,
                     force_scp=force_scp,
+                    adaptive_compression=adaptive_compression,
+                    compression_workers=compression_workers,
                 )
                 for info in iter_package(
                     package_folder,
                     ignore_folders=not include_sub_folders,
                     include_pattern=include_pattern,
                     exclude_pattern=exclude_pattern,
+                    max_archive_size=max_archive_size,
+                    bundle_small_files_below=bundle_small_files_below,
                 )
             ],
             workers=workers,
@@ -235,13 +266,24 @@ def _prepare_package(
     parallel: bool,
     ignore_prepared: bool,
     progressbar: bool = True,
+    adaptive_compression: bool = False,
+    compression_workers: int = 1,
+    max_archive_size: str | None = None,
+    bundle_small_files_below: str | None = None,
 ):
     package_folder = pathlib.Path(package_folder)
     hash_func = get_hash_func(hash_algorithm)
-    compression_func = get_compression_func(compression_type)
+    compression_func = get_compression_func(
+        compression_type, adaptive=adaptive_compression, workers=compression_workers
+    )
+    if max_archive_size is not None:
+        max_archive_size = parse_size(max_archive_size)
+    if bundle_small_files_below is not None:
+        bundle_small_files_below = parse_size(bundle_small_files_below)
     if ignore_prepared and (package_folder / TEMPORARY_DIRECTORY_NAME).exists():
         LOGGER.info("Deleting previously prepared caches.")
         shutil.rmtree(package_folder / TEMPORARY_DIRECTORY_NAME)
+    recover_cache_directory(package_folder / TEMPORARY_DIRECTORY_NAME)
 
     if not parallel:
         done = []
@@ -250,6 +292,8 @@ def _prepare_package(
             ignore_folders=not include_sub_folders,
             include_pattern=include_pattern,
             exclude_pattern=exclude_pattern,
+            max_archive_size=max_archive_size,
+            bundle_small_files_below=bundle_small_files_below,
         ):
             if file := info["file"]:  # files are hashed
                 LOGGER.info(f"Handling file '{file.name}'.")
@@ -264,10 +308,10 @@ def _prepare_package(
                     )
                 )
             elif folder := info["folder"]:  # folders are archived and then hashed
-                if not include_sub_folders:
+                if not include_sub_folders and not folder.get("bundle"):
                     continue
 
-                LOGGER.info(f"Handling folder '{folder['root_folder'].name}'.")
+                LOGGER.info(f"Handling folder '{folder['archive_destination'].name}'.")
                 done.append(
                     handle_folder(
                         folder,
@@ -295,12 +339,16 @@ def _prepare_package(
                     compression_type=compression_type,
                     hash_algorithm=hash_algorithm,
                     progressbar=progressbar,
+                    adaptive_compression=adaptive_compression,
+                    compression_workers=compression_workers,
                 )
                 for info in iter_package(
                     package_folder,
                     ignore_folders=not include_sub_folders,
                     include_pattern=include_pattern,
                     exclude_pattern=exclude_pattern,
+                    max_archive_size=max_archive_size,
+                    bundle_small_files_below=bundle_small_files_below,
                 )
             ],
             workers=None,  # max amount of workers will be used
@@ -430,7 +478,13 @@ def _download_all_metadata(
     ckan_instance_name: str,
     verify: bool,
     test: bool,
+    output_file: str | None = None,
+    workers: int = 4,
 ):
+    """
+    Writes the metadata of all packages as newline delimited json (one package per line),
+    to output_file or to stdout, while paging through the instance.
+    """
     LOGGER.info("Reading config.")
 
     section = "Production" if not test else "Test"
@@ -438,14 +492,59 @@ def _download_all_metadata(
     cfg_ckan_api.update({"verify_certificate": verify})
     ckan = CKAN(**cfg_ckan_api)
     LOGGER.info(f"Dumping all metadata for instance '{ckan_instance_name}'.")
-    result = ckan.get_all_packages(include_private=include_private)
-    if result["count"] == 1000:
-        raise Warning(
-            "The maximal numbers of rows were retrieved. "
-            "Please check the ckanapi documentation for the package_search function "
-            "on how to implement retrieval of more rows."
-        )
-    rprint(json.dumps(result, indent=4))
+
+    count = 0
+    with (
+        contextlib.nullcontext(sys.stdout)
+        if output_file is None
+        else open(output_file, "w")
+    ) as out:
+        for package in ckan.iter_all_packages(
+            include_private=include_private, workers=workers
+        ):
+            out.write(json.dumps(package) + "\n")
+            count += 1
+    LOGGER.info(f"... {count} packages dumped.")
+    return count
+
+
+def _iter_json_lines(file: pathlib.Path):
+    with file.open() as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _default_mirror_database(section: str, ckan_instance_name: str):
+    return (
+        user_cache_folder()
+        / f"{METADATA_MIRROR_FILE_PREFIX}{section.lower()}-{ckan_instance_name}.sqlite"
+    )
+
+
+def _sync_metadata(
+    include_private: bool,
+    database: str | None,
+    config: dict,
+    ckan_instance_name: str,
+    verify: bool,
+    test: bool,
+    workers: int = 4,
+):
+    LOGGER.info("Reading config.")
+
+    section = "Production" if not test else "Test"
+    cfg_ckan_api = config_for_instance(config[section]["ckan_api"], ckan_instance_name)
+    cfg_ckan_api.update({"verify_certificate": verify})
+    ckan = CKAN(**cfg_ckan_api)
+
+    if database is None:
+        database = _default_mirror_database(section, ckan_instance_name)
+    mirror = MetadataMirror(pathlib.Path(database))
+    LOGGER.info(f"Syncing metadata of '{ckan_instance_name}' to '{mirror.database}'.")
+    result = mirror.sync(ckan, include_private=include_private, workers=workers)
+    rprint({**result, "total": len(mirror), "watermark": mirror.watermark()})
+    return result
 
 
 def _patch_package(
@@ -468,6 +567,43 @@ def _patch_package(
     # metadata_in_ckan = ckan.get_package(package_name)
 
 
+def _patch_bulk(
+    records_file: str,
+    progress_file: str | None,
+    rate: float,
+    workers: int,
+    config: dict,
+    ckan_instance_name: str,
+    verify: bool,
+    test: bool,
+):
+    LOGGER.info("Reading config.")
+
+    section = "Production" if not test else "Test"
+    cfg_ckan_api = config_for_instance(config[section]["ckan_api"], ckan_instance_name)
+    cfg_ckan_api.update({"verify_certificate": verify})
+    ckan = CKAN(**cfg_ckan_api)
+
+    records_file = pathlib.Path(records_file)
+    if progress_file is None:
+        progress_file = records_file.with_name(
+            records_file.name + BULK_PATCH_PROGRESS_FILE_ENDING
+        )
+    LOGGER.info(
+        f"Patching records of '{records_file.name}' with {workers} workers at most {rate} calls/s, "
+        f"progress is kept in '{progress_file}'."
+    )
+    result = bulk_patch(
+        ckan,
+        read_bulk_patch_records(records_file),
+        pathlib.Path(progress_file),
+        rate=rate,
+        workers=workers,
+    )
+    rprint(result)
+    return result
+
+
 def _patch_resource(
     metadata_file: str,
     file: str,
@@ -634,6 +770,7 @@ def _publish_package(
     (cwd := wd / TEMPORARY_DIRECTORY_NAME / package_name).mkdir(
         exist_ok=True, parents=True
     )
+    recover_cache_directory(cwd, endings=(PACKAGE_META_DATA_FILE_ENDING,))
 
     cfg = parse_config_for_use(
         config=config,
@@ -667,168 +804,208 @@ def _publish_package(
         package_metadata_suffix=PACKAGE_META_DATA_FILE_ENDING,
     )
 
-    temporary_resource_names = {}
-    for resource in metadata_filtered["resources"]:
-        res = handle_resource_download_with_integrity_check(
-            cfg_ckan_source=cfg["cfg_ckan_source"],
-            package_name=package_name,
-            resource=resource,
-            check_data_integrity=check_data_integrity,
-            cwd=cwd,
-            re_download=re_download_resources,
-        )
-        temporary_resource_names[res["id"]] = res["name"]
-
-    existing_and_missing_entities = handle_missing_entities(
-        ckan_source=cfg["ckan_source"],
-        ckan_target=cfg["ckan_target"],
-        cfg_other_target=cfg["cfg_other_target"],
-        create_missing_=create_missing_,
-        metadata_filtered=metadata_filtered,
-        projects_to_publish=projects_to_publish,
-    )
-
-    # NOW ALL ENTITIES EXIST (Organization, Project, TODO Variables still need to be implemented)
-    if existing_and_missing_entities["missing"]["package"]:
-        LOGGER.info(
-            f"Creating package {existing_and_missing_entities['missing']['package'][0]}..."
-        )
-        create_package_raw(
-            ckan_instance_source=cfg["ckan_source"],
-            ckan_instance_target=cfg["ckan_target"],
-            data=metadata_filtered,
-            doi=doi,
-            prepare_for_publication=True,
-            project_names_to_link=projects_to_publish,
-        )
-
-    elif existing_and_missing_entities["exist"]["package"]:
-        patch_package_raw(
-            ckan_instance_source=cfg["ckan_source"],
-            ckan_instance_destination=cfg["ckan_target"],
-            data=metadata_filtered,
+    # citations, DORA and ORCiD lookups run in the background while the resources are downloaded
+    prefetcher = LookupPrefetcher()
+    try:
+        prefetch_publication_lookups(
+            prefetcher,
+            metadata=metadata_filtered,
             doi=doi,
-            prepare_for_publication=True,
-            project_names_to_link=projects_to_publish,
+            authors=try_splitting_authors(metadata_filtered["author"]),
         )
 
-    else:
-        raise ValueError(
-            "Oops, this should not happen, seems like the package your trying to publish "
-            "is not flagged as 'missing' neither as 'existing' in ckool."
+        temporary_resource_names = {}
+        for resource in metadata_filtered["resources"]:
+            res = handle_resource_download_with_integrity_check(
+                cfg_ckan_source=cfg["cfg_ckan_source"],
+                package_name=package_name,
+                resource=resource,
+                check_data_integrity=check_data_integrity,
+                cwd=cwd,
+                re_download=re_download_resources,
+            )
+            temporary_resource_names[res["id"]] = res["name"]
+
+        existing_and_missing_entities = handle_missing_entities(
+            ckan_source=cfg["ckan_source"],
+            ckan_target=cfg["ckan_target"],
+            cfg_other_target=cfg["cfg_other_target"],
+            create_missing_=create_missing_,
+            metadata_filtered=metadata_filtered,
+            projects_to_publish=projects_to_publish,
         )
 
-    for resource in metadata_filtered["resources"]:
-        filepath = cwd / temporary_resource_names[resource["id"]]
-
-        if not cfg["ckan_target"].resource_exists(  # Create resource fresh.
-            package_name=metadata_filtered["name"],
-            resource_name=resource["name"],
-        ):
-            LOGGER.info(f"Uploading resource {resource['name']}...")
-            create_resource_raw_wrapped(
-                cfg_ckan_target=cfg["cfg_ckan_target"],
-                cfg_other_target=cfg["cfg_other_target"],
-                cfg_secure_interface_destination=cfg["cfg_secure_interface_target"],
-                filepath=filepath,
-                resource=resource,
-                package_name=package_name,
-                force_scp=force_scp,
+        # NOW ALL ENTITIES EXIST (Organization, Project, TODO Variables still need to be implemented)
+        if existing_and_missing_entities["missing"]["package"]:
+            LOGGER.info(
+                f"Creating package {existing_and_missing_entities['missing']['package'][0]}..."
+            )
+            create_package_raw(
+                ckan_instance_source=cfg["ckan_source"],
+                ckan_instance_target=cfg["ckan_target"],
+                data=metadata_filtered,
+                doi=doi,
+                prepare_for_publication=True,
+                project_names_to_link=projects_to_publish,
+                prefetcher=prefetcher,
             )
 
-            continue
+        elif existing_and_missing_entities["exist"]["package"]:
+            patch_package_raw(
+                ckan_instance_source=cfg["ckan_source"],
+                ckan_instance_destination=cfg["ckan_target"],
+                data=metadata_filtered,
+                doi=doi,
+                prepare_for_publication=True,
+                project_names_to_link=projects_to_publish,
+                prefetcher=prefetcher,
+            )
 
-        patch_metadata = True
-        if not resource_is_link(resource):
-            resource_integrity_intact = (
-                resource_integrity_between_ckan_instances_intact(
-                    ckan_api_input_1=cfg["cfg_ckan_source"],
-                    ckan_api_input_2=cfg["cfg_ckan_target"],
-                    package_name=metadata_filtered["name"],
-                    resource_id_or_name=resource["name"],
-                )
+        else:
+            raise ValueError(
+                "Oops, this should not happen, seems like the package your trying to publish "
+                "is not flagged as 'missing' neither as 'existing' in ckool."
             )
 
-            if not resource_integrity_intact:
-                if not no_resource_overwrite_prompt:
-                    confirmation = prompt_function(
-                        f"The resource '{resource['name']}' has a different hash between "
-                        f"'{ckan_instance_source}' and '{ckan_instance_target}'. "
-                        f"Should it be uploaded again?",
-                        choices=["no", "yes"],
-                        default="no",
+        links_to_create, resources_to_patch = [], {}
+        for resource in metadata_filtered["resources"]:
+            filepath = cwd / temporary_resource_names[resource["id"]]
+
+            if not cfg["ckan_target"].resource_exists(  # Create resource fresh.
+                package_name=metadata_filtered["name"],
+                resource_name=resource["name"],
+            ):
+                if resource_is_link(
+                    resource
+                ):  # links are created in a single batch below
+                    links_to_create.append(
+                        format_resource_metadata_raw(
+                            metadata=resource,
+                            is_link=True,
+                            prepare_for_publication=True,
+                        )
                     )
-                    if confirmation != "yes":
-                        continue
-
-                # resource will need re-uploading
-                upload_func = get_upload_func(
-                    file_sizes=[int(resource["size"])],
-                    space_available_on_server_root_disk=cfg["cfg_other_target"][
-                        "space_available_on_server_root_disk"
-                    ],
-                    parallel_upload=False,
-                    factor=UPLOAD_FUNC_FACTOR,
-                    is_link=resource_is_link(resource),
+                    continue
+                LOGGER.info(f"Uploading resource {resource['name']}...")
+                create_resource_raw_wrapped(
+                    cfg_ckan_target=cfg["cfg_ckan_target"],
+                    cfg_other_target=cfg["cfg_other_target"],
+                    cfg_secure_interface_destination=cfg["cfg_secure_interface_target"],
+                    filepath=filepath,
+                    resource=resource,
+                    package_name=package_name,
                     force_scp=force_scp,
                 )
 
-                # Deleting the entire resource, and re-uploading it.
-                cfg["ckan_target"].delete_resource(
-                    resource_id=cfg["ckan_target"].resolve_resource_id_or_name_to_id(
+                continue
+
+            patch_metadata = True
+            if not resource_is_link(resource):
+                resource_integrity_intact = (
+                    resource_integrity_between_ckan_instances_intact(
+                        ckan_api_input_1=cfg["cfg_ckan_source"],
+                        ckan_api_input_2=cfg["cfg_ckan_target"],
                         package_name=metadata_filtered["name"],
                         resource_id_or_name=resource["name"],
-                    )["id"]
+                    )
                 )
 
-                create_resource_raw(
-                    ckan_api_input=cfg["cfg_ckan_target"],
-                    secure_interface_input=cfg["cfg_secure_interface_target"],
-                    ckan_storage_path=cfg["cfg_other_target"]["ckan_storage_path"],
-                    package_name=metadata_filtered["name"],
+                if not resource_integrity_intact:
+                    if not no_resource_overwrite_prompt:
+                        confirmation = prompt_function(
+                            f"The resource '{resource['name']}' has a different hash between "
+                            f"'{ckan_instance_source}' and '{ckan_instance_target}'. "
+                            f"Should it be uploaded again?",
+                            choices=["no", "yes"],
+                            default="no",
+                        )
+                        if confirmation != "yes":
+                            continue
+
+                    # resource will need re-uploading
+                    upload_func = get_upload_func(
+                        file_sizes=[int(resource["size"])],
+                        space_available_on_server_root_disk=cfg["cfg_other_target"][
+                            "space_available_on_server_root_disk"
+                        ],
+                        parallel_upload=False,
+                        factor=UPLOAD_FUNC_FACTOR,
+                        is_link=resource_is_link(resource),
+                        force_scp=force_scp,
+                    )
+
+                    # Deleting the entire resource, and re-uploading it.
+                    cfg["ckan_target"].delete_resource(
+                        resource_id=cfg[
+                            "ckan_target"
+                        ].resolve_resource_id_or_name_to_id(
+                            package_name=metadata_filtered["name"],
+                            resource_id_or_name=resource["name"],
+                        )[
+                            "id"
+                        ]
+                    )
+
+                    create_resource_raw(
+                        ckan_api_input=cfg["cfg_ckan_target"],
+                        secure_interface_input=cfg["cfg_secure_interface_target"],
+                        ckan_storage_path=cfg["cfg_other_target"]["ckan_storage_path"],
+                        package_name=metadata_filtered["name"],
+                        metadata=resource,
+                        file_path=filepath,
+                        upload_func=upload_func,
+                        progressbar=True,
+                        prepare_for_publication=True,
+                    )
+                    patch_metadata = False
+
+            if patch_metadata:  # patched in a single batch below
+                resources_to_patch[resource["name"]] = format_resource_metadata_raw(
                     metadata=resource,
-                    file_path=filepath,
-                    upload_func=upload_func,
-                    progressbar=True,
+                    is_link=resource_is_link(resource),
                     prepare_for_publication=True,
                 )
-                patch_metadata = False
 
-        if patch_metadata:
-            LOGGER.info(f"Patching resource metadata {resource['name']}...")
-            patch_resource_metadata_raw(
-                ckan_api_input=cfg["cfg_ckan_target"],
+            # delete_local_resource after upload
+            if not keep_resources:
+                filepath.unlink()
+
+        if links_to_create or resources_to_patch:
+            LOGGER.info(
+                f"Creating {len(links_to_create)} link resource(s) and "
+                f"patching the metadata of {len(resources_to_patch)} resource(s)..."
+            )
+            cfg["ckan_target"].batch_update_resources(
                 package_name=metadata_filtered["name"],
-                resource_name=resource["name"],
-                metadata=resource,
-                is_link=resource_is_link(resource),
-                prepare_for_publication=True,
+                resources_to_create=links_to_create,
+                resources_to_patch=resources_to_patch,
             )
 
-        # delete_local_resource after upload
-        if not keep_resources:
-            filepath.unlink()
+        if check_data_integrity:
+            package_integrity_remote_intact(
+                ckan_api_input=cfg["cfg_ckan_target"],
+                secure_interface_input=cfg["cfg_secure_interface_target"],
+                ckan_storage_path=cfg["cfg_other_target"]["ckan_storage_path"],
+                package_name=package_name,
+                cache_directory=cwd,
+            )
 
-    if check_data_integrity:
-        package_integrity_remote_intact(
-            ckan_api_input=cfg["cfg_ckan_target"],
-            secure_interface_input=cfg["cfg_secure_interface_target"],
-            ckan_storage_path=cfg["cfg_other_target"]["ckan_storage_path"],
-            package_name=package_name,
-            cache_directory=cwd,
+        cfg["ckan_target"].reorder_package_resources(
+            package_name=metadata_filtered["name"]
         )
 
-    cfg["ckan_target"].reorder_package_resources(package_name=metadata_filtered["name"])
-
-    enrich_and_store_metadata(
-        metadata=metadata_filtered,
-        local_doi_store_instance=cfg["lds"],
-        package_name=metadata_filtered["name"],
-        ask_orcids=True,
-        ask_affiliations=True,
-        ask_related_identifiers=True,
-        prompt_function=prompt_function,
-    )
+        enrich_and_store_metadata(
+            metadata=metadata_filtered,
+            local_doi_store_instance=cfg["lds"],
+            package_name=metadata_filtered["name"],
+            ask_orcids=True,
+            ask_affiliations=True,
+            ask_related_identifiers=True,
+            prompt_function=prompt_function,
+            prefetcher=prefetcher,
+        )
+    finally:
+        prefetcher.shutdown()
 
     update_datacite_doi(
         datacite_api_instance=cfg["datacite"],
@@ -853,7 +1030,7 @@ def _publish_package(
     cfg["ckan_target"].update_doi(
         package_name=metadata_filtered["name"],
         doi=doi,
-        citation=get_citation_from_doi(doi),
+        citation=get_citation_from_doi(doi, refresh=True),
     )
 
 
@@ -942,6 +1119,89 @@ def _publish_doi(
         LOGGER.info("Publication aborted.")
 
 
+def _audit_doi_store(
+    check_datacite: bool,
+    workers: int,
+    config: dict,
+    ckan_instance_name: str,
+    verify: bool,
+    test: bool,
+):
+    LOGGER.info("Reading config.")
+
+    section = "Production" if not test else "Test"
+    lds = LocalDoiStore(path=config[section]["local_doi_store_path"])
+
+    registered_dois = None
+    if check_datacite:
+        LOGGER.info("Retrieving the registered dois from DataCite.")
+        datacite = DataCiteAPI(**config[section]["datacite"])
+        registered_dois = datacite.doi_list_all()
+
+    LOGGER.info(f"Auditing the local doi store '{lds.path}'.")
+    report = lds.audit(registered_dois=registered_dois, workers=workers)
+    rprint(report)
+    return report
+
+
+def _render_all_metadata(
+    snapshot: str | None,
+    workers: int,
+    validate: bool,
+    config: dict,
+    ckan_instance_name: str,
+    verify: bool,
+    test: bool,
+):
+    LOGGER.info("Reading config.")
+
+    section = "Production" if not test else "Test"
+    lds = LocalDoiStore(path=config[section]["local_doi_store_path"])
+
+    snapshot = pathlib.Path(
+        snapshot or _default_mirror_database(section, ckan_instance_name)
+    )
+    if not snapshot.exists():
+        raise ValueError(
+            f"The metadata snapshot '{snapshot}' does not exist, "
+            f"create it with 'ckool sync metadata' or 'ckool get all_metadata -o'."
+        )
+    if snapshot.suffix in CACHE_DATABASE_SUFFIXES:
+        packages = MetadataMirror(snapshot).packages()
+    else:  # newline delimited json
+        packages = _iter_json_lines(snapshot)
+
+    LOGGER.info(f"Rendering the datacite metadata of the packages in '{snapshot}'.")
+    with contextlib.closing(packages):  # releases the file or database connection
+        reports = render_all_metadata(packages, lds, workers=workers, validate=validate)
+    rprint(reports)
+    failed = [r["package"] for r in reports if r["error"]]
+    LOGGER.info(
+        f"... rendered {len(reports) - len(failed)} package(s) in "
+        f"{sum(r['seconds'] for r in reports):.2f} s of worker time, {len(failed)} failed."
+    )
+    return reports
+
+
+def _reserve_dois(
+    number: int,
+    offset: int | None,
+    config: dict,
+    ckan_instance_name: str,
+    verify: bool,
+    test: bool,
+):
+    LOGGER.info("Reading config.")
+
+    section = "Production" if not test else "Test"
+    datacite = DataCiteAPI(**config[section]["datacite"])
+
+    LOGGER.info(f"Reserving {number} doi(s), ledger '{datacite.ledger.database}'.")
+    dois = datacite.doi_reserve_n(n=number, offset=offset)
+    rprint(dois)
+    return dois
+
+
 def _publish_controlled_vocabulary(
     organization_name: str,
     config: dict,
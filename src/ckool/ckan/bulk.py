@@ -0,0 +1,164 @@
+import concurrent.futures
+import json
+import pathlib
+import random
+import time
+
+import ckanapi.errors
+import requests
+
+from ckool import BULK_PATCH_BACKOFF_SECONDS, BULK_PATCH_MAX_RETRIES, LOGGER
+from ckool.ckan.ckan import CKAN
+from ckool.other.utilities import TokenBucket, append_json_line
+
+PATCH_ENDPOINTS = {"package": "package_patch", "resource": "resource_patch"}
+
+# Errors of the request itself (validation, permissions, ...) will not go away by retrying.
+NOT_RETRIABLE_ERRORS = (
+    ckanapi.errors.NotAuthorized,
+    ckanapi.errors.NotFound,
+    ckanapi.errors.ValidationError,
+    ckanapi.errors.SearchQueryError,
+)
+# Errors a patch call is expected to raise, all but the ones above are retried.
+PATCH_ERRORS = (
+    ckanapi.errors.CKANAPIError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+
+def is_retriable(error: Exception):
+    if isinstance(error, NOT_RETRIABLE_ERRORS):
+        return False
+    return isinstance(error, PATCH_ERRORS)
+
+
+def read_bulk_patch_records(records_file: pathlib.Path):
+    """
+    Reads a jsonl file with one record per line:
+    {"id": "<package or resource id / name>", "patch": {...}, "type": "package" | "resource"}
+    'type' is optional and defaults to "package".
+    """
+    with records_file.open() as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record.setdefault("type", "package")
+            if "id" not in record or not isinstance(record.get("patch"), dict):
+                raise ValueError(
+                    f"Line {number} of '{records_file}' needs an 'id' and a 'patch' object."
+                )
+            if record["type"] not in PATCH_ENDPOINTS:
+                raise ValueError(
+                    f"Line {number} of '{records_file}' has an unknown type '{record['type']}', "
+                    f"choose one of {list(PATCH_ENDPOINTS)}."
+                )
+            yield record
+
+
+def _record_key(number: int, record: dict):
+    """Records are identified by their position, the same id may be patched more than once."""
+    return f"{number}:{record['type']}:{record['id']}"
+
+
+def read_bulk_patch_progress(progress_file: pathlib.Path):
+    """Returns the keys of the records that were patched successfully in a previous run."""
+    done = set()
+    if not progress_file.exists():
+        return done
+    with progress_file.open() as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:  # interrupted while writing
+                continue
+            if entry.get("ok"):
+                done.add(entry["key"])
+    return done
+
+
+def _patch_with_retries(
+    ckan: CKAN,
+    record: dict,
+    bucket: TokenBucket,
+    max_retries: int,
+    backoff: float,
+):
+    attempt = 0
+    while True:
+        bucket.acquire()
+        try:
+            return ckan.plain_action_call(
+                PATCH_ENDPOINTS[record["type"]],
+                **{**record["patch"], "id": record["id"]},
+            )
+        except PATCH_ERRORS as error:
+            if attempt >= max_retries or not is_retriable(error):
+                raise
+            delay = backoff * 2**attempt * (1 + random.random())
+            LOGGER.warning(
+                f"... patching '{record['id']}' failed with '{error!r}', retrying in {delay:.1f}s."
+            )
+            time.sleep(delay)
+            attempt += 1
+
+
+def bulk_patch(
+    ckan: CKAN,
+    records,
+    progress_file: pathlib.Path,
+    rate: float = 5,
+    workers: int = 4,
+    max_retries: int = BULK_PATCH_MAX_RETRIES,
+    backoff: float = BULK_PATCH_BACKOFF_SECONDS,
+):
+    """
+    Patches packages / resources concurrently, at most `rate` calls per second (token bucket)
+    with up to `workers` calls in flight. Transient errors are retried with exponential backoff.
+    Each outcome is appended to `progress_file`, records that were already patched are skipped,
+    so an interrupted run can simply be restarted with the same arguments.
+    Returns a dict with the counts of 'patched', 'skipped' and 'failed' records.
+    """
+    done = read_bulk_patch_progress(progress_file)
+    bucket = TokenBucket(rate)
+    counts = {"patched": 0, "skipped": 0, "failed": 0}
+
+    def finish(future, key, record):
+        entry = {"time": time.time(), "key": key}
+        try:
+            future.result()
+        except PATCH_ERRORS as error:
+            LOGGER.error(f"... patching '{record['id']}' failed: {error!r}")
+            append_json_line(
+                progress_file, {**entry, "ok": False, "error": repr(error)}
+            )
+            counts["failed"] += 1
+        else:
+            append_json_line(progress_file, {**entry, "ok": True})
+            counts["patched"] += 1
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for number, record in enumerate(records, start=1):
+            if (key := _record_key(number, record)) in done:
+                counts["skipped"] += 1
+                continue
+            future = executor.submit(
+                _patch_with_retries, ckan, record, bucket, max_retries, backoff
+            )
+            pending[future] = (key, record)
+            if len(pending) >= 2 * workers:
+                finished, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in finished:
+                    finish(future, *pending.pop(future))
+        for future in concurrent.futures.as_completed(pending):
+            finish(future, *pending[future])
+
+    LOGGER.info(
+        f"... {counts['patched']} patched, {counts['skipped']} skipped, {counts['failed']} failed."
+    )
+    return counts
@@ -1,6 +1,8 @@
+import collections
 import concurrent.futures
 import json
 import pathlib
+from copy import deepcopy
 
 import ckanapi
 import requests
@@ -137,6 +139,43 @@ class CKAN:
 
         return self.plain_action_call("package_search", **kwargs)
 
+    def iter_all_packages(
+        self,
+        include_private: bool = True,
+        rows: int = 1000,
+        workers: int = 4,
+        **kwargs,
+    ):
+        """
+        Yields every package of the instance, paging through 'package_search' with start/rows.
+        Pages are sorted by name, so the paging is stable, and are fetched with up to `workers`
+        concurrent requests. At most `workers` pages are held in memory, independent of the instance size.
+        rows: int [default: 1000],
+            1000 is the default maximum CKAN allows ('ckan.search.rows_max').
+        """
+        kwargs.setdefault("sort", "name asc")
+        first = self.get_all_packages(
+            include_private=include_private, rows=rows, start=0, **kwargs
+        )
+        yield from first["results"]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = collections.deque()
+            for start in range(rows, first["count"], rows):
+                pending.append(
+                    executor.submit(
+                        self.get_all_packages,
+                        include_private=include_private,
+                        rows=rows,
+                        start=start,
+                        **kwargs,
+                    )
+                )
+                if len(pending) >= workers:
+                    yield from pending.popleft().result()["results"]
+            while pending:
+                yield from pending.popleft().result()["results"]
+
     def get_all_projects(self, **kwargs):
         """
         https://docs.ckan.org/en/2.9/api/#ckan.logic.action.get.package_search
@@ -264,6 +303,48 @@ class CKAN:
         resource_data_to_update.update({"id": resource_id})
         return self.plain_action_call("resource_patch", **resource_data_to_update)
 
+    def batch_update_resources(
+        self,
+        package_name: str,
+        resources_to_create: list[dict] | None = None,
+        resources_to_patch: dict[str, dict] | None = None,
+    ):
+        """
+        Creates link resources and patches resource metadata with a single 'package_patch' call
+        carrying the full resource list, instead of one 'resource_create' / 'resource_patch' call per resource.
+        resources_to_create: list,
+            metadata of link resources (file resources need an upload, they can not be batched).
+        resources_to_patch: dict,
+            {resource name or id: fields to update}
+        If CKAN rejects the batch, every resource is sent on its own, so the failing one raises its own error.
+        """
+        resources_to_create = resources_to_create or []
+        resources_to_patch = resources_to_patch or {}
+        if not resources_to_create and not resources_to_patch:
+            return
+
+        package = self.get_package(package_name)
+        resources = package["resources"]
+        patches = {
+            resource_name_to_id(resources, package_name, name_or_id): data
+            for name_or_id, data in resources_to_patch.items()
+        }
+        updated = [{**r, **patches.get(r["id"], {})} for r in resources]
+        updated += [deepcopy(r) for r in resources_to_create]
+
+        try:
+            return self.patch_package_metadata(
+                package_id=package["id"], data={"resources": updated}
+            )
+        except ckanapi.ValidationError:
+            for resource_id, data in patches.items():
+                self.patch_resource_metadata(
+                    resource_id=resource_id, resource_data_to_update=deepcopy(data)
+                )
+            for data in resources_to_create:
+                self.create_resource_of_type_link(package_id=package["id"], **data)
+            return self.get_package(package_name)
+
     def _patch_empty_resource_name(
         self,
         package_name: str,
@@ -0,0 +1,130 @@
+import datetime
+import json
+import pathlib
+import sqlite3
+from contextlib import closing
+
+from ckool import (
+    CACHE_DATABASE_TIMEOUT,
+    LOGGER,
+    METADATA_MIRROR_SAFETY_MARGIN_SECONDS,
+)
+from ckool.ckan.ckan import CKAN
+
+
+class MetadataMirror:
+    """
+    Local copy of the package metadata of a ckan instance in a SQLite database.
+    Each sync only requests packages whose 'metadata_modified' is at or after the watermark
+    (the start time of the previous sync minus a safety margin, so packages modified while
+    a sync was paging through the instance are fetched again). Deleted packages are detected by comparing
+    the package ids of the instance (a light 'package_search' with fl=id) with the ones in the mirror.
+    """
+
+    def __init__(self, database: pathlib.Path):
+        self.database = pathlib.Path(database)
+
+    def _connect(self):
+        self.database.parent.mkdir(exist_ok=True, parents=True)
+        connection = sqlite3.connect(
+            self.database, timeout=CACHE_DATABASE_TIMEOUT, isolation_level=None
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS packages ("
+            "id TEXT PRIMARY KEY, name TEXT NOT NULL, "
+            "metadata_modified TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS packages_name ON packages (name)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        return connection
+
+    def watermark(self) -> str | None:
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT value FROM meta WHERE key = 'watermark'"
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def __len__(self):
+        with closing(self._connect()) as connection:
+            return connection.execute("SELECT COUNT(*) FROM packages").fetchone()[0]
+
+    def get(self, name_or_id: str) -> dict | None:
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT data FROM packages WHERE id = ? OR name = ?",
+                (name_or_id, name_or_id),
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def packages(self):
+        with closing(self._connect()) as connection:
+            for (data,) in connection.execute(
+                "SELECT data FROM packages ORDER BY name"
+            ):
+                yield json.loads(data)
+
+    def sync(self, ckan: CKAN, include_private: bool = True, workers: int = 4):
+        """
+        Upserts all packages modified since the last sync and removes the ones no longer on the instance.
+        The lower bound of the query is inclusive (Solr compares with reduced precision),
+        packages modified within the safety margin are fetched again, which is harmless.
+        """
+        # 'metadata_modified' is in UTC without a timezone suffix
+        started = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        next_watermark = started - datetime.timedelta(
+            seconds=METADATA_MIRROR_SAFETY_MARGIN_SECONDS
+        )
+        kwargs = {}
+        if watermark := self.watermark():
+            kwargs["fq"] = f"metadata_modified:[{watermark[:19]}Z TO *]"
+        LOGGER.info(f"... syncing packages modified since '{watermark or 'ever'}'.")
+
+        updated = 0
+        with closing(self._connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            for package in ckan.iter_all_packages(
+                include_private=include_private, workers=workers, **kwargs
+            ):
+                connection.execute(
+                    "INSERT INTO packages (id, name, metadata_modified, data) "
+                    "VALUES (?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+                    "name = excluded.name, "
+                    "metadata_modified = excluded.metadata_modified, "
+                    "data = excluded.data",
+                    (
+                        package["id"],
+                        package["name"],
+                        package["metadata_modified"],
+                        json.dumps(package),
+                    ),
+                )
+                updated += 1
+
+            remote_ids = {
+                package["id"]
+                for package in ckan.iter_all_packages(
+                    include_private=include_private, workers=workers, fl="id"
+                )
+            }
+            local_ids = {
+                id_ for (id_,) in connection.execute("SELECT id FROM packages")
+            }
+            deleted = local_ids - remote_ids
+            connection.executemany(
+                "DELETE FROM packages WHERE id = ?", [(id_,) for id_ in deleted]
+            )
+            connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('watermark', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (next_watermark.isoformat(),),
+            )
+            connection.execute("COMMIT")
+
+        LOGGER.info(f"... {updated} packages updated, {len(deleted)} deleted.")
+        return {"updated": updated, "deleted": len(deleted)}
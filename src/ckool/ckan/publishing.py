@@ -1,14 +1,23 @@
+import pathlib
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from copy import deepcopy
-from typing import Callable
+from typing import Callable, Iterable
 
 import ckanapi.errors
 from rich.prompt import Prompt
 
-from ckool.ckan.ckan import CKAN
+from ckool import LOGGER
+from ckool.ckan.ckan import CKAN, filter_resources
 from ckool.datacite.datacite import DataCiteAPI
 from ckool.datacite.doi_store import LocalDoiStore
 from ckool.datacite.metadata_formatter import MetaDataFormatter, try_splitting_authors
-from ckool.datacite.xml_writer import MetaDataToXMLConverter
+from ckool.datacite.orcid_index import AuthorOrcidIndex
+from ckool.datacite.xml_writer import (
+    MetaDataToXMLConverter,
+    load_schema_validator,
+    validate_xml_file,
+)
 from ckool.other.caching import update_cache
 from ckool.other.metadata_tools import (
     prepare_metadata_for_publication_package,
@@ -166,6 +175,7 @@ def format_package_metadata_raw(
     custom_citation_publication: str = None,
     prepare_for_publication: bool = True,
     project_names_to_link: list = None,
+    prefetcher=None,
 ):
     proj_ids = None
     pkg = deepcopy(data)
@@ -214,6 +224,7 @@ def format_package_metadata_raw(
             maintainer_record=maintainer_record,
             usage_contact_record=usage_contact_record,
             custom_citation_publication=custom_citation_publication,
+            prefetcher=prefetcher,
         )
     return pkg
 
@@ -226,6 +237,7 @@ def create_package_raw(
     custom_citation_publication: str = None,
     prepare_for_publication: bool = True,
     project_names_to_link: list = None,
+    prefetcher=None,
 ):
     pkg = format_package_metadata_raw(
         ckan_instance_source=ckan_instance_source,
@@ -235,6 +247,7 @@ def create_package_raw(
         custom_citation_publication=custom_citation_publication,
         prepare_for_publication=prepare_for_publication,
         project_names_to_link=project_names_to_link,
+        prefetcher=prefetcher,
     )
     return ckan_instance_target.create_package(**pkg)
 
@@ -247,6 +260,7 @@ def patch_package_raw(
     custom_citation_publication: str = None,
     prepare_for_publication: bool = False,
     project_names_to_link: list = None,
+    prefetcher=None,
 ):
     pkg = format_package_metadata_raw(
         ckan_instance_source=ckan_instance_source,
@@ -256,6 +270,7 @@ def patch_package_raw(
         custom_citation_publication=custom_citation_publication,
         prepare_for_publication=prepare_for_publication,
         project_names_to_link=project_names_to_link,
+        prefetcher=prefetcher,
     )
 
     return ckan_instance_destination.patch_package_metadata(
@@ -398,12 +413,16 @@ def enrich_and_store_metadata(
     ask_affiliations: bool = True,
     ask_related_identifiers: bool = True,
     prompt_function: Prompt.ask = Prompt.ask,
+    prefetcher=None,
 ):
-    filepath_xml = local_doi_store_instance.generate_xml_filepath(package_name)
-
     authors = try_splitting_authors(metadata["author"])
     if ask_orcids:
-        orcids = ask_for_orcids(authors=authors, prompt_func=prompt_function)
+        orcids = ask_for_orcids(
+            authors=authors,
+            prompt_func=prompt_function,
+            prefetcher=prefetcher,
+            orcid_index=AuthorOrcidIndex(local_doi_store_instance),
+        )
         if orcids:
             update_cache(
                 orcids, local_doi_store_instance.generate_orcids_filepath(package_name)
@@ -429,6 +448,22 @@ def enrich_and_store_metadata(
                 ),
             )
 
+    return render_metadata(metadata, local_doi_store_instance, package_name)
+
+
+def render_metadata(
+    metadata: dict,
+    local_doi_store_instance: LocalDoiStore,
+    package_name: str,
+    validate: bool = True,
+):
+    """
+    Writes the datacite json and xml of a package to the doi store,
+    from its metadata and the doi, orcids, affiliations and related publications already in the store.
+    Nothing is asked, both files are replaced atomically.
+    """
+    filepath_xml = local_doi_store_instance.generate_xml_filepath(package_name)
+
     # enrich metadata save json
     mdf = MetaDataFormatter(
         package_metadata=metadata,
@@ -447,17 +482,97 @@ def enrich_and_store_metadata(
 
     # convert to xml and save
     mdxmlc = MetaDataToXMLConverter(enriched_metadata, typ="datacite4.4")
-    xml = mdxmlc.convert_json_to_xml()
-    mdxmlc.write_xml(xml, filepath_xml)
+    mdxmlc.convert_json_to_xml_file(filepath_xml, validate=validate)
 
     return {"json": filepath_xml.with_suffix(".json"), "xml": filepath_xml}
 
 
+_RENDER_DOI_STORE = None
+# missing metadata fields or doi store files, invalid documents and unwritable stores
+RENDER_ERRORS = (KeyError, OSError, ValueError)
+
+
+def _render_worker_init(doi_store_path: pathlib.Path):
+    """Each worker loads the doi store index and compiles the schema once, not once per package."""
+    global _RENDER_DOI_STORE
+    _RENDER_DOI_STORE = LocalDoiStore(doi_store_path)
+    _RENDER_DOI_STORE.refresh_index()
+    load_schema_validator("datacite4.4")
+
+
+def _render_package(metadata: dict, validate: bool):
+    start = time.perf_counter()
+    try:
+        metadata = filter_resources(
+            metadata,
+            resources_to_exclude=[],
+            always_to_exclude_restriction_levels=["only_allowed_users"],
+        )
+        render_metadata(
+            metadata, _RENDER_DOI_STORE, metadata["name"], validate=validate
+        )
+        error = None
+    except RENDER_ERRORS as e:  # reported per package, the others are rendered anyway
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "package": metadata["name"],
+        "seconds": round(time.perf_counter() - start, 4),
+        "error": error,
+    }
+
+
+def render_all_metadata(
+    packages: Iterable[dict],
+    local_doi_store_instance: LocalDoiStore,
+    workers: int = 4,
+    validate: bool = True,
+):
+    """
+    Renders the datacite json and xml (see `render_metadata`) of many packages in a process pool.
+    packages: Iterable[dict],
+        package metadata as returned by 'package_show', e.g. from a MetadataMirror,
+        packages which are not in the doi store are skipped.
+    At most 2 * workers packages are submitted at a time, so packages are not all held in memory.
+    Returns one report per rendered package: {"package", "seconds", "error"}.
+    """
+    in_store = set(local_doi_store_instance.refresh_index()["packages"])
+    reports = []
+
+    def collect(finished):
+        for future in finished:
+            report = future.result()
+            if report["error"]:
+                LOGGER.error(
+                    f"... rendering '{report['package']}' failed: {report['error']}"
+                )
+            reports.append(report)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_render_worker_init,
+        initargs=(local_doi_store_instance.path,),
+    ) as executor:
+        pending = set()
+        for metadata in packages:
+            if metadata["name"] not in in_store:
+                continue
+            pending.add(executor.submit(_render_package, metadata, validate))
+            if len(pending) >= 2 * workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(wait(pending).done)
+    return sorted(reports, key=lambda r: r["package"])
+
+
 def update_datacite_doi(
     datacite_api_instance: DataCiteAPI,
     local_doi_store_instance: LocalDoiStore,
     package_name: str,
 ):
+    # the xml file may have been edited by hand, it is checked offline before the upload
+    validate_xml_file(
+        local_doi_store_instance.get_xml_file(package_name), typ="datacite4.4"
+    )
     return datacite_api_instance.doi_update(
         doi=local_doi_store_instance.get_doi(package_name),
         url=datacite_api_instance.generate_doi_url(package_name),
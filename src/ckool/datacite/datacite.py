@@ -1,12 +1,32 @@
+import concurrent.futures
+import json
+import math
+import pathlib
 from base64 import b64encode
+from datetime import datetime, timedelta, timezone
 from urllib.parse import urljoin
 
 import requests
+from requests.adapters import HTTPAdapter, Retry
 from requests.auth import HTTPBasicAuth
 
+from ckool import (
+    DATACITE_BACKOFF_FACTOR,
+    DATACITE_CONNECTION_POOL_SIZE,
+    DATACITE_DOI_TAKEN_MESSAGE,
+    DATACITE_MAX_PAGED_RECORDS,
+    DATACITE_MAX_RETRIES,
+    DATACITE_REGISTRY_CACHE_FILE_PREFIX,
+    DATACITE_REGISTRY_REFRESH_OVERLAP_SECONDS,
+    DATACITE_REQUEST_TIMEOUT,
+    DOI_LEDGER_FILE_PREFIX,
+    LOGGER,
+)
+from ckool.other.caching import atomic_write, user_cache_folder
 from ckool.other.utilities import get_secret
 
-from .doi_generator import generate_doi
+from .doi_generator import generate_unused_dois
+from .doi_ledger import DoiLedger
 
 
 def requests_raise_add(response, status_code, message):
@@ -23,10 +43,33 @@ class DataCiteException(Exception):
     pass
 
 
+class DataCiteDoiTakenException(DataCiteException):
+    pass
+
+
 class DataCiteAPI:
     def __init__(
-        self, host, prefix, user, password=None, secret_password=None, offset=0
+        self,
+        host,
+        prefix,
+        user,
+        password=None,
+        secret_password=None,
+        offset=0,
+        registry_cache_file=None,
+        timeout=DATACITE_REQUEST_TIMEOUT,
+        ledger_file=None,
     ):
+        """
+        registry_cache_file: str [default: None],
+            file caching the dois registered for this client (see `doi_registry`),
+            defaults to 'datacite-registry-<user>.json' in the user cache folder.
+        ledger_file: str [default: None],
+            SQLite database of the dois handed out (see `DoiLedger`), operators generating dois for the same
+            client must share it, defaults to 'doi-ledger-<user>.sqlite' in the user cache folder.
+        timeout: float [default: DATACITE_REQUEST_TIMEOUT],
+            seconds to wait for a response of the DataCite API.
+        """
         if secret_password:
             password = get_secret(secret_password)
         self.auth = HTTPBasicAuth(username=user, password=password)
@@ -34,6 +77,38 @@ class DataCiteAPI:
         self.host = host
         self.prefix = prefix
         self.offset = offset
+        self.registry_cache_file = pathlib.Path(
+            registry_cache_file
+            or user_cache_folder() / f"{DATACITE_REGISTRY_CACHE_FILE_PREFIX}{user}.json"
+        )
+        self.ledger = DoiLedger(
+            ledger_file
+            or user_cache_folder() / f"{DOI_LEDGER_FILE_PREFIX}{user}.sqlite"
+        )
+        self.timeout = timeout
+        self.session = self._create_session()
+
+    def _create_session(self):
+        """
+        One session with a connection pool shared by all requests (and threads, see `update_many`).
+        Requests answered with 429 or 5xx are retried with exponential backoff, honouring 'Retry-After'.
+        POST (reserving a doi) is not retried, it is not idempotent.
+        """
+        retry = Retry(
+            total=DATACITE_MAX_RETRIES,
+            backoff_factor=DATACITE_BACKOFF_FACTOR,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET", "PUT", "DELETE"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_maxsize=DATACITE_CONNECTION_POOL_SIZE, max_retries=retry
+        )
+        session = requests.Session()
+        session.auth = self.auth
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
 
     @staticmethod
     def generate_doi_url(package_name: str):
@@ -41,25 +116,45 @@ class DataCiteAPI:
 
     @staticmethod
     def _generate_unused_dois(dois, number_to_generate, prefix, offset):
-        i = 0
-        generated = 0
-        while generated < number_to_generate:
-            _doi = generate_doi(prefix, i, offset)
-            if _doi not in dois:
-                yield _doi
-                generated += 1
-            i += 1
+        # DataCite returns lower case dois, the generated ones are upper case
+        dois = {doi.upper() for doi in dois}
+        return generate_unused_dois(dois, number_to_generate, prefix, offset)
 
     def doi_generate_n_strings_unused(self, n=1, offset=None):
+        """
+        Hands out n dois that are neither registered at DataCite nor handed out before, see `DoiLedger`.
+        DataCite is only asked for its dois if the ledger was not synced for DOI_LEDGER_SYNC_INTERVAL_SECONDS.
+        """
         if offset is None:
             offset = self.offset
-        dois = self.doi_list_fast()
-        return [doi for doi in self._generate_unused_dois(dois, n, self.prefix, offset)]
+        if self.ledger.needs_sync():
+            self.ledger.sync(self.doi_registry())
+        return self.ledger.generate(n, self.prefix, offset)
+
+    def doi_reserve_n(self, n=1, offset=None):
+        """
+        Generates (see `doi_generate_n_strings_unused`) and reserves n dois at DataCite.
+        Dois taken since the last sync are skipped, any other error is raised
+        and the generated dois that were not reserved are released in the ledger.
+        """
+        reserved = []
+        while len(reserved) < n:
+            generated = self.doi_generate_n_strings_unused(n - len(reserved), offset)
+            try:
+                for doi in generated:
+                    try:
+                        self.doi_reserve(doi)
+                        reserved.append(doi)
+                    except DataCiteDoiTakenException:
+                        self.ledger.mark_registered([doi])
+            finally:
+                self.ledger.release(generated)  # only the ones still 'generated'
+        return reserved
 
     def doi_list_via_client(self, client_id=None, page_size=1000, page_number=1):
         if client_id is None:
             client_id = self.username
-        response = requests.get(
+        response = self.session.get(
             url=urljoin(self.host, "dois"),
             headers={"accept": "application/vnd.api+json"},
             params={
@@ -67,7 +162,7 @@ class DataCiteAPI:
                 "page[size]": page_size,
                 "page[number]": page_number,
             },
-            auth=self.auth,
+            timeout=self.timeout,
         )
         response.raise_for_status()
         return response.json()["data"]
@@ -75,7 +170,7 @@ class DataCiteAPI:
     def doi_list_fast(self, client_id=None, page_size=1000, page_number=1):
         if client_id is None:
             client_id = self.username
-        response = requests.get(
+        response = self.session.get(
             url=urljoin(self.host, "dois"),
             headers={"accept": "application/vnd.api+json"},
             params={
@@ -84,12 +179,110 @@ class DataCiteAPI:
                 "page[size]": page_size,
                 "page[number]": page_number,
             },
-            auth=self.auth,
             timeout=5.0,
         )
         response.raise_for_status()
         return [d["id"] for d in response.json()["data"]]
 
+    def _doi_list_page(self, params: dict, url: str | None = None):
+        response = self.session.get(
+            url=url or urljoin(self.host, "dois"),
+            headers={"accept": "application/vnd.api+json"},
+            params=params,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def doi_list_all(
+        self, client_id=None, updated_since=None, page_size=1000, workers=4
+    ) -> set[str]:
+        """
+        Returns all dois of the client, not only the first page.
+        Up to DATACITE_MAX_PAGED_RECORDS the pages are requested concurrently by page number,
+        beyond that DataCite only allows (sequential) cursor pagination.
+        updated_since: str [default: None],
+            ISO 8601 timestamp, only dois created or updated since then are returned.
+        """
+        if client_id is None:
+            client_id = self.username
+        params = {
+            "client-id": client_id,
+            "fields[dois]": "doi",
+            "page[size]": page_size,
+        }
+        if updated_since:
+            params["query"] = f"updated:[{updated_since} TO *]"
+
+        first = self._doi_list_page({**params, "page[number]": 1})
+        dois = {d["id"] for d in first["data"]}
+        total = first["meta"]["total"]
+
+        if total <= DATACITE_MAX_PAGED_RECORDS:
+            pages = range(2, math.ceil(total / page_size) + 1)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                for page in executor.map(
+                    lambda n: self._doi_list_page({**params, "page[number]": n}), pages
+                ):
+                    dois.update(d["id"] for d in page["data"])
+            return dois
+
+        page = self._doi_list_page({**params, "page[cursor]": 1})
+        while True:
+            dois.update(d["id"] for d in page["data"])
+            next_url = page.get("links", {}).get("next")
+            if not next_url or not page["data"]:
+                break
+            page = self._doi_list_page({}, url=next_url)
+        return dois
+
+    def doi_registry(self, refresh: bool = True) -> set[str]:
+        """
+        Set of all dois registered for the client, cached in `registry_cache_file`.
+        The first call lists all dois, later calls only request the dois updated since the
+        last refresh (with an overlap of DATACITE_REGISTRY_REFRESH_OVERLAP_SECONDS for clock skew).
+        Dois are never removed from the cache, so a deleted draft doi is not generated again.
+        """
+        try:
+            with self.registry_cache_file.open() as f:
+                cache = json.load(f)
+            if cache.get("host") != self.host or cache.get("user") != self.username:
+                cache = None
+        except (FileNotFoundError, ValueError):
+            cache = None
+
+        if cache is not None and not refresh:
+            return set(cache["dois"])
+
+        started = datetime.now(timezone.utc)
+        if cache is None:
+            LOGGER.info("... listing all registered dois.")
+            dois = self.doi_list_all()
+        else:
+            since = datetime.fromisoformat(cache["updated"]) - timedelta(
+                seconds=DATACITE_REGISTRY_REFRESH_OVERLAP_SECONDS
+            )
+            dois = set(cache["dois"]) | self.doi_list_all(
+                updated_since=since.strftime("%Y-%m-%dT%H:%M:%SZ")
+            )
+
+        try:
+            self.registry_cache_file.parent.mkdir(exist_ok=True, parents=True)
+            atomic_write(
+                json.dumps(
+                    {
+                        "host": self.host,
+                        "user": self.username,
+                        "updated": started.isoformat(),
+                        "dois": sorted(dois),
+                    }
+                ),
+                self.registry_cache_file,
+            )
+        except OSError as error:
+            LOGGER.warning(f"... the doi registry cache could not be written: {error}")
+        return dois
+
     def _filter(self, record):
         # print("\tFiltering {}".format(record["doi"]))
         authors = record.get("creators")
@@ -111,44 +304,72 @@ class DataCiteAPI:
         return newrecord
 
     def doi_reserve(self, doi):
-        response = requests.post(
+        response = self.session.post(
             url=urljoin(self.host, "dois"),
             headers={"accept": "application/vnd.api+json"},
             json={"data": {"type": "dois", "attributes": {"doi": doi}}},
-            auth=self.auth,
+            timeout=self.timeout,
         )
 
+        if response.status_code == 422 and DATACITE_DOI_TAKEN_MESSAGE in response.text:
+            raise DataCiteDoiTakenException(
+                f"The DOI '{doi}' you are trying to reserve already exists!"
+            )
         requests_raise_add(
-            response, 422, f"The DOI '{doi}' you are trying to reserve already exists!"
+            response, 422, f"The DOI '{doi}' could not be reserved: {response.text}"
         )
+        self.ledger.mark_reserved([doi])
 
         return response
 
     # This updates a DOI that already exists (reserved)
-    def doi_update(self, doi, url, metadata_xml_file, return_response=False):
-        with open(metadata_xml_file, "rb") as f:
-            xml = f.read()
-        xml64 = b64encode(xml).decode()
+    def doi_update(self, doi, url, metadata_xml_file=None, return_response=False):
+        """Without a metadata_xml_file only the url of the doi is updated."""
+        attributes = {"doi": doi, "url": url}
+        if metadata_xml_file is not None:
+            with open(metadata_xml_file, "rb") as f:
+                attributes["xml"] = b64encode(f.read()).decode()
 
-        response = requests.put(
+        response = self.session.put(
             url=urljoin(self.host, f"dois/{doi}"),
             headers={"accept": "application/vnd.api+json"},
-            json={
-                "data": {
-                    "id": doi,
-                    "type": "dois",
-                    "attributes": {"doi": doi, "url": url, "xml": xml64},
-                }
-            },
-            auth=self.auth,
+            json={"data": {"id": doi, "type": "dois", "attributes": attributes}},
+            timeout=self.timeout,
         )
         response.raise_for_status()
         if return_response:
             return response.json()["data"]
         return response.ok
 
+    def update_many(self, records: list[dict], workers: int = 8) -> list[dict]:
+        """
+        Updates many dois concurrently over the shared session, e.g. to point them to a new domain.
+        records: list[dict],
+            {"doi": str, "url": str, "metadata_xml_file": path (optional)},
+            without a metadata_xml_file only the url is updated.
+        workers: int [default: 8],
+            concurrent requests, more than DATACITE_CONNECTION_POOL_SIZE do not help.
+        Returns {"doi", "ok", "error"} per record in the order of the records,
+        a failing doi (after its retries) does not stop the others.
+        """
+
+        def update(record):
+            try:
+                self.doi_update(
+                    doi=record["doi"],
+                    url=record["url"],
+                    metadata_xml_file=record.get("metadata_xml_file"),
+                )
+                return {"doi": record["doi"], "ok": True, "error": None}
+            except (requests.RequestException, OSError) as e:
+                LOGGER.error(f"... updating '{record['doi']}' failed: {e}")
+                return {"doi": record["doi"], "ok": False, "error": str(e)}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(update, records))
+
     def doi_publish(self, doi, return_response=False):
-        response = requests.put(
+        response = self.session.put(
             url=urljoin(self.host, f"dois/{doi}"),
             headers={"accept": "application/vnd.api+json"},
             json={
@@ -158,7 +379,7 @@ class DataCiteAPI:
                     "attributes": {"doi": doi, "event": "publish"},
                 }
             },
-            auth=self.auth,
+            timeout=self.timeout,
         )
         response.raise_for_status()
 
@@ -167,10 +388,10 @@ class DataCiteAPI:
         return response.ok
 
     def doi_retrieve(self, doi):
-        response = requests.get(
+        response = self.session.get(
             url=urljoin(self.host, f"dois/{doi}"),
             headers={"accept": "application/vnd.api+json"},
-            auth=self.auth,
+            timeout=self.timeout,
         )
 
         requests_raise_add(
@@ -180,10 +401,10 @@ class DataCiteAPI:
         return response.json()["data"]
 
     def doi_delete(self, doi, return_response=False):
-        response = requests.delete(
+        response = self.session.delete(
             url=urljoin(self.host, f"dois/{doi}"),
             headers={"accept": "application/vnd.api+json"},
-            auth=self.auth,
+            timeout=self.timeout,
         )
 
         requests_raise_add(
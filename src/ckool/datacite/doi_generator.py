@@ -22,8 +22,22 @@ Options:
   -r, --reverse   Returns offset and internal ID belonging to <doi>.
 
 """
+
 import base32_crockford as b32
 
+MAXI = 29020051
+RANGESIZE = int(2e6)
+OFFSETS = range(0, MAXI - RANGESIZE + 2, RANGESIZE)
+
+# Lookup tables for the batch functions: every suffix is 5 base32 symbols and a check symbol,
+# the 25 bits of the encoded integer are split into 5 + 10 + 10 bits.
+_SYMBOLS = b32.symbols
+_CHECK_SYMBOLS = b32.symbols + b32.check_symbols
+_PAIRS = [a + b for a in _SYMBOLS for b in _SYMBOLS]
+_PAIR_VALUES = {pair: i for i, pair in enumerate(_PAIRS)}
+_SYMBOL_VALUES = {symbol: i for i, symbol in enumerate(_CHECK_SYMBOLS)}
+_DATA_SYMBOL_VALUES = {symbol: i for i, symbol in enumerate(_SYMBOLS)}
+
 
 def generate_doi(prefix, intid, offset, url=False):
     """Generates a DOI based on Crockford's base32
@@ -53,10 +67,6 @@ def generate_doi(prefix, intid, offset, url=False):
     with room for 2e6 suffixes. OK, we waste 1.020052 mio suffixes here.
 
     """
-    MAXI = 29020051
-    RANGESIZE = int(2e6)
-    OFFSETS = range(0, MAXI - RANGESIZE + 2, RANGESIZE)
-
     intid = int(intid)
     offset = int(offset)
     ## Avoid overlapping ranges for different datacenters
@@ -116,3 +126,86 @@ def revert_doi(doi):
     offset = int(batch * 2e6)
     intid = intid - offset
     return {"prefix": prefix, "offset": offset, "intid": intid}
+
+
+def generate_dois(prefix, start, stop, offset, url=False):
+    """
+    Batch version of `generate_doi` for the internal IDs range(start, stop),
+    the suffixes are assembled from precomputed tables instead of being encoded one by one.
+
+    Returns:
+        A list of DOIs, identical to [generate_doi(prefix, i, offset, url) for i in range(start, stop)]
+    """
+    start, stop, offset = int(start), int(stop), int(offset)
+    if not (0 <= start and stop <= RANGESIZE):
+        raise ValueError(f"The internal IDs must be in [0, {RANGESIZE}).")
+    if offset not in OFFSETS:
+        raise ValueError(f"The offset '{offset}' is not one of {list(OFFSETS)}.")
+
+    head = "{}{}/".format("https://doi.org/" if url else "", prefix)
+    dois = []
+    for intid in range(start + offset, stop + offset):
+        i = 37 * (intid >> 5) + (intid & 31)
+        dois.append(
+            head
+            + _SYMBOLS[i >> 20]
+            + _PAIRS[(i >> 10) & 1023]
+            + _PAIRS[i & 1023]
+            + _CHECK_SYMBOLS[i % 37]
+        )
+    return dois
+
+
+def revert_dois(dois):
+    """
+    Batch version of `revert_doi`, decoding the suffixes with precomputed tables.
+
+    Returns:
+        A list of {"prefix", "offset", "intid"}, in the order of the DOIs.
+    """
+    reverted = []
+    for doi in dois:
+        prefix, _, encoded = doi.rpartition("/")
+        symbols = encoded.translate(b32.normalize_symbols).upper()
+        try:
+            if "/" in prefix or len(symbols) != 6:
+                raise KeyError(doi)
+            i = (
+                (_DATA_SYMBOL_VALUES[symbols[0]] << 20)
+                + (_PAIR_VALUES[symbols[1:3]] << 10)
+                + _PAIR_VALUES[symbols[3:5]]
+            )
+        except KeyError:  # not a 6 symbol suffix, handled (or rejected) as usual
+            reverted.append(revert_doi(doi))
+            continue
+        if _SYMBOL_VALUES.get(symbols[5]) != i % 37:
+            raise ValueError(f"invalid check symbol '{symbols[5]}' for DOI '{doi}'")
+        intid = 32 * (i // 37) + i % 37
+        offset = intid // RANGESIZE * RANGESIZE
+        reverted.append(
+            {"prefix": prefix or None, "offset": offset, "intid": intid - offset}
+        )
+    return reverted
+
+
+def generate_unused_dois(existing, number_to_generate, prefix, offset):
+    """
+    Yields the first number_to_generate DOIs of the offset that are not in existing (a set of upper case DOIs),
+    candidates are generated in blocks with `generate_dois`.
+    """
+    start = 0
+    generated = 0
+    block = max(number_to_generate, 1024)
+    while generated < number_to_generate:
+        stop = min(start + block, RANGESIZE)
+        if start >= stop:
+            raise ValueError(
+                f"All dois of the offset '{offset}' are in use, use another offset."
+            )
+        for doi in generate_dois(prefix, start, stop, offset):
+            if doi.upper() not in existing:
+                yield doi
+                generated += 1
+                if generated == number_to_generate:
+                    return
+        start = stop
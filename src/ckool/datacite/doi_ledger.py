@@ -0,0 +1,142 @@
+import getpass
+import pathlib
+import sqlite3
+import time
+from contextlib import closing
+from typing import Iterable
+
+from ckool import CACHE_DATABASE_TIMEOUT, DOI_LEDGER_SYNC_INTERVAL_SECONDS, LOGGER
+
+from .doi_generator import generate_unused_dois
+
+
+class DoiLedger:
+    """
+    Local record of the dois handed out for a DataCite client, in a SQLite database.
+    Each doi has a state: 'generated' (handed out), 'reserved' (reserved at DataCite by ckool)
+    or 'registered' (known to DataCite, merged in by `sync`).
+    Generating takes the write lock of the database (BEGIN IMMEDIATE) for reading the used dois and
+    recording the new ones, so concurrent generations (threads or processes sharing the file) wait for each other
+    and never hand out the same doi. Generating needs no request to DataCite.
+    """
+
+    def __init__(self, database: pathlib.Path):
+        self.database = pathlib.Path(database)
+
+    def _connect(self):
+        self.database.parent.mkdir(exist_ok=True, parents=True)
+        connection = sqlite3.connect(
+            self.database, timeout=CACHE_DATABASE_TIMEOUT, isolation_level=None
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS dois ("
+            "doi TEXT PRIMARY KEY, state TEXT NOT NULL, "
+            "operator TEXT, time REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        return connection
+
+    def __len__(self):
+        with closing(self._connect()) as connection:
+            return connection.execute("SELECT COUNT(*) FROM dois").fetchone()[0]
+
+    def entries(self) -> dict:
+        with closing(self._connect()) as connection:
+            return {
+                doi: {"state": state, "operator": operator, "time": time_}
+                for doi, state, operator, time_ in connection.execute(
+                    "SELECT doi, state, operator, time FROM dois ORDER BY doi"
+                )
+            }
+
+    def last_sync(self) -> float | None:
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT value FROM meta WHERE key = 'last_sync'"
+            ).fetchone()
+        return None if row is None else float(row[0])
+
+    def needs_sync(self, max_age: float = DOI_LEDGER_SYNC_INTERVAL_SECONDS):
+        last_sync = self.last_sync()
+        return last_sync is None or time.time() - last_sync > max_age
+
+    def mark_registered(self, dois: Iterable[str]):
+        """Returns the number of dois the ledger did not know before."""
+        now = time.time()
+        with closing(self._connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            before = connection.execute("SELECT COUNT(*) FROM dois").fetchone()[0]
+            connection.executemany(
+                "INSERT INTO dois (doi, state, operator, time) VALUES (?, 'registered', NULL, ?) "
+                "ON CONFLICT (doi) DO UPDATE SET state = 'registered', time = excluded.time "
+                "WHERE state != 'registered'",
+                [(doi.upper(), now) for doi in dois],
+            )
+            after = connection.execute("SELECT COUNT(*) FROM dois").fetchone()[0]
+            connection.execute("COMMIT")
+        return after - before
+
+    def sync(self, registered: Iterable[str]):
+        """
+        Marks all dois registered at DataCite (e.g. `DataCiteAPI.doi_registry`) as 'registered'
+        and remembers the time of the sync (see `needs_sync`).
+        """
+        new = self.mark_registered(registered)
+        with closing(self._connect()) as connection:
+            connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('last_sync', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (str(time.time()),),
+            )
+        LOGGER.info(f"... doi ledger synced, {new} new registered doi(s).")
+        return new
+
+    def generate(
+        self, n: int, prefix: str, offset: int, operator: str | None = None
+    ) -> list[str]:
+        """Hands out the first n dois of the offset which are not in the ledger and records them as 'generated'."""
+        operator = operator or getpass.getuser()
+        with closing(self._connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                used = {doi for (doi,) in connection.execute("SELECT doi FROM dois")}
+                dois = list(generate_unused_dois(used, n, prefix, offset))
+                now = time.time()
+                connection.executemany(
+                    "INSERT INTO dois (doi, state, operator, time) VALUES (?, 'generated', ?, ?)",
+                    [(doi.upper(), operator, now) for doi in dois],
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return dois
+
+    def mark_reserved(self, dois: Iterable[str], operator: str | None = None):
+        operator = operator or getpass.getuser()
+        now = time.time()
+        with closing(self._connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT INTO dois (doi, state, operator, time) VALUES (?, 'reserved', ?, ?) "
+                "ON CONFLICT (doi) DO UPDATE SET state = 'reserved', "
+                "operator = excluded.operator, time = excluded.time",
+                [(doi.upper(), operator, now) for doi in dois],
+            )
+            connection.execute("COMMIT")
+
+    def release(self, dois: Iterable[str]):
+        """
+        Hands generated dois that were never used back, they can be generated again.
+        Reserved and registered dois are kept, a deleted draft doi is not handed out again.
+        """
+        with closing(self._connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "DELETE FROM dois WHERE doi = ? AND state = 'generated'",
+                [(doi.upper(),) for doi in dois],
+            )
+            connection.execute("COMMIT")
@@ -1,16 +1,23 @@
+import concurrent.futures
+import hashlib
 import json
+import os
 import pathlib
 import re
 import shutil
 
 from ckool import (
     LOCAL_DOI_STORE_AFFILIATION_FILE_NAME,
+    LOCAL_DOI_STORE_AUDIT_CACHE_FILE_PREFIX,
     LOCAL_DOI_STORE_DOI_FILE_NAME,
     LOCAL_DOI_STORE_FOLDERS_TO_IGNORE,
+    LOCAL_DOI_STORE_INDEX_FILE_PREFIX,
     LOCAL_DOI_STORE_METADATA_XML_FILE_NAME,
     LOCAL_DOI_STORE_ORCIDS_FILE_NAME,
     LOCAL_DOI_STORE_RELATED_PUBLICATIONS_FILE_NAME,
+    LOGGER,
 )
+from ckool.other.caching import atomic_write, user_cache_folder
 
 
 def _iter_dir(path: pathlib.Path):
@@ -35,7 +42,54 @@ def retrieve_doi_from_doi_file(package_name: str, file: pathlib.Path):
     return dois[0]
 
 
+def _list_files(path: pathlib.Path):
+    """
+    Relative posix paths of all files below path, files directly in path come first,
+    and the mtimes of all folders below path (the listing changes only if one of them changes).
+    """
+    files, mtimes = [], {}
+    for root, _, filenames in os.walk(path):
+        relative = pathlib.Path(root).relative_to(path)
+        mtimes[relative.as_posix()] = os.stat(root).st_mtime_ns
+        files.extend((relative / filename).as_posix() for filename in sorted(filenames))
+    return files, mtimes
+
+
+def _audit_folder(folder: pathlib.Path, cached: dict, doi_filename: str):
+    """
+    Reads the doi file of every package in folder.
+    Packages whose doi file has the same mtime as in `cached` are not read again.
+    """
+    result = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            doi_file = pathlib.Path(entry.path) / doi_filename
+            try:
+                mtime = doi_file.stat().st_mtime_ns
+            except FileNotFoundError:
+                result[entry.name] = {"mtime": None, "doi": None, "error": "missing"}
+                continue
+            if (previous := cached.get(entry.name)) and previous["mtime"] == mtime:
+                result[entry.name] = previous
+                continue
+            try:
+                doi, error = retrieve_doi_from_doi_file(entry.name, doi_file), None
+            except ValueError as e:
+                doi, error = None, str(e)
+            result[entry.name] = {"mtime": mtime, "doi": doi, "error": error}
+    return result
+
+
 class LocalDoiStore:
+    """
+    The store is organized as '<name>/<package>/<files>'.
+    Lookups use an index (package -> name, files) kept in the user cache folder, one per store.
+    Only folders whose mtime changed since the index was written are scanned again,
+    so a lookup costs a few stat calls instead of walking the whole store.
+    """
+
     def __init__(
         self,
         path: str | pathlib.Path,
@@ -43,30 +97,133 @@ class LocalDoiStore:
     ):
         self.path = pathlib.Path(path) if isinstance(path, str) else path
         self.ignore = top_folders_to_ignore
-        self.doi_store_package_location = {}
+        self._index = None
         if not self.path.exists():
             raise ValueError(f"The path your provided '{path}' does not exist.")
+        self.store_id = hashlib.sha1(
+            self.path.resolve().as_posix().encode("utf-8")
+        ).hexdigest()[:16]
+        self.index_file = (
+            user_cache_folder()
+            / f"{LOCAL_DOI_STORE_INDEX_FILE_PREFIX}{self.store_id}.json"
+        )
+        self.audit_file = (
+            user_cache_folder()
+            / f"{LOCAL_DOI_STORE_AUDIT_CACHE_FILE_PREFIX}{self.store_id}.json"
+        )
 
-    def _find_doi_store_package_location(self, package_name):
-        if path := self.doi_store_package_location.get(package_name):
-            return path
-
-        found_name = None
-        for name in self.path.iterdir():
-            if name.is_file():
+    @staticmethod
+    def _mtime(path: pathlib.Path):
+        return path.stat().st_mtime_ns
+
+    def _load_index(self):
+        try:
+            with self.index_file.open() as f:
+                index = json.load(f)
+            if not {"root", "folders", "packages"} <= index.keys():
+                raise ValueError
+        except (FileNotFoundError, ValueError):  # json errors are ValueErrors
+            index = {"root": None, "folders": {}, "packages": {}}
+        return index
+
+    def _save_index(self):
+        try:
+            self.index_file.parent.mkdir(exist_ok=True, parents=True)
+            atomic_write(json.dumps(self._index), self.index_file)
+        except OSError as error:  # e.g. a read only store, the index is kept in memory
+            LOGGER.warning(f"... the doi store index could not be written: {error}")
+
+    def _index_package(self, name: str, package: str):
+        files, mtimes = _list_files(self.path / name / package)
+        self._index["packages"][package] = {
+            "name": name,
+            "mtimes": mtimes,
+            "files": files,
+        }
+
+    def _index_folder(self, name: str):
+        packages = self._index["packages"]
+        for package in [p for p, entry in packages.items() if entry["name"] == name]:
+            del packages[package]
+        folder = self.path / name
+        for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+            if not entry.is_dir():
                 continue
-            for package in name.iterdir():
-                if package.name == package_name:
-                    found_name = name
-                    break
-        if found_name is None:
+            if entry.name in packages:
+                LOGGER.warning(
+                    f"... the package '{entry.name}' exists in '{packages[entry.name]['name']}' "
+                    f"and '{name}', using the first one."
+                )
+                continue
+            self._index_package(name, entry.name)
+        self._index["folders"][name] = self._mtime(folder)
+
+    def refresh_index(self, force: bool = False):
+        """Rescans the top-level folders whose mtime changed (all of them if force is set)."""
+        if self._index is None:
+            self._index = self._load_index()
+        index = self._index
+        changed = False
+
+        root_mtime = self._mtime(self.path)
+        if force or index["root"] != root_mtime:
+            current = sorted(
+                entry.name
+                for entry in os.scandir(self.path)
+                if entry.is_dir() and entry.name not in self.ignore
+            )
+            for name in set(index["folders"]) - set(current):
+                del index["folders"][name]
+                for package in [
+                    p for p, e in index["packages"].items() if e["name"] == name
+                ]:
+                    del index["packages"][package]
+            for name in current:
+                index["folders"].setdefault(name, None)
+            index["root"] = root_mtime
+            changed = True
+
+        for name, mtime in sorted(index["folders"].items()):
+            if force or self._mtime(self.path / name) != mtime:
+                self._index_folder(name)
+                changed = True
+
+        if changed:
+            self._save_index()
+        return index
+
+    def _is_stale(self, entry: dict, package_name: str):
+        package_path = self.path / entry["name"] / package_name
+        try:
+            return any(
+                self._mtime(package_path / folder) != mtime
+                for folder, mtime in entry.get("mtimes", {".": None}).items()
+            )
+        except FileNotFoundError:  # a sub folder was removed
+            return True
+
+    def _package_entry(self, package_name: str):
+        if self._index is None:
+            self.refresh_index()
+        entry = self._index["packages"].get(package_name)
+        if entry is None or not (self.path / entry["name"] / package_name).is_dir():
+            entry = self.refresh_index()["packages"].get(package_name)
+            if entry is None:
+                return None
+
+        if self._is_stale(entry, package_name):
+            self._index_package(entry["name"], package_name)
+            self._save_index()
+            entry = self._index["packages"][package_name]
+        return entry
+
+    def _find_doi_store_package_location(self, package_name):
+        entry = self._package_entry(package_name)
+        if entry is None:
             raise ValueError(
                 f"The package '{package_name}' you're referring to can not be found in the datastore."
             )
-        self.doi_store_package_location[package_name] = (
-            self.path / found_name / package_name
-        )
-        return self.doi_store_package_location.get(package_name)
+        return self.path / entry["name"] / package_name
 
     def generate_xml_filepath(self, package_name) -> pathlib.Path:
         return (
@@ -92,6 +249,87 @@ class LocalDoiStore:
             / LOCAL_DOI_STORE_RELATED_PUBLICATIONS_FILE_NAME
         )
 
+    def audit(
+        self,
+        registered_dois: set[str] | None = None,
+        workers: int = 8,
+        doi_filename: str = LOCAL_DOI_STORE_DOI_FILE_NAME,
+    ):
+        """
+        Validates the doi file of every package, the top-level folders are scanned in parallel.
+        Results are cached in the user cache folder per doi file mtime,
+        so only new or modified doi files are read on the next audit.
+        registered_dois: set [default: None],
+            DOIs registered at DataCite, if provided they are cross-checked against the store.
+        Returns a report with the packages without or with an invalid doi file,
+        DOIs used by several packages and, for registered_dois, the mismatches in both directions.
+        """
+        try:
+            with self.audit_file.open() as f:
+                cache = json.load(f)
+        except (FileNotFoundError, ValueError):
+            cache = {}
+
+        folders = sorted(
+            entry.name
+            for entry in os.scandir(self.path)
+            if entry.is_dir() and entry.name not in self.ignore
+        )
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            results = dict(
+                zip(
+                    folders,
+                    executor.map(
+                        lambda name: _audit_folder(
+                            self.path / name, cache.get(name, {}), doi_filename
+                        ),
+                        folders,
+                    ),
+                )
+            )
+
+        if results != cache:
+            try:
+                self.audit_file.parent.mkdir(exist_ok=True, parents=True)
+                atomic_write(json.dumps(results), self.audit_file)
+            except OSError as error:
+                LOGGER.warning(f"... the audit cache could not be written: {error}")
+
+        report = {
+            "packages": 0,
+            "missing_doi_file": [],
+            "invalid_doi_file": {},
+            "duplicate_dois": {},
+        }
+        packages_per_doi = {}
+        for name, packages in sorted(results.items()):
+            for package, result in sorted(packages.items()):
+                location = f"{name}/{package}"
+                report["packages"] += 1
+                if result["error"] == "missing":
+                    report["missing_doi_file"].append(location)
+                elif result["error"]:
+                    report["invalid_doi_file"][location] = result["error"]
+                else:
+                    packages_per_doi.setdefault(result["doi"].lower(), []).append(
+                        location
+                    )
+        report["duplicate_dois"] = {
+            doi: locations
+            for doi, locations in packages_per_doi.items()
+            if len(locations) > 1
+        }
+
+        if registered_dois is not None:
+            registered = {doi.lower() for doi in registered_dois}
+            report["not_registered"] = {
+                doi: locations
+                for doi, locations in packages_per_doi.items()
+                if doi not in registered
+            }
+            report["not_in_store"] = sorted(registered - set(packages_per_doi))
+        return report
+
     def parse(self):
         basic_map = {"other": []}
         for file in _iter_dir(self.path):
@@ -116,12 +354,12 @@ class LocalDoiStore:
         return basic_map
 
     def _find_file(self, package_name: str, filename: str, raise_error: bool = True):
-        found = False
-        for file in _iter_dir(self.path):
-            if package_name in file.as_posix() and file.name == filename:
-                return file
+        if entry := self._package_entry(package_name):
+            for file in entry["files"]:
+                if pathlib.PurePosixPath(file).name == filename:
+                    return self.path / entry["name"] / package_name / file
 
-        if not found and raise_error:
+        if raise_error:
             raise FileNotFoundError(
                 f"No doi file '{filename}' for package '{package_name}' could be found."
             )
@@ -134,7 +372,6 @@ class LocalDoiStore:
         return None
 
     def get_doi(self, package_name: str, filename: str = LOCAL_DOI_STORE_DOI_FILE_NAME):
-        # TODO improve, dont search is doi store package dir was already detected.
         file = self._find_file(package_name, filename, raise_error=True)
         return retrieve_doi_from_doi_file(package_name, file)
 
@@ -216,4 +453,9 @@ class LocalDoiStore:
                     f.write(content)
 
                 written.append(dst)
+
+        if self._index is not None:
+            self.refresh_index()
+            self._index_package(name, package)
+            self._save_index()
         return written
@@ -8,6 +8,7 @@ from rich.prompt import Prompt
 
 from ckool import PUBLISHER
 from ckool.interfaces.dora import Dora
+from ckool.other.caching import atomic_write
 from ckool.other.metadata_tools import prepare_metadata_for_publication_package
 
 
@@ -511,7 +512,6 @@ class MetaDataFormatter:
         funcnames = ["xs_{}".format(e[1]) for e in self.elements()]
         for f in funcnames:
             getattr(self, f)()
-        with open(self.outfile, "w") as f_out:
-            json.dump(self.output, f_out, indent=2)
+        atomic_write(json.dumps(self.output, indent=2), pathlib.Path(self.outfile))
 
         return self.output
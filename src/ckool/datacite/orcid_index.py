@@ -0,0 +1,152 @@
+import concurrent.futures
+import json
+import pathlib
+import time
+
+from ckool import (
+    LOCAL_DOI_STORE_AUTHOR_ORCID_INDEX_FILE_PREFIX,
+    LOCAL_DOI_STORE_ORCID_SEARCH_TTL,
+    LOCAL_DOI_STORE_ORCIDS_FILE_NAME,
+    LOGGER,
+)
+from ckool.datacite.doi_store import LocalDoiStore
+from ckool.other.caching import atomic_write, user_cache_folder
+
+
+def normalize_author(author: str):
+    return " ".join(author.split()).casefold()
+
+
+def _orcid_result(orcid: str):
+    """Same format as the results of 'search_orcid_by_author'."""
+    return {"id": orcid, "url": f"https://orcid.org/{orcid}"}
+
+
+def _read_orcids(file: pathlib.Path):
+    try:
+        with file.open() as f:
+            orcids = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return orcids if isinstance(orcids, dict) else {}
+
+
+class AuthorOrcidIndex:
+    """
+    Maps author names ('Last, First') to ORCiDs.
+    It is filled from the accepted answers in the orcids.json of every package in the local doi store
+    and from ORCiD searches that found exactly one person (used as proposals only, accepted answers win,
+    and only for `search_ttl` seconds, after which the author is searched again).
+    Stored in the user cache folder next to the store's index, an orcids.json is only read again if its mtime changed.
+    """
+
+    def __init__(
+        self,
+        local_doi_store: LocalDoiStore,
+        orcids_filename: str = LOCAL_DOI_STORE_ORCIDS_FILE_NAME,
+        workers: int = 8,
+        search_ttl: float = LOCAL_DOI_STORE_ORCID_SEARCH_TTL,
+    ):
+        self.lds = local_doi_store
+        self.orcids_filename = orcids_filename
+        self.workers = workers
+        self.search_ttl = search_ttl
+        self.file = (
+            user_cache_folder()
+            / f"{LOCAL_DOI_STORE_AUTHOR_ORCID_INDEX_FILE_PREFIX}{self.lds.store_id}.json"
+        )
+        self.data = None
+        self.accepted = {}
+
+    def _load(self):
+        try:
+            with self.file.open() as f:
+                data = json.load(f)
+            if not {"packages", "searched"} <= data.keys():
+                raise ValueError
+        except (FileNotFoundError, ValueError):
+            data = {"packages": {}, "searched": {}}
+        return data
+
+    def _save(self):
+        try:
+            self.file.parent.mkdir(exist_ok=True, parents=True)
+            atomic_write(json.dumps(self.data), self.file)
+        except OSError as error:
+            LOGGER.warning(f"... the author orcid index could not be written: {error}")
+
+    def refresh(self):
+        if self.data is None:
+            self.data = self._load()
+        packages = self.data["packages"]
+
+        current = {}
+        for package, entry in self.lds.refresh_index()["packages"].items():
+            if self.orcids_filename in entry["files"]:
+                file = self.lds.path / entry["name"] / package / self.orcids_filename
+                current[f"{entry['name']}/{package}"] = file
+
+        removed = [p for p in packages if p not in current]
+        for location in removed:
+            del packages[location]
+
+        to_read = {}
+        for location, file in current.items():
+            mtime = file.stat().st_mtime_ns
+            if (cached := packages.get(location)) is None or cached["mtime"] != mtime:
+                to_read[location] = (file, mtime)
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers
+        ) as executor:
+            for location, orcids in zip(
+                to_read,
+                executor.map(_read_orcids, [file for file, _ in to_read.values()]),
+            ):
+                packages[location] = {"mtime": to_read[location][1], "orcids": orcids}
+
+        self.accepted = {}
+        for entry in packages.values():
+            for author, orcid in entry["orcids"].items():
+                self.accepted.setdefault(normalize_author(author), set()).add(orcid)
+
+        if removed or to_read:
+            self._save()
+        return self
+
+    def lookup(self, author: str) -> list[dict] | None:
+        """
+        Returns the known ORCiDs of the author in the format of 'search_orcid_by_author',
+        or None if the author is unknown (a search is needed).
+        """
+        if self.data is None:
+            self.refresh()
+        key = normalize_author(author)
+        if orcids := self.accepted.get(key):
+            return [_orcid_result(orcid) for orcid in sorted(orcids)]
+        if searched := self.data["searched"].get(key):
+            if isinstance(searched, dict) and searched["expires"] > time.time():
+                return searched["found"]
+        return None
+
+    def add_search_results(self, results: dict[str, list]):
+        """Keeps the searches that found exactly one person as proposals for the next lookups."""
+        if self.data is None:
+            self.refresh()
+        now = time.time()
+        searched = {
+            key: entry
+            for key, entry in self.data["searched"].items()
+            if isinstance(entry, dict) and entry["expires"] > now
+        }
+        expired = len(searched) < len(self.data["searched"])
+        added = False
+        for author, found in results.items():
+            if len(found) == 1:
+                searched[normalize_author(author)] = {
+                    "expires": now + self.search_ttl,
+                    "found": found,
+                }
+                added = True
+        self.data["searched"] = searched
+        if added or expired:
+            self._save()
@@ -1,44 +1,106 @@
+import functools
+import hashlib
+import json
 import os
 import pathlib
 import xml.etree.ElementTree as ET
 from pathlib import Path
 
+from ckool import LOGGER
+from ckool.other.caching import atomic_write, user_cache_folder
+
 SCHEMAS = Path(__file__).parent / "schema" / "datacite"
 SCHEMA_FILES = sorted(list(SCHEMAS.iterdir()))
 SCHEMA_LATEST = SCHEMA_FILES[-1]
+SCHEMA_MODEL_VERSION = 2  # increase when the structure of the compiled model changes
 
+NAMESPACES = {"xs": "http://www.w3.org/2001/XMLSchema"}
 
-class SchemaParser:
-    def __init__(self, path: pathlib.Path = SCHEMAS / SCHEMA_LATEST):
-        self.path = path
-        self.namespaces = {"xs": "http://www.w3.org/2001/XMLSchema"}
-        self.data = self._parse_xsd_with_included(path, self.namespaces)
 
-    @staticmethod
-    def _parse_xsd_with_included(xsd_path, namespaces):
-        tree = ET.parse(xsd_path)
-        root = tree.getroot()
+def _parse_xsd_with_included(xsd_path, namespaces=NAMESPACES):
+    tree = ET.parse(xsd_path)
+    root = tree.getroot()
 
-        for include in root.findall("xs:include", namespaces):
-            schema_location = include.get("schemaLocation")
-            included_xsd_path = os.path.join(os.path.dirname(xsd_path), schema_location)
+    for include in root.findall("xs:include", namespaces):
+        schema_location = include.get("schemaLocation")
+        included_xsd_path = os.path.join(os.path.dirname(xsd_path), schema_location)
 
-            included_tree = ET.parse(included_xsd_path)
-            included_root = included_tree.getroot()
+        included_tree = ET.parse(included_xsd_path)
+        included_root = included_tree.getroot()
 
-            for child in included_root:
-                root.append(child)
-        return root
+        for child in included_root:
+            root.append(child)
+    return root
 
-    def get_schema_choices(self, name: str = "resourceType"):
-        resource_type_element = self.data.find(
-            f".//xs:simpleType[@name='{name}'][@id='{name}']", self.namespaces
-        )
-        restriction_element = resource_type_element.find(
-            "xs:restriction", self.namespaces
-        )
-
-        return [
+
+def schema_hash(xsd_path: pathlib.Path):
+    """Hash of the schema file and the files it includes."""
+    xsd_path = pathlib.Path(xsd_path)
+    content = xsd_path.read_bytes()
+    hasher = hashlib.sha256(content)
+    for include in ET.fromstring(content).findall("xs:include", NAMESPACES):
+        hasher.update((xsd_path.parent / include.get("schemaLocation")).read_bytes())
+    return hasher.hexdigest()
+
+
+def compile_schema(xsd_path: pathlib.Path):
+    """
+    Extracts what ckool needs from the schema into plain dicts:
+    enumerations: simpleType name -> allowed values.
+    """
+    root = _parse_xsd_with_included(xsd_path)
+    model = {"enumerations": {}}
+
+    for simple_type in root.iter(f"{{{NAMESPACES['xs']}}}simpleType"):
+        name = simple_type.get("name")
+        restriction = simple_type.find("xs:restriction", NAMESPACES)
+        if name is None or restriction is None:
+            continue
+        values = [
             enum.get("value")
-            for enum in restriction_element.findall("xs:enumeration", self.namespaces)
+            for enum in restriction.findall("xs:enumeration", NAMESPACES)
         ]
+        if values:
+            model["enumerations"][name] = values
+    return model
+
+
+@functools.cache
+def load_schema_model(xsd_path: pathlib.Path = SCHEMA_LATEST):
+    """
+    Compiled schema model, built once per schema version:
+    memoised in the process and stored as json in the user cache folder, keyed by the hash of the schema files.
+    """
+    xsd_path = pathlib.Path(xsd_path)
+    cache_file = (
+        user_cache_folder()
+        / f"{xsd_path.stem}-{schema_hash(xsd_path)[:16]}-v{SCHEMA_MODEL_VERSION}.json"
+    )
+    try:
+        with cache_file.open() as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        pass
+
+    model = compile_schema(xsd_path)
+    try:
+        cache_file.parent.mkdir(exist_ok=True, parents=True)
+        atomic_write(json.dumps(model), cache_file)
+    except OSError as error:
+        LOGGER.warning(f"... the compiled schema could not be cached: {error}")
+    return model
+
+
+class SchemaParser:
+    def __init__(self, path: pathlib.Path = SCHEMAS / SCHEMA_LATEST):
+        self.path = path
+        self.namespaces = NAMESPACES
+        self.model = load_schema_model(pathlib.Path(path))
+
+    @functools.cached_property
+    def data(self):
+        """The merged schema tree, only parsed if needed."""
+        return _parse_xsd_with_included(self.path, self.namespaces)
+
+    def get_schema_choices(self, name: str = "resourceType"):
+        return self.model["enumerations"][name]
@@ -1,10 +1,24 @@
+import functools
 import pathlib
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+from ckool.other.caching import atomic_write
 
 # Register the default namespace
 default_ns = "http://datacite.org/schema/kernel-4"
 ET.register_namespace("", default_ns)
 
+# Prefixes of the namespaces used in DataCite metadata, other namespaces get 'ns0', 'ns1', ...
+NAMESPACE_PREFIXES = {
+    default_ns: "",
+    "http://www.w3.org/XML/1998/namespace": "xml",
+    "http://www.w3.org/2001/XMLSchema-instance": "xsi",
+}
+ATTRIBUTE_ENTITIES = {'"': "&quot;", "\r": "&#13;", "\n": "&#10;", "\t": "&#09;"}
+
 __THIS_FOLDER = pathlib.Path(__file__).parent.resolve()
 
 
@@ -15,9 +29,6 @@ def read_official_datacite_schema(typ):
     datacite4.1
     datacite4.4
     """
-    # Note: xml.etree.ElementTree does not support XML schema validation.
-    # This function will need to be adapted if schema validation is required.
-    # For now, it just loads the schema file.
     if typ in ["datacite4.1", "datacite4.4", "datacite4.5"]:
         with open(
             __THIS_FOLDER / f"schema/datacite/metadata_schema_{typ[-3:]}.xsd", "r"
@@ -30,6 +41,86 @@ def read_official_datacite_schema(typ):
         )
 
 
+class DataCiteSchemaValidationError(ValueError):
+    def __init__(self, typ, errors: list):
+        self.typ = typ
+        self.errors = errors
+        super().__init__(
+            f"The xml is not valid according to the '{typ}' schema:\n"
+            + "\n".join(errors)
+        )
+
+
+@functools.cache
+def load_schema_validator(typ):
+    """
+    Compiles the local datacite schema for the specified type once per process.
+    The import of the xml namespace (xml:lang) is pointed to the local copy in 'include/xml.xsd',
+    so compiling never needs network access (version 4.1 refers to the copy on w3.org).
+    """
+    read_official_datacite_schema(typ)  # raises for unknown types
+    schema_file = __THIS_FOLDER / f"schema/datacite/metadata_schema_{typ[-3:]}.xsd"
+    document = etree.parse(str(schema_file))
+    for _import in document.getroot().iter("{http://www.w3.org/2001/XMLSchema}import"):
+        if _import.get("namespace") == "http://www.w3.org/XML/1998/namespace":
+            _import.set(
+                "schemaLocation",
+                (schema_file.parent / "include" / "xml.xsd").as_uri(),
+            )
+    return etree.XMLSchema(document)
+
+
+def _element_path(document, path: str):
+    """Turns the positional path lxml reports (/*/*[3]/*[1]) into a readable one (/resource/titles/unknownElement)."""
+    found = document.getroottree().xpath(path) if path else []
+    if not found or not isinstance(found[0], etree._Element):
+        return path
+    names = []
+    for element in [found[0], *found[0].iterancestors()]:
+        name = etree.QName(element).localname
+        parent = element.getparent()
+        if parent is not None:
+            siblings = parent.findall(element.tag)
+            if len(siblings) > 1:
+                name += f"[{siblings.index(element) + 1}]"
+        names.append(name)
+    return "/" + "/".join(reversed(names))
+
+
+def _validate_document(document, typ):
+    validator = load_schema_validator(typ)
+    if not validator.validate(document):
+        raise DataCiteSchemaValidationError(
+            typ,
+            [
+                f"{_element_path(document, error.path)} (line {error.line}): {error.message}"
+                for error in validator.error_log
+            ],
+        )
+    return True
+
+
+def validate_xml(xml: str, typ="datacite4.4"):
+    """
+    Validates the xml against the local datacite schema.
+    Raises a DataCiteSchemaValidationError listing the path of every offending element.
+    """
+    try:
+        document = etree.fromstring(xml.encode("utf-8"))
+    except etree.XMLSyntaxError as e:
+        raise DataCiteSchemaValidationError(typ, [str(e)])
+    return _validate_document(document, typ)
+
+
+def validate_xml_file(filepath: pathlib.Path, typ="datacite4.4"):
+    """Same as `validate_xml`, but the file is parsed directly instead of being read into a string first."""
+    try:
+        document = etree.parse(str(filepath)).getroot()
+    except etree.XMLSyntaxError as e:
+        raise DataCiteSchemaValidationError(typ, [str(e)])
+    return _validate_document(document, typ)
+
+
 def generate_attribute_map(typ):
     if typ in ["datacite4.1", "datacite4.4", "datacite4.5"]:
         return {
@@ -56,7 +147,6 @@ class MetaDataToXMLConverter:
         self.typ = typ
         self.meta = metadata
 
-        self.official_datacite_schema = None
         self.attribute_defaults = None
         self.attribute_map = None
         self.root = None
@@ -103,16 +193,120 @@ class MetaDataToXMLConverter:
                 el.append(self._build_tree(d=child))
             return el
 
-    def convert_json_to_xml(self):
-        self.official_datacite_schema = read_official_datacite_schema(self.typ)
+    def _parts(self, d):
+        """Resolves one json-metadata node the same way `_build_tree` does: (tag, attrib, text, tail, children)."""
+        assert len(d) == 1
+        k, v = next(iter(d.items()))
+        tag = k if k.startswith("{") else f"{{{default_ns}}}{k}"
+        attrib = dict(self.attribute_defaults.get(k, {}))
+        if isinstance(v, str):
+            return tag, attrib, v, None, []
+        if isinstance(v, list):
+            return tag, attrib, None, None, v
+        if isinstance(v, dict):
+            att = v.get("att")
+            if att:
+                attrib.update({self.attribute_map.get(k, k): v for k, v in att.items()})
+            return tag, attrib, v.get("val"), v.get("tail"), v.get("children", [])
+        raise ValueError(f"The value of '{k}' can not be converted to xml: {v!r}")
+
+    def _namespaces(self):
+        """
+        Collects the prefix of every qualified name and the namespaces to declare on the root element,
+        like `ET.tostring` does, so the streamed document can declare them before the first element is written.
+        """
+        qnames, namespaces = {}, {}
+
+        def add_qname(qname):
+            if qname in qnames:
+                return
+            if qname.startswith("{"):
+                uri, name = qname[1:].rsplit("}", 1)
+                prefix = namespaces.get(uri, NAMESPACE_PREFIXES.get(uri))
+                if prefix is None:
+                    prefix = f"ns{len(namespaces)}"
+                if prefix != "xml":
+                    namespaces[uri] = prefix
+                qnames[qname] = f"{prefix}:{name}" if prefix else name
+            else:
+                qnames[qname] = qname
+
+        stack = [self.meta]
+        while stack:
+            tag, attrib, _, _, children = self._parts(stack.pop())
+            add_qname(tag)
+            for key in attrib:
+                add_qname(key)
+            stack.extend(reversed(children))
+        return qnames, namespaces
+
+    def iter_xml(self):
+        """
+        Streams the xml document in small chunks, without building the ElementTree.
+        The output is identical to `convert_json_to_xml`.
+        """
+        self.attribute_defaults = generate_attribute_defaults(self.typ)
+        self.attribute_map = generate_attribute_map(self.typ)
+        qnames, namespaces = self._namespaces()
+
+        yield "<?xml version='1.0' encoding='utf-8'?>\n"
+        # every entry is either a node to open or the closing tag (and tail) of an opened node
+        stack = [(self.meta, None)]
+        while stack:
+            d, closing = stack.pop()
+            if d is None:
+                yield closing
+                continue
+            tag, attrib, text, tail, children = self._parts(d)
+            tag = qnames[tag]
+            chunk = ["<", tag]
+            for uri, prefix in sorted(namespaces.items(), key=lambda x: x[1]):
+                chunk.append(
+                    f' xmlns{":" + prefix if prefix else ""}="{escape(uri, ATTRIBUTE_ENTITIES)}"'
+                )
+            namespaces = {}  # only declared on the root element
+            for key, value in attrib.items():
+                chunk.append(f' {qnames[key]}="{escape(value, ATTRIBUTE_ENTITIES)}"')
+            tail = escape(tail) if tail else ""
+            if text or children:
+                chunk.append(">")
+                if text:
+                    chunk.append(escape(text))
+                stack.append((None, f"</{tag}>{tail}"))
+                stack.extend((child, None) for child in reversed(children))
+            else:
+                chunk.append(f" />{tail}")
+            yield "".join(chunk)
+
+    def convert_json_to_xml_file(self, filepath: pathlib.Path, validate: bool = False):
+        """
+        Streams the xml document to the file, the file is only replaced if the document is complete (and valid).
+        """
+        if not validate:
+            return atomic_write(self.iter_xml(), filepath)
+        tmp = filepath.with_name(f".{filepath.name}.unvalidated")
+        try:
+            atomic_write(self.iter_xml(), tmp)
+            validate_xml_file(tmp, typ=self.typ)
+            return tmp.replace(filepath)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def convert_json_to_xml(self, validate: bool = False):
         self.attribute_defaults = generate_attribute_defaults(self.typ)
         self.attribute_map = generate_attribute_map(self.typ)
 
         self.root = self._build_tree()
 
-        return ET.tostring(self.root, encoding="utf-8", xml_declaration=True).decode(
+        xml = ET.tostring(self.root, encoding="utf-8", xml_declaration=True).decode(
             "utf-8"
         )
+        if validate:
+            self.validate(xml)
+        return xml
+
+    def validate(self, xml: str):
+        return validate_xml(xml, typ=self.typ)
 
     @staticmethod
     def write_xml(xml, filepath: pathlib.Path):
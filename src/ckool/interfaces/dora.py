@@ -2,10 +2,11 @@ import re
 import xml.etree.ElementTree as ET
 from urllib.parse import quote, urljoin
 
-import requests
 from bs4 import BeautifulSoup
 from rich import print as rprint
 
+from ckool.interfaces.http_cache import cached_get
+
 
 class Dora:
     @classmethod
@@ -23,7 +24,7 @@ class Dora:
         )
 
         dora_query = urljoin(dora_url, quote(parameters))
-        response = requests.get(dora_query)
+        response = cached_get(dora_query, "dora")
         response.raise_for_status()
         base_url = "https://www.dora.lib4ri.ch/eawag/islandora/object/"
 
@@ -57,7 +58,7 @@ class Dora:
         """
         url = f"https://www.dora.lib4ri.ch/eawag/islandora/object/{dora_id}/datastream/MODS"
 
-        xml = requests.get(url).text
+        xml = cached_get(url, "dora").text
         if re.match("<!DOCTYPE html>", xml):
             raise ValueError(f"No entries can be found for the dora_id '{dora_id}'.")
 
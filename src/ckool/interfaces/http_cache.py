@@ -0,0 +1,200 @@
+import json
+import pathlib
+import sqlite3
+import time
+from contextlib import closing
+
+import requests
+
+from ckool import (
+    CACHE_DATABASE_TIMEOUT,
+    HTTP_CACHE_DEFAULT_TTL,
+    HTTP_CACHE_FILE_NAME,
+    HTTP_CACHE_NEGATIVE_TTL,
+    HTTP_CACHE_TTLS,
+)
+from ckool.other.caching import user_cache_folder
+
+
+def _build_response(url, status_code, headers, encoding, content):
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.headers.update(headers)
+    response.encoding = encoding
+    response._content = content
+    return response
+
+
+class HttpCache:
+    """
+    Cache of GET responses in a SQLite database, keyed by the full url and the 'Accept' header.
+    Successful responses are kept for the ttl of their source (see HTTP_CACHE_TTLS),
+    client errors (4xx, e.g. an unknown doi) for HTTP_CACHE_NEGATIVE_TTL.
+    Server errors and connection problems are never cached.
+    `status` only keeps the status code, for checks that don't need the body.
+    database: pathlib.Path [default: None],
+        None disables the cache, every call goes to the network.
+    """
+
+    def __init__(
+        self,
+        database: pathlib.Path | None,
+        ttls: dict | None = None,
+        negative_ttl: float = HTTP_CACHE_NEGATIVE_TTL,
+    ):
+        self.database = database
+        self.ttls = HTTP_CACHE_TTLS if ttls is None else ttls
+        self.negative_ttl = negative_ttl
+
+    def _connect(self):
+        self.database.parent.mkdir(exist_ok=True, parents=True)
+        connection = sqlite3.connect(
+            self.database, timeout=CACHE_DATABASE_TIMEOUT, isolation_level=None
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, source TEXT NOT NULL, expires REAL NOT NULL, "
+            "status_code INTEGER NOT NULL, headers TEXT NOT NULL, "
+            "encoding TEXT, content BLOB NOT NULL)"
+        )
+        return connection
+
+    @staticmethod
+    def key(url: str, headers: dict | None = None, params: dict | None = None):
+        url = requests.Request("GET", url, params=params).prepare().url
+        accept = {k.lower(): v for k, v in (headers or {}).items()}.get("accept", "")
+        return f"{url} | {accept}", url
+
+    def ttl(self, source: str, status_code: int):
+        if status_code >= 500:
+            return 0
+        if status_code >= 400:
+            return self.negative_ttl
+        return self.ttls.get(source, HTTP_CACHE_DEFAULT_TTL)
+
+    def lookup(self, key: str):
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT status_code, headers, encoding, content FROM responses "
+                "WHERE key = ? AND expires > ?",
+                (key, time.time()),
+            ).fetchone()
+        return row
+
+    def store(self, key: str, source: str, response: requests.Response):
+        ttl = self.ttl(source, response.status_code)
+        if ttl <= 0:
+            return
+        with closing(self._connect()) as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, source, expires, status_code, headers, encoding, content) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    source,
+                    time.time() + ttl,
+                    response.status_code,
+                    json.dumps(dict(response.headers)),
+                    response.encoding,
+                    response.content,
+                ),
+            )
+
+    def get(
+        self,
+        url: str,
+        source: str,
+        headers: dict | None = None,
+        params: dict | None = None,
+        refresh: bool = False,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Drop-in for requests.get, kwargs (e.g. timeout) are passed on.
+        refresh: bool [default: False],
+            ignore a cached response, the new response is stored.
+        """
+        if self.database is None:
+            return requests.get(url, headers=headers, params=params, **kwargs)
+
+        key, full_url = self.key(url, headers, params)
+        if not refresh and (row := self.lookup(key)):
+            status_code, cached_headers, encoding, content = row
+            return _build_response(
+                full_url, status_code, json.loads(cached_headers), encoding, content
+            )
+
+        response = requests.get(url, headers=headers, params=params, **kwargs)
+        self.store(key, source, response)
+        return response
+
+    def status(self, url: str, source: str, refresh: bool = False, **kwargs) -> int:
+        """Status code of a GET request to url, the body is neither downloaded nor cached."""
+        if self.database is None:
+            with requests.get(url, stream=True, **kwargs) as response:
+                return response.status_code
+
+        key, full_url = self.key(url)
+        key = f"{key} | status"
+        if not refresh and (row := self.lookup(key)):
+            return row[0]
+
+        with requests.get(url, stream=True, **kwargs) as response:
+            status_code = response.status_code
+        self.store(key, source, _build_response(full_url, status_code, {}, None, b""))
+        return status_code
+
+    def record(
+        self,
+        url: str,
+        source: str,
+        content: str | bytes,
+        status_code: int = 200,
+        headers: dict | None = None,
+        params: dict | None = None,
+        response_headers: dict | None = None,
+        status_only: bool = False,
+    ):
+        """
+        Stores a response without requesting it, e.g. to replay recorded responses offline.
+        status_only: bool [default: False], record the status code returned by `status` instead.
+        """
+        key, full_url = self.key(url, headers, params)
+        if status_only:
+            key = f"{key} | status"
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        self.store(
+            key,
+            source,
+            _build_response(
+                full_url, status_code, response_headers or {}, "utf-8", content
+            ),
+        )
+
+    def clear(self, source: str | None = None):
+        with closing(self._connect()) as connection:
+            if source is None:
+                connection.execute("DELETE FROM responses")
+            else:
+                connection.execute("DELETE FROM responses WHERE source = ?", (source,))
+
+
+HTTP_CACHE: HttpCache | None = None  # None: the database in the user cache folder
+
+
+def get_http_cache() -> HttpCache:
+    if HTTP_CACHE is not None:
+        return HTTP_CACHE
+    return HttpCache(user_cache_folder() / HTTP_CACHE_FILE_NAME)
+
+
+def cached_get(url: str, source: str, **kwargs) -> requests.Response:
+    return get_http_cache().get(url, source, **kwargs)
+
+
+def cached_status(url: str, source: str, **kwargs) -> int:
+    return get_http_cache().status(url, source, **kwargs)
@@ -5,9 +5,11 @@ from bs4 import BeautifulSoup
 from rich import print as rprint
 
 from ckool.interfaces.dora import Dora
+from ckool.interfaces.http_cache import cached_get, cached_status
 
 
-def get_citation_from_doi(doi, prefix=10.25678):
+def get_citation_from_doi(doi, prefix=10.25678, refresh=False):
+    """refresh: bool, bypasses the http cache, e.g. once the doi was just published."""
     if not doi:
         return None
     if re.match(f"^{prefix}", doi):
@@ -17,7 +19,7 @@ def get_citation_from_doi(doi, prefix=10.25678):
         url = "https://doi.org/{}".format(doi)
         headers = {"Accept": "text/x-bibliography; style=american-geophysical-union"}
 
-    r = requests.get(url, headers=headers, timeout=40)
+    r = cached_get(url, "citation", headers=headers, timeout=40, refresh=refresh)
 
     if not r.ok:
         # r.raise_for_status()
@@ -35,7 +37,7 @@ def fix_publication_link(publication_link):
     if not publication_link:
         return {}
     elif re.search(r"lib4ri", publication_link):
-        record = requests.get(publication_link)
+        record = cached_get(publication_link, "dora")
         bs = BeautifulSoup(record.text, features="html")
 
         paper_dois = [
@@ -72,15 +74,13 @@ def fix_publication_link(publication_link):
 
 
 def doi_exists(doi):
-    response = requests.get(f"https://doi.org/{doi}")
-    return response.status_code == 200
+    return cached_status(f"https://doi.org/{doi}", "doi") == 200
 
 
 def url_exists(url):
     """Rather url accessible"""
     try:
-        response = requests.get(url)
-        return response.status_code == 200
+        return cached_status(url, "url") == 200
     except requests.exceptions.RequestException:
         return False
 
@@ -95,7 +95,7 @@ def _request_orcid(author, additional_filters=""):
         query += additional_filters
     params = {"q": query}
 
-    response = requests.get(base_url, headers=headers, params=params)
+    response = cached_get(base_url, "orcid", headers=headers, params=params)
     if response.status_code == 200:
         return response.json()
     else:
@@ -131,7 +131,7 @@ def orcid_exists(orcid: str):
     base_url = f"https://pub.orcid.org/v3.0/{orcid}"
     headers = {"Accept": "application/json"}
 
-    response = requests.get(base_url, headers=headers)
+    response = cached_get(base_url, "orcid", headers=headers)
 
     if response.ok:
         name = response.json()["person"]["name"]
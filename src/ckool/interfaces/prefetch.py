@@ -0,0 +1,78 @@
+import concurrent.futures
+import threading
+
+from ckool import LOGGER
+from ckool.interfaces.mixed_requests import (
+    fix_publication_link,
+    get_citation_from_doi,
+    search_orcid_by_author,
+)
+
+
+class LookupPrefetcher:
+    """
+    Runs slow external lookups in background threads, as soon as their arguments are known.
+    `result` returns the result of a submitted lookup (waiting for it if needed)
+    or, if it was never submitted, runs the lookup directly. Errors are raised by `result`,
+    exactly like a direct call would.
+    """
+
+    def __init__(self, workers: int = 8):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args, runner=None):
+        """runner: callable [default: None], runs instead of func, its result is returned for func(*args)."""
+        key = (func, args)
+        with self.lock:
+            if key not in self.futures:
+                self.futures[key] = self.executor.submit(runner or func, *args)
+            return self.futures[key]
+
+    def result(self, func, *args):
+        with self.lock:
+            future = self.futures.get((func, args))
+        if future is None:
+            return func(*args)
+        return future.result()
+
+    def shutdown(self, wait: bool = False):
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+
+def lookup(prefetcher: LookupPrefetcher | None, func, *args):
+    if prefetcher is None:
+        return func(*args)
+    return prefetcher.result(func, *args)
+
+
+def prefetch_publication_lookups(
+    prefetcher: LookupPrefetcher, metadata: dict, doi: str, authors: list
+):
+    """
+    Starts the lookups done while preparing a package for publication:
+    the publication link (possibly scraping DORA) followed by the citation of the paper,
+    the citation of the dataset and the ORCiD search for every author.
+    """
+
+    def publication_link_and_citation(link):
+        publinks = fix_publication_link(link)
+        prefetcher.submit(get_citation_from_doi, publinks.get("paper_doi"))
+        return publinks
+
+    LOGGER.info(f"... prefetching publication lookups ({len(authors)} authors).")
+    prefetcher.submit(
+        fix_publication_link,
+        metadata.get("publicationlink"),
+        runner=publication_link_and_citation,
+    )
+    prefetcher.submit(get_citation_from_doi, doi)
+    for author in authors:
+        prefetcher.submit(search_orcid_by_author, author)
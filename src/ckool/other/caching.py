@@ -1,21 +1,155 @@
 import json
+import os
 import pathlib
+import sqlite3
+import tempfile
+from contextlib import closing
+from typing import Iterable
+
+from ckool import (
+    ARCHIVE_MANIFEST_FILE_ENDING,
+    CACHE_DATABASE_SUFFIXES,
+    CACHE_DATABASE_TIMEOUT,
+    CORRUPT_CACHE_FILE_ENDING,
+    LOGGER,
+    PACKAGE_META_DATA_FILE_ENDING,
+    TEMPORARY_WRITE_FILE_ENDING,
+    USER_CACHE_FOLDER_ENV_VARIABLE,
+    USER_CACHE_FOLDER_NAME,
+)
+
+
+def user_cache_folder() -> pathlib.Path:
+    """'~/.ckool-cache' unless the environment variable CKOOL_CACHE_FOLDER points elsewhere."""
+    if folder := os.environ.get(USER_CACHE_FOLDER_ENV_VARIABLE):
+        return pathlib.Path(folder)
+    return pathlib.Path.home() / USER_CACHE_FOLDER_NAME
+
+
+def _is_database(cache_file: pathlib.Path):
+    return cache_file.suffix in CACHE_DATABASE_SUFFIXES
+
+
+def _connect(cache_file: pathlib.Path):
+    """
+    Opens a key-value cache database in WAL mode, so readers never block the single writer.
+    Concurrent writers (e.g. workers of a process pool) wait for each other up to CACHE_DATABASE_TIMEOUT seconds.
+    """
+    connection = sqlite3.connect(
+        cache_file, timeout=CACHE_DATABASE_TIMEOUT, isolation_level=None
+    )
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+    )
+    return connection
+
+
+def atomic_write(text: str | Iterable[str], file: pathlib.Path):
+    """
+    Writes to a temporary file in the same directory, flushes it to disk and renames it to the target.
+    The rename is atomic, so the target either has its old or its new content, even if the process is killed.
+    text can also be an iterable of chunks, which are written one by one.
+    """
+    fd, tmp = tempfile.mkstemp(
+        dir=file.parent, prefix=f".{file.name}.", suffix=TEMPORARY_WRITE_FILE_ENDING
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            if isinstance(text, str):
+                f.write(text)
+            else:
+                f.writelines(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, file)
+    except BaseException:
+        pathlib.Path(tmp).unlink(missing_ok=True)
+        raise
+    return file
 
 
 def _write_cache(meta: dict, cache_file: pathlib.Path):
-    with cache_file.open("w+") as cache:
-        json.dump(meta, cache)
-    return cache_file
+    return atomic_write(json.dumps(meta), cache_file)
+
+
+def recover_cache_directory(
+    directory: pathlib.Path,
+    endings: tuple = (
+        ".json",
+        ARCHIVE_MANIFEST_FILE_ENDING,
+        PACKAGE_META_DATA_FILE_ENDING,
+    ),
+) -> list[pathlib.Path]:
+    """
+    Cleans up after an interrupted run: leftover temporary files are removed
+    and json caches (files ending with one of `endings`) that can not be parsed are renamed to '<name>.corrupt',
+    so they are rebuilt instead of being trusted. Returns the quarantined files.
+    """
+    quarantined = []
+    if not directory.exists():
+        return quarantined
+    for file in directory.iterdir():
+        if not file.is_file():
+            continue
+        if file.name.endswith(TEMPORARY_WRITE_FILE_ENDING):
+            LOGGER.info(f"... removing leftover temporary file '{file.name}'.")
+            file.unlink()
+        elif file.name.endswith(endings):
+            try:
+                read_cache(file)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                LOGGER.warning(
+                    f"... cache file '{file.name}' is corrupt, it will be rebuilt."
+                )
+                quarantined.append(
+                    file.replace(file.with_name(file.name + CORRUPT_CACHE_FILE_ENDING))
+                )
+    return quarantined
 
 
 def read_cache(cache_file: pathlib.Path):
+    if _is_database(cache_file):
+        with closing(_connect(cache_file)) as connection:
+            return {
+                key: json.loads(value)
+                for key, value in connection.execute("SELECT key, value FROM cache")
+            }
     with cache_file.open() as cache:
         return json.load(cache)
 
 
+def read_cache_key(cache_file: pathlib.Path, key: str, default=None):
+    """Reads a single entry, without loading the whole cache if it is a database."""
+    if not cache_file.exists():
+        return default
+    if _is_database(cache_file):
+        with closing(_connect(cache_file)) as connection:
+            row = connection.execute(
+                "SELECT value FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        return default if row is None else json.loads(row[0])
+    return read_cache(cache_file).get(key, default)
+
+
 def update_cache(meta: dict, cache_file: pathlib.Path):
+    """
+    Merges meta into the cache.
+    For databases (see CACHE_DATABASE_SUFFIXES) only the given keys are upserted in a single transaction,
+    for json files the whole file is read and rewritten.
+    """
     if not cache_file.parent.exists():
         cache_file.parent.mkdir(exist_ok=True, parents=True)
+    if _is_database(cache_file):
+        with closing(_connect(cache_file)) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT INTO cache (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                [(key, json.dumps(value)) for key, value in meta.items()],
+            )
+            connection.execute("COMMIT")
+        return cache_file
     if not cache_file.exists():
         return _write_cache(meta, cache_file)
     else:
@@ -1,15 +1,53 @@
+import csv
+import io
+import json
+import math
 import pathlib
 import re
+import struct
 import tarfile
-from typing import Literal
-from zipfile import ZipFile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Literal
+from zipfile import (
+    ZIP64_LIMIT,
+    ZIP_DEFLATED,
+    ZIP_FILECOUNT_LIMIT,
+    ZIP_STORED,
+    ZipFile,
+    ZipInfo,
+)
 
 from tqdm import tqdm
 
-from ckool import TEMPORARY_DIRECTORY_NAME
+from ckool import (
+    ALREADY_COMPRESSED_SUFFIXES,
+    ARCHIVE_MANIFEST_FILE_ENDING,
+    BUNDLE_ARCHIVE_NAME,
+    COMPRESSIBILITY_PROBE_SIZE,
+    COMPRESSIBILITY_THRESHOLD,
+    CORRUPT_CACHE_FILE_ENDING,
+    LOGGER,
+    PARALLEL_ZIP_MAX_MEMBER_SIZE,
+    TEMPORARY_DIRECTORY_NAME,
+)
+from ckool.other.caching import atomic_write, read_cache
 from ckool.other.types import CompressionTypes
 from ckool.other.utilities import partial
 
+PART_PATTERN = re.compile(r"^\.part\d{3}\.")
+# 'tar' is written by `tar_files` if compressing does not pay off
+ARCHIVE_SUFFIXES = [compression.value for compression in CompressionTypes] + ["tar"]
+
+# zip format: version needed to extract (2.0: deflate, 4.5: zip64), flag for utf-8 names,
+# marker in place of values that are in the zip64 extra field / record
+ZIP_DEFAULT_VERSION = 20
+ZIP64_VERSION = 45
+ZIP_UTF8_FLAG = 0x800
+ZIP64_MARKER = 0xFFFFFFFF
+
 
 def match_via_include_exclude_patters(
     string, include_pattern: str | None = None, exclude_pattern: str | None = None
@@ -70,12 +108,43 @@ def generate_archive_destination(
     return archive_destination
 
 
+def is_compressible(
+    file: pathlib.Path,
+    probe_size: int = COMPRESSIBILITY_PROBE_SIZE,
+    threshold: float = COMPRESSIBILITY_THRESHOLD,
+) -> bool:
+    """
+    Decides whether compressing a file is worth the CPU time.
+    Files with a known compressed format (see ALREADY_COMPRESSED_SUFFIXES) are never compressed,
+    for all other files the first block is trial-compressed with the fastest zlib level.
+    If the compressed block is not smaller than `threshold` times its size, the file is considered incompressible.
+    """
+    if file.suffix.lower() in ALREADY_COMPRESSED_SUFFIXES:
+        return False
+
+    with file.open("rb") as f:
+        block = f.read(probe_size)
+
+    if not block:
+        return False
+
+    return len(zlib.compress(block, 1)) < threshold * len(block)
+
+
 def zip_files(
     root_folder: pathlib.Path,
     archive_destination: pathlib.Path,
     files: list,
     progressbar: bool = True,
+    adaptive: bool = False,
+    extra_members: dict | None = None,
 ) -> pathlib.Path:
+    """
+    adaptive: bool [default: False],
+        if True, every member is either deflated or stored, depending on `is_compressible`.
+    extra_members: dict [default: None],
+        {archive name: text} written into the archive after the files, e.g. an index.
+    """
     position = None
     global position_queue
     if "position_queue" in globals():
@@ -87,13 +156,291 @@ def zip_files(
         disable=not progressbar,
         position=position,
     )
-    with ZipFile(archive_destination.with_suffix(".zip"), mode="w") as _zip:
+    archive = archive_destination.with_name(archive_destination.name + ".zip")
+    with ZipFile(archive, mode="w") as _zip:
         for file in files:
-            _zip.write(file, file.relative_to(root_folder))
+            compress_type = None
+            if adaptive:
+                compress_type = ZIP_DEFLATED if is_compressible(file) else ZIP_STORED
+            _zip.write(file, file.relative_to(root_folder), compress_type=compress_type)
             bar.update()
             bar.refresh()
+        for name, text in (extra_members or {}).items():
+            _zip.writestr(name, text)
+    bar.close()
+    return archive
+
+
+def _compress_member(file: pathlib.Path, adaptive: bool):
+    """
+    Reads a member and, with adaptive=True and if it is compressible (see `is_compressible`),
+    compresses it to a raw deflate stream (as stored in zip archives), otherwise it is stored like in `zip_files`.
+    Runs in the worker threads of `zip_files_parallel`, zlib releases the GIL while compressing.
+    Returns (compress_type, crc, file_size, data).
+    """
+    deflate = adaptive and is_compressible(file)
+    data = file.read_bytes()
+    crc = zlib.crc32(data)
+    if not deflate:
+        return ZIP_STORED, crc, len(data), data
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return (
+        ZIP_DEFLATED,
+        crc,
+        len(data),
+        compressor.compress(data) + compressor.flush(),
+    )
+
+
+def _dos_date_time(date_time: tuple):
+    """The (time, date) fields of zip headers."""
+    year, month, day, hour, minute, second = date_time
+    dos_time = hour << 11 | minute << 5 | second // 2
+    dos_date = (year - 1980) << 9 | month << 5 | day
+    return dos_time, dos_date
+
+
+def _zip32(value: int):
+    return value if value < ZIP64_LIMIT else ZIP64_MARKER
+
+
+class _ZipWriter:
+    """
+    Writes zip members whose data was compressed elsewhere (see `_compress_member`):
+    the local headers and the data in the order of the calls, the central directory on `close`.
+    zip64 records are added for members, offsets and member counts beyond the classic zip limits.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.entries = []
+
+    @staticmethod
+    def _name(zinfo: ZipInfo):
+        try:
+            return zinfo.filename.encode("ascii"), 0
+        except UnicodeEncodeError:
+            return zinfo.filename.encode("utf-8"), ZIP_UTF8_FLAG
+
+    def _local_header(self, zinfo, compress_type, crc, compress_size, zip64):
+        name, flags = self._name(zinfo)
+        dos_time, dos_date = _dos_date_time(zinfo.date_time)
+        extra = b""
+        if zip64:
+            extra = struct.pack("<HHQQ", 1, 16, zinfo.file_size, compress_size)
+            sizes = (ZIP64_MARKER, ZIP64_MARKER)
+        else:
+            sizes = (compress_size, zinfo.file_size)
+        return (
+            struct.pack(
+                "<IHHHHHIIIHH",
+                0x04034B50,
+                ZIP64_VERSION if zip64 else ZIP_DEFAULT_VERSION,
+                flags,
+                compress_type,
+                dos_time,
+                dos_date,
+                crc,
+                *sizes,
+                len(name),
+                len(extra),
+            )
+            + name
+            + extra
+        )
+
+    def write(self, zinfo: ZipInfo, compress_type: int, crc: int, data: bytes):
+        """zinfo.file_size must be set, data is already compressed with compress_type."""
+        offset = self.f.tell()
+        zip64 = zinfo.file_size >= ZIP64_LIMIT or len(data) >= ZIP64_LIMIT
+        self.f.write(self._local_header(zinfo, compress_type, crc, len(data), zip64))
+        self.f.write(data)
+        self.entries.append((zinfo, compress_type, crc, len(data), offset))
+
+    def write_file(self, zinfo: ZipInfo, file: pathlib.Path, deflate: bool):
+        """Streams a large member chunk by chunk, the header is completed afterwards."""
+        offset = self.f.tell()
+        zip64 = zinfo.file_size * 1.05 > ZIP64_LIMIT  # like ZipFile, with room to grow
+        compress_type = ZIP_DEFLATED if deflate else ZIP_STORED
+        self.f.write(self._local_header(zinfo, compress_type, 0, 0, zip64))
+
+        compressor = None
+        if deflate:
+            compressor = zlib.compressobj(
+                zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15
+            )
+        crc, file_size, compress_size = 0, 0, 0
+        with file.open("rb") as src:
+            while chunk := src.read(2**20):
+                crc = zlib.crc32(chunk, crc)
+                file_size += len(chunk)
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                self.f.write(chunk)
+                compress_size += len(chunk)
+        if compressor is not None:
+            compress_size += self.f.write(compressor.flush())
+
+        if not zip64 and max(file_size, compress_size) >= ZIP64_LIMIT:
+            raise ValueError(
+                f"The file '{file}' grew beyond the zip limit while zipping."
+            )
+        zinfo.file_size = file_size
+        end = self.f.tell()
+        self.f.seek(offset)
+        self.f.write(
+            self._local_header(zinfo, compress_type, crc, compress_size, zip64)
+        )
+        self.f.seek(end)
+        self.entries.append((zinfo, compress_type, crc, compress_size, offset))
+
+    def close(self):
+        start = self.f.tell()
+        for zinfo, compress_type, crc, compress_size, offset in self.entries:
+            name, flags = self._name(zinfo)
+            dos_time, dos_date = _dos_date_time(zinfo.date_time)
+            zip64_fields = [
+                value
+                for value in (zinfo.file_size, compress_size, offset)
+                if value >= ZIP64_LIMIT
+            ]
+            extra = b""
+            if zip64_fields:
+                extra = struct.pack(
+                    f"<HH{len(zip64_fields)}Q",
+                    1,
+                    8 * len(zip64_fields),
+                    *zip64_fields,
+                )
+            version = ZIP64_VERSION if zip64_fields else ZIP_DEFAULT_VERSION
+            self.f.write(
+                struct.pack(
+                    "<IHHHHHHIIIHHHHHII",
+                    0x02014B50,
+                    zinfo.create_system << 8 | version,
+                    version,
+                    flags,
+                    compress_type,
+                    dos_time,
+                    dos_date,
+                    crc,
+                    _zip32(compress_size),
+                    _zip32(zinfo.file_size),
+                    len(name),
+                    len(extra),
+                    0,
+                    0,
+                    0,
+                    zinfo.external_attr,
+                    _zip32(offset),
+                )
+                + name
+                + extra
+            )
+        end = self.f.tell()
+        count, size = len(self.entries), end - start
+
+        if count >= ZIP_FILECOUNT_LIMIT or max(start, size) >= ZIP64_LIMIT:
+            self.f.write(
+                struct.pack(
+                    "<IQHHIIQQQQ",
+                    0x06064B50,
+                    44,
+                    ZIP64_VERSION,
+                    ZIP64_VERSION,
+                    0,
+                    0,
+                    count,
+                    count,
+                    size,
+                    start,
+                )
+            )
+            self.f.write(struct.pack("<IIQI", 0x07064B50, 0, end, 1))
+        self.f.write(
+            struct.pack(
+                "<IHHHHIIH",
+                0x06054B50,
+                0,
+                0,
+                min(count, ZIP_FILECOUNT_LIMIT),
+                min(count, ZIP_FILECOUNT_LIMIT),
+                _zip32(size),
+                _zip32(start),
+                0,
+            )
+        )
+
+
+def zip_files_parallel(
+    root_folder: pathlib.Path,
+    archive_destination: pathlib.Path,
+    files: list,
+    progressbar: bool = True,
+    adaptive: bool = False,
+    workers: int = 4,
+    max_member_size: int = PARALLEL_ZIP_MAX_MEMBER_SIZE,
+    extra_members: dict | None = None,
+) -> pathlib.Path:
+    """
+    Same archive content as `zip_files`, but the members are read and deflated concurrently in a thread pool.
+    A single writer emits the local headers, the compressed data (in the order of `files`,
+    so the archive layout is deterministic) and the central directory.
+    workers: int [default: 4],
+        amount of threads compressing members, at most 2 * workers members are held in memory.
+    max_member_size: int [default: PARALLEL_ZIP_MAX_MEMBER_SIZE],
+        members larger than this are streamed by the writer itself, to keep the memory bounded.
+    extra_members: dict [default: None],
+        {archive name: text} written into the archive after the files, e.g. an index.
+    """
+    position = None
+    if "position_queue" in globals():
+        position = position_queue.get()
+
+    bar = tqdm(
+        files,
+        desc=f"Zipping {archive_destination.name}",
+        disable=not progressbar,
+        position=position,
+    )
+
+    archive = archive_destination.with_name(archive_destination.name + ".zip")
+
+    def write_next(writer, pending):
+        file, future = pending.popleft()
+        zinfo = ZipInfo.from_file(file, file.relative_to(root_folder))
+        if future is None:
+            writer.write_file(zinfo, file, deflate=adaptive and is_compressible(file))
+        else:
+            compress_type, crc, zinfo.file_size, data = future.result()
+            writer.write(zinfo, compress_type, crc, data)
+        bar.update()
+        bar.refresh()
+
+    with (
+        archive.open("wb") as f,
+        ThreadPoolExecutor(max_workers=workers) as executor,
+    ):
+        writer = _ZipWriter(f)
+        pending = deque()
+        for file in files:
+            future = None
+            if file.stat().st_size <= max_member_size:
+                future = executor.submit(_compress_member, file, adaptive)
+            pending.append((file, future))
+            while len(pending) > 2 * workers:
+                write_next(writer, pending)
+        while pending:
+            write_next(writer, pending)
+        for name, text in (extra_members or {}).items():
+            zinfo = ZipInfo(name, date_time=time.localtime(time.time())[:6])
+            zinfo.external_attr = 0o600 << 16  # like ZipFile.writestr
+            data = text.encode("utf-8")
+            zinfo.file_size = len(data)
+            writer.write(zinfo, ZIP_STORED, zlib.crc32(data), data)
+        writer.close()
     bar.close()
-    return archive_destination.with_suffix(".zip")
+    return archive
 
 
 def tar_files(
@@ -102,7 +449,30 @@ def tar_files(
     files: list,
     compression: Literal["gz", "bz2", "xz"] = "gz",
     progressbar: bool = True,
+    adaptive: bool = False,
+    extra_members: dict | None = None,
 ) -> pathlib.Path:
+    """
+    extra_members: dict [default: None],
+        {archive name: text} written into the archive after the files, e.g. an index.
+    adaptive: bool [default: False],
+        tar archives are compressed as a whole stream, a per member decision is not possible.
+        If True and most of the bytes to archive are incompressible (see `is_compressible`),
+        an uncompressed '.tar' archive is written instead.
+    """
+    if adaptive:
+        compressible, incompressible = 0, 0
+        for file in files:
+            if is_compressible(file):
+                compressible += file.stat().st_size
+            else:
+                incompressible += file.stat().st_size
+        if incompressible > compressible:
+            compression = ""
+
+    suffix = f".tar.{compression}" if compression else ".tar"
+    archive = archive_destination.with_name(archive_destination.name + suffix)
+
     position = None
     global position_queue
     if "position_queue" in globals():
@@ -114,9 +484,7 @@ def tar_files(
         disable=not progressbar,
         position=position,
     )
-    with tarfile.open(
-        archive_destination.with_suffix(f".tar.{compression}"), mode=f"w:{compression}"
-    ) as tar:
+    with tarfile.open(archive, mode=f"w:{compression}") as tar:
         for file in files:
             tarinfo = tarfile.TarInfo(file.relative_to(root_folder).as_posix())
             tarinfo.size = (
@@ -126,33 +494,217 @@ def tar_files(
                 tar.addfile(tarinfo, f)
             bar.update()
             bar.refresh()
+        for name, text in (extra_members or {}).items():
+            tarinfo = tarfile.TarInfo(name)
+            tarinfo.size = len(data := text.encode("utf-8"))
+            tar.addfile(tarinfo, io.BytesIO(data))
     bar.close()
-    return archive_destination.with_suffix(f".tar.{compression}")
+    return archive
 
 
 def find_archive(archive_destination: pathlib.Path):
     found = []
     for f in iter_files(archive_destination.parent, tmp_dir_to_ignore=""):
+        if f.name.endswith((ARCHIVE_MANIFEST_FILE_ENDING, CORRUPT_CACHE_FILE_ENDING)):
+            continue
         if not f.suffix.endswith(".json") and f.name.startswith(
             archive_destination.name
         ):
-            found.append(f)
+            rest = f.name[len(archive_destination.name) :]
+            if rest.startswith(".") and not PART_PATTERN.match(rest):
+                found.append(f)
     assert len(found) <= 1, f"Invalid: Multiple archives found: {repr(found)}"
     if found:
         return found[0]
 
 
+def part_destination(archive_destination: pathlib.Path, part: int):
+    return archive_destination.with_name(f"{archive_destination.name}.part{part:03d}")
+
+
+def split_into_parts(files: list, max_size: int) -> list[list]:
+    """
+    Distributes files over as few parts as possible, with each part holding at most max_size bytes.
+    Files are assigned largest first to the currently smallest part, so parts end up with similar sizes.
+    A single file larger than max_size gets a part of its own.
+    Within each part the original order of the files is kept.
+    """
+    sizes = [file.stat().st_size for file in files]
+    n_parts = max(1, math.ceil(sum(sizes) / max_size))
+    order = sorted(range(len(files)), key=lambda i: sizes[i], reverse=True)
+    while True:
+        parts = [[] for _ in range(n_parts)]
+        totals = [0] * n_parts
+        for i in order:
+            smallest = totals.index(min(totals))
+            parts[smallest].append(i)
+            totals[smallest] += sizes[i]
+        if all(
+            total <= max_size or len(part) == 1 for total, part in zip(totals, parts)
+        ):
+            break
+        n_parts += 1
+    return [[files[i] for i in sorted(part)] for part in parts if part]
+
+
+def remove_stale_archives(
+    archive_destination: pathlib.Path, destinations: list[pathlib.Path]
+):
+    """
+    Removes archives of a folder that are not part of the current split anymore,
+    e.g. 'name.zip' after the folder has been split or 'name.part003.zip' after it shrank to two parts.
+    """
+    if not archive_destination.parent.exists():
+        return
+    names = {destination.name for destination in destinations}
+    suffixes = "|".join(re.escape(suffix) for suffix in ARCHIVE_SUFFIXES)
+    pattern = re.compile(
+        rf"({re.escape(archive_destination.name)}(\.part\d{{3}})?)\.({suffixes})"
+    )
+    for file in archive_destination.parent.iterdir():
+        if not (found := pattern.fullmatch(file.name)) or found.group(1) in names:
+            continue
+        LOGGER.info(f"... removing outdated archive '{file.name}'.")
+        invalidate_archive(file, file.with_name(found.group(1)))
+
+
+def bundle_index(root_folder: pathlib.Path, files: list) -> str:
+    """Lists the members of a bundle archive as csv, with their size in bytes."""
+    index = io.StringIO()
+    writer = csv.writer(index, lineterminator="\n")
+    writer.writerow(["name", "size"])
+    for file in files:
+        writer.writerow([file.relative_to(root_folder).as_posix(), file.stat().st_size])
+    return index.getvalue()
+
+
+def manifest_file(archive_destination: pathlib.Path):
+    return archive_destination.with_name(
+        archive_destination.name + ARCHIVE_MANIFEST_FILE_ENDING
+    )
+
+
+def build_manifest(
+    root_folder: pathlib.Path, files: list, hash_func: Callable | None = None
+) -> list:
+    """
+    Describes the content of an archive as a sorted list of [relative path, size, mtime_ns].
+    Only the file system metadata is needed, so no file is read, unless a hash_func is provided.
+    In that case the hash of each file is appended to its entry.
+    """
+    manifest = []
+    for file in files:
+        stat = file.stat()
+        entry = [
+            file.relative_to(root_folder).as_posix(),
+            stat.st_size,
+            stat.st_mtime_ns,
+        ]
+        if hash_func is not None:
+            entry.append(hash_func(filepath=file, progressbar=False))
+        manifest.append(entry)
+    return sorted(manifest)
+
+
+def write_manifest(
+    archive_destination: pathlib.Path,
+    root_folder: pathlib.Path,
+    files: list,
+    hash_func: Callable | None = None,
+):
+    return atomic_write(
+        json.dumps(build_manifest(root_folder, files, hash_func)),
+        manifest_file(archive_destination),
+    )
+
+
+def manifest_matches(
+    archive_destination: pathlib.Path, root_folder: pathlib.Path, files: list
+) -> bool:
+    """
+    Compares the stored manifest to the current state of the files, hashes are ignored.
+    An archive without manifest can not be verified and never matches.
+    """
+    if not (file := manifest_file(archive_destination)).exists():
+        return False
+    stored = [entry[:3] for entry in read_cache(file)]
+    return stored == build_manifest(root_folder, files)
+
+
+def invalidate_archive(archive: pathlib.Path, archive_destination: pathlib.Path):
+    """Removes an outdated archive, its stats file and its manifest."""
+    for file in [archive, stats_file(archive), manifest_file(archive_destination)]:
+        file.unlink(missing_ok=True)
+
+
 def get_compression_func(
     compression_type: CompressionTypes = CompressionTypes.zip,
+    adaptive: bool = False,
+    workers: int = 1,
 ):
+    """
+    workers: int [default: 1],
+        if larger than 1, zip archives are built with `zip_files_parallel` (same content, members compressed concurrently).
+        tar archives are a single compressed stream and are always written sequentially.
+    """
     if compression_type == CompressionTypes.zip:
-        return zip_files
+        if workers > 1:
+            return partial(zip_files_parallel, adaptive=adaptive, workers=workers)
+        return partial(zip_files, adaptive=adaptive)
     elif compression_type in [
         CompressionTypes.tar_gz,
         CompressionTypes.tar_xz,
         CompressionTypes.tar_bz2,
     ]:
-        return partial(tar_files, compression=compression_type.value.split(".")[-1])
+        return partial(
+            tar_files,
+            compression=compression_type.value.split(".")[-1],
+            adaptive=adaptive,
+        )
+
+
+def iter_archives(
+    location: pathlib.Path,
+    root_folder: pathlib.Path,
+    files_to_compress: list,
+    archive_destination: pathlib.Path,
+    max_archive_size: int | None = None,
+    bundle: bool = False,
+):
+    """
+    Yields the archive(s) for a group of files, either the existing archive if its manifest still matches
+    or the information needed to create it. With max_archive_size the files are split into multiple parts.
+    """
+    parts = [files_to_compress]
+    if max_archive_size is not None:
+        parts = split_into_parts(files_to_compress, max_archive_size)
+    destinations = [archive_destination]
+    if len(parts) > 1:
+        destinations = [
+            part_destination(archive_destination, i) for i in range(1, len(parts) + 1)
+        ]
+    remove_stale_archives(archive_destination, destinations)
+
+    for destination, files in zip(destinations, parts):
+        if (file := find_archive(destination)) and manifest_matches(
+            destination, root_folder, files
+        ):
+            yield {"file": file, "folder": {}}
+            continue
+        if file:
+            LOGGER.info(
+                f"... content of '{destination.name}' changed since it was archived. Re-archiving."
+            )
+            invalidate_archive(file, destination)
+        folder = {
+            "location": location,
+            "files": files,
+            "archive_destination": destination,
+            "root_folder": root_folder,
+        }
+        if bundle:
+            folder["bundle"] = True
+        yield {"file": "", "folder": folder}
 
 
 def iter_package(
@@ -162,11 +714,19 @@ def iter_package(
     exclude_pattern: str | None = None,
     tmp_dir_name: str = TEMPORARY_DIRECTORY_NAME,
     ignore_tmp_dir: bool = True,
+    max_archive_size: int | None = None,
+    bundle_small_files_below: int | None = None,
 ) -> dict:
     """
     This function gets everything ready for the package upload.
     - it creates a tmp directory and saves compressed folders in there and collects all folders.
+    max_archive_size: int [default: None],
+        folders with more bytes are split into multiple archives 'name.part001', 'name.part002', ...
+    bundle_small_files_below: int [default: None],
+        top-level files smaller than this are not yielded one by one,
+        but collected in a single archive (BUNDLE_ARCHIVE_NAME) that is yielded last.
     """
+    small_files = []
     for file_or_folder in package.iterdir():
         if not match_via_include_exclude_patters(
             file_or_folder.as_posix(), include_pattern, exclude_pattern
@@ -174,6 +734,12 @@ def iter_package(
             continue
 
         if file_or_folder.is_file():
+            if (
+                bundle_small_files_below is not None
+                and file_or_folder.stat().st_size < bundle_small_files_below
+            ):
+                small_files.append(file_or_folder)
+                continue
             yield {"file": file_or_folder, "folder": {}}
         elif file_or_folder.is_dir():
             if ignore_folders:
@@ -200,24 +766,37 @@ def iter_package(
             if not files_to_compress:
                 continue
 
-            elif file := find_archive(archive_destination):
-                yield {"file": file, "folder": {}}
-            else:
-                yield {
-                    "file": "",
-                    "folder": {
-                        "location": file_or_folder,
-                        "files": files_to_compress,
-                        "archive_destination": archive_destination,
-                        "root_folder": file_or_folder.parent,
-                    },
-                }
+            yield from iter_archives(
+                file_or_folder,
+                file_or_folder.parent,
+                files_to_compress,
+                archive_destination,
+                max_archive_size,
+            )
 
         else:
             raise ValueError(
                 f"Ooops this shouldn't happen. This is not a file and not a folder '{file_or_folder.as_posix()}'."
             )
 
+    bundle_destination = package / tmp_dir_name / BUNDLE_ARCHIVE_NAME
+    if len(small_files) < 2:
+        remove_stale_archives(bundle_destination, [])
+        for file in small_files:
+            yield {"file": file, "folder": {}}
+        return
+
+    for file in small_files:  # stats of files that were prepared on their own before
+        stats_file(file, tmp_dir_name).unlink(missing_ok=True)
+    yield from iter_archives(
+        package,
+        package,
+        small_files,
+        generate_archive_destination(bundle_destination, package, tmp_dir_name),
+        max_archive_size,
+        bundle=True,
+    )
+
 
 def stats_file(file: pathlib.Path, tmp_dir: str = TEMPORARY_DIRECTORY_NAME):
     if file.parent.name == tmp_dir:
@@ -0,0 +1,63 @@
+import hashlib
+import json
+import pathlib
+import time
+
+from ckool import UPLOAD_JOURNAL_FILE_PREFIX
+from ckool.other.types import UploadStates
+from ckool.other.utilities import append_json_line
+
+
+class UploadJournal:
+    """
+    Append-only log of the upload state of each resource of a package, one json object per line.
+    An entry is identified by the resource name and the hash of the local file,
+    if the file changes, the journal has no state for it and the upload starts from scratch.
+    Each CKAN server gets its own journal file, so uploading a package to a second instance
+    does not pick up the state of the first one.
+    Lines are appended with a single write and fsync'ed, so parallel workers can share a journal
+    and an interrupted run loses at most the last (truncated) line, which is ignored when reading.
+    """
+
+    def __init__(self, directory: pathlib.Path, package_name: str, server: str):
+        server_id = hashlib.sha1(server.rstrip("/").encode("utf-8")).hexdigest()[:12]
+        self.file = (
+            directory / f"{UPLOAD_JOURNAL_FILE_PREFIX}{package_name}-{server_id}.jsonl"
+        )
+        self.package_name = package_name
+        self.server = server
+
+    def record(self, name: str, hash_: str, state: UploadStates, **details):
+        entry = {
+            "time": time.time(),
+            "server": self.server,
+            "package": self.package_name,
+            "name": name,
+            "hash": hash_,
+            "state": state.value,
+            **details,
+        }
+        self.file.parent.mkdir(exist_ok=True, parents=True)
+        append_json_line(self.file, entry)
+
+    def entries(self):
+        if not self.file.exists():
+            return
+        with self.file.open() as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:  # interrupted while writing
+                    continue
+
+    def last(self, name: str, hash_: str) -> dict:
+        """Returns the latest entry of a resource (all details merged) or an empty dict."""
+        merged = {}
+        for entry in self.entries():
+            if entry["name"] == name and entry["hash"] == hash_:
+                merged.update(entry)
+        return merged
+
+    def state(self, name: str, hash_: str) -> UploadStates | None:
+        if state := self.last(name, hash_).get("state"):
+            return UploadStates(state)
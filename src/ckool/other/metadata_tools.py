@@ -2,6 +2,7 @@ import re
 from copy import deepcopy
 
 from ckool.interfaces.mixed_requests import fix_publication_link, get_citation_from_doi
+from ckool.interfaces.prefetch import lookup
 
 
 def prepare_metadata_for_publication_package(
@@ -10,7 +11,9 @@ def prepare_metadata_for_publication_package(
     maintainer_record: dict,
     usage_contact_record: dict,
     custom_citation_publication: str = None,
+    prefetcher=None,
 ):
+    """prefetcher: LookupPrefetcher [default: None], collects lookups started in the background."""
     usage_contact_target = (
         usage_contact_record["fullname"] + " <" + usage_contact_record["email"] + ">"
     )
@@ -20,13 +23,13 @@ def prepare_metadata_for_publication_package(
         author = [re.sub(r"<.+@.+>", "", a).strip() for a in author]
         return author
 
-    publinks = fix_publication_link(pkg.get("publicationlink"))
+    publinks = lookup(prefetcher, fix_publication_link, pkg.get("publicationlink"))
     paper_doi = publinks.get("paper_doi")
     publicationlink = publinks.get("publicationlink")
     publicationlink_dora = publinks.get("publicationlink_dora")
     publicationlink_url = publinks.get("publicationlink_url")
-    citation_publication = custom_citation_publication or get_citation_from_doi(
-        paper_doi
+    citation_publication = custom_citation_publication or lookup(
+        prefetcher, get_citation_from_doi, paper_doi
     )
 
     pkg_update = {
@@ -46,7 +49,7 @@ def prepare_metadata_for_publication_package(
             pkg_spatial.strip() if (pkg_spatial := pkg.get("spatial")) else pkg_spatial
         ),
         # "resources": [],
-        "citation": get_citation_from_doi(doi),
+        "citation": lookup(prefetcher, get_citation_from_doi, doi),
         "paper_doi": paper_doi,
         "citation_publication": citation_publication,
         "publicationlink": publicationlink,
@@ -11,6 +11,7 @@ from ckool.interfaces.mixed_requests import (
     search_orcid_by_author,
     url_exists,
 )
+from ckool.interfaces.prefetch import LookupPrefetcher, lookup
 
 
 def is_yes(question: str, default: str = "no", prompt_func: Callable = Prompt.ask):
@@ -139,10 +140,14 @@ def ask_for_related_identifiers(prompt_func: Callable = Prompt.ask):
     return identifiers
 
 
-def prompt_orcid(author: str, prompt_func: Callable = Prompt.ask):
+def prompt_orcid(
+    author: str, prompt_func: Callable = Prompt.ask, prefetcher=None, found=None
+):
+    """found: list [default: None], ORCiDs already known for the author, no search is made."""
     orcid = None
     exists = False
-    found = search_orcid_by_author(author)
+    if found is None:
+        found = lookup(prefetcher, search_orcid_by_author, author)
     proposed = False
     while not exists:
         if len(found) == 1 and not proposed:
@@ -176,7 +181,18 @@ def prompt_orcid(author: str, prompt_func: Callable = Prompt.ask):
     return orcid
 
 
-def ask_for_orcids(authors: list, prompt_func: Callable = Prompt.ask):
+def ask_for_orcids(
+    authors: list,
+    prompt_func: Callable = Prompt.ask,
+    prefetcher=None,
+    orcid_index=None,
+):
+    """
+    prefetcher: LookupPrefetcher [default: None], the ORCiD searches already started in the background.
+    orcid_index: AuthorOrcidIndex [default: None], authors found in the index are not searched,
+        the searches for all others run concurrently before the first prompt.
+        Only successful searches are added to the index, a failed search prompts for the ORCiD.
+    """
     if not authors:
         LOGGER.info(
             "The package's authors are not in the right format. Skip prompting for ORCiDs."
@@ -186,11 +202,40 @@ def ask_for_orcids(authors: list, prompt_func: Callable = Prompt.ask):
     if not is_yes("Do you want to provide ORCiDs?", prompt_func=prompt_func):
         return
 
-    answers = {}
-    for author in authors:
-        id_ = prompt_orcid(author, prompt_func)
-        if id_:
-            answers[author] = id_
+    known = {}
+    if orcid_index is not None:
+        known = {
+            author: found
+            for author in authors
+            if (found := orcid_index.lookup(author)) is not None
+        }
+
+    with LookupPrefetcher() as own_prefetcher:
+        prefetcher = prefetcher or own_prefetcher
+        for author in authors:
+            if author not in known:
+                prefetcher.submit(search_orcid_by_author, author)
+
+        answers = {}
+        searched = {}
+        for author in authors:
+            found = known.get(author)
+            if found is None:
+                try:
+                    found = searched[author] = prefetcher.result(
+                        search_orcid_by_author, author
+                    )
+                except Exception as error:
+                    LOGGER.warning(
+                        f"... searching the ORCiD of '{author}' failed: {error!r}"
+                    )
+                    found = []
+            id_ = prompt_orcid(author, prompt_func, prefetcher, found=found)
+            if id_:
+                answers[author] = id_
+
+    if orcid_index is not None:
+        orcid_index.add_search_results(searched)
 
     return answers
 
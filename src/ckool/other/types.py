@@ -21,3 +21,13 @@ class HashTypes(Enum):
     # sha224 = "sha224"
     sha256 = "sha256"
     # sha512 = "sha512"
+
+
+class UploadStates(Enum):
+    """States of a resource upload, in the order they are reached (see UploadJournal)."""
+
+    queued = "queued"
+    created = "created"  # empty resource exists on CKAN (scp uploads only)
+    uploaded = "uploaded"  # all bytes were copied to the server (scp uploads only)
+    hash_patched = "hash_patched"
+    verified = "verified"
@@ -1,7 +1,10 @@
+import json
 import os
 import pathlib
 import re
 import sys
+import threading
+import time
 from functools import wraps
 from subprocess import PIPE, CalledProcessError, run
 
@@ -41,6 +44,71 @@ def partial(func, /, *args, **keywords):
     return new_func
 
 
+def parse_size(size: str | int) -> int:
+    """
+    Converts a human-readable size like '500MB', '1.5 GiB' or '2048' into bytes.
+    Decimal (KB, MB, ...) and binary (KiB, MiB, ...) units are supported, a missing unit means bytes.
+    """
+    if isinstance(size, int):
+        return size
+    found = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmgtp]?)(i?)b?\s*", size.lower())
+    if not found:
+        raise ValueError(
+            f"Invalid size: '{size}'. Valid examples: '2048', '500MB', '2GiB'."
+        )
+    number, unit, binary = found.groups()
+    base = 1024 if binary else 1000
+    return int(float(number) * base ** " kmgtp".index(unit or " "))
+
+
+class TokenBucket:
+    """
+    Thread safe rate limiter, `acquire` blocks until a token is available.
+    Tokens are refilled continuously at `rate` per second, up to `capacity` (the allowed burst).
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError(f"The rate must be positive, got '{rate}'.")
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.rate)
+
+
+def append_json_line(file: pathlib.Path, entry: dict):
+    """
+    Appends `entry` as one line of json with a single write and fsync's it,
+    so parallel writers don't interleave and an interruption truncates at most the last line.
+    A truncated last line is terminated first, so it does not swallow the new entry.
+    """
+    line = (json.dumps(entry) + "\n").encode("utf-8")
+    fd = os.open(file, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        if os.fstat(fd).st_size > 0:
+            os.lseek(fd, -1, os.SEEK_END)
+            if os.read(fd, 1) != b"\n":
+                line = b"\n" + line
+        os.write(fd, line)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
 def upload_via_api(
     file_sizes,
     space_available_on_server_root_disk,
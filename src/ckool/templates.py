@@ -7,6 +7,7 @@ from typing import Callable
 import paramiko
 
 from ckool import (
+    BUNDLE_INDEX_FILE_NAME,
     HASH_BLOCK_SIZE,
     HASH_TYPE,
     LOGGER,
@@ -26,16 +27,19 @@ from ckool.ckan.publishing import (
     pre_publication_checks,
 )
 from ckool.interfaces.interfaces import SecureInterface
-from ckool.other.caching import read_cache, update_cache
+from ckool.other.caching import read_cache, read_cache_key, update_cache
 from ckool.other.config_parser import config_for_instance
 from ckool.other.file_management import (
+    bundle_index,
     find_archive,
     get_compression_func,
     iter_files,
     stats_file,
+    write_manifest,
 )
 from ckool.other.hashing import get_hash_func
-from ckool.other.types import CompressionTypes, HashTypes
+from ckool.other.journal import UploadJournal
+from ckool.other.types import CompressionTypes, HashTypes, UploadStates
 from ckool.other.utilities import (
     collect_metadata,
     extract_resource_id_and_name,
@@ -45,12 +49,27 @@ from ckool.other.utilities import (
 
 
 def upload_resource_file_via_api(
-    ckan_api_input, package_name, filepath, metadata, progressbar, *args, **kwargs
+    ckan_api_input,
+    package_name,
+    filepath,
+    metadata,
+    progressbar,
+    *args,
+    journal: UploadJournal | None = None,
+    **kwargs,
 ):
     ckan_instance = CKAN(**ckan_api_input)
-    return ckan_instance.create_resource_of_type_file(
+    resource = ckan_instance.create_resource_of_type_file(
         file=filepath, package_id=package_name, progressbar=progressbar, **metadata
     )
+    if journal is not None:
+        journal.record(
+            pathlib.Path(filepath).name,
+            metadata["hash"],
+            UploadStates.hash_patched,
+            id=resource["id"],
+        )
+    return resource
 
 
 def upload_resource_link_via_api(
@@ -70,39 +89,52 @@ def upload_resource_file_via_scp(
     filepath,
     metadata,
     progressbar: bool = True,
+    journal: UploadJournal | None = None,
 ):
+    """
+    journal: UploadJournal [default: None],
+        if provided, each step is recorded and an interrupted upload of the same file
+        continues after the last finished step (the empty resource exists / the file was copied).
+    """
     if isinstance(filepath, str):
         filepath = pathlib.Path(filepath)
 
     real_hash = metadata["hash"]
     metadata["hash"] = UPLOAD_IN_PROGRESS_STRING
+    state = journal.state(filepath.name, real_hash) if journal is not None else None
 
-    with tempfile.TemporaryDirectory() as tmp:
-        tmp = pathlib.Path(tmp)
-        empty = tmp / filepath.name
-        empty.touch()
-
-        ckan_instance = CKAN(**ckan_api_input)
-        ckan_instance.create_resource_of_type_file(
-            file=empty, package_id=package_name, progressbar=False, **metadata
-        )
-        empty.unlink()
+    ckan_instance = CKAN(**ckan_api_input)
+    if state not in [UploadStates.created, UploadStates.uploaded]:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = pathlib.Path(tmp)
+            empty = tmp / filepath.name
+            empty.touch()
+
+            ckan_instance.create_resource_of_type_file(
+                file=empty, package_id=package_name, progressbar=False, **metadata
+            )
+            empty.unlink()
+        if journal is not None:
+            journal.record(filepath.name, real_hash, UploadStates.created)
 
     if not (resource_name := metadata.get("name")):
         resource_name = filepath.name
 
-    empty_file_location = ckan_instance.get_local_resource_path(
-        package_name=package_name,
-        resource_id_or_name=resource_name,
-        ckan_storage_path=ckan_storage_path,
-    )
+    if state != UploadStates.uploaded:
+        empty_file_location = ckan_instance.get_local_resource_path(
+            package_name=package_name,
+            resource_id_or_name=resource_name,
+            ckan_storage_path=ckan_storage_path,
+        )
 
-    si = SecureInterface(**secure_interface_input)
-    si.scp(
-        local_filepath=filepath,
-        remote_filepath=empty_file_location,
-        progressbar=progressbar,
-    )
+        si = SecureInterface(**secure_interface_input)
+        si.scp(
+            local_filepath=filepath,
+            remote_filepath=empty_file_location,
+            progressbar=progressbar,
+        )
+        if journal is not None:
+            journal.record(filepath.name, real_hash, UploadStates.uploaded)
 
     resource_id = ckan_instance.resolve_resource_id_or_name_to_id(
         package_name=package_name,
@@ -112,6 +144,10 @@ def upload_resource_file_via_scp(
     ckan_instance.patch_resource_metadata(
         resource_id=resource_id, resource_data_to_update={"hash": real_hash}
     )
+    if journal is not None:
+        journal.record(
+            filepath.name, real_hash, UploadStates.hash_patched, id=resource_id
+        )
 
 
 def get_upload_func(
@@ -234,9 +270,6 @@ def resource_integrity_remote_intact(
     resource_id_or_name: str,
     cache_directory: pathlib.Path,
 ):
-    hash_remote_ = None
-    cf = {}
-
     LOGGER.info(f"... checking resource integrity for '{resource_id_or_name}'.")
     ckan = CKAN(**ckan_api_input)
     LOGGER.info("... retrieving hash value from CKAN.")
@@ -250,9 +283,7 @@ def resource_integrity_remote_intact(
     integrity_cache_file = cache_directory / PUBLICATION_INTEGRITY_CHECK_CACHE
     temporary_resource_name = f"{meta['id']}-{meta['name']}"
     integrity_cache_key = f"remote-{temporary_resource_name}"
-    if integrity_cache_file.exists():
-        cf = read_cache(integrity_cache_file)
-        hash_remote_ = cf.get(integrity_cache_key, None)
+    hash_remote_ = read_cache_key(integrity_cache_file, integrity_cache_key)
 
     if hash_remote_ is None:
         LOGGER.info(f"... hashing resource '{meta['name']}' remotely.")
@@ -284,8 +315,7 @@ def resource_integrity_remote_intact(
         sys.exit()
     LOGGER.info("... resource integrity intact.")
 
-    cf[integrity_cache_key] = hash_local
-    update_cache(cf, integrity_cache_file)
+    update_cache({integrity_cache_key: hash_local}, integrity_cache_file)
 
     return hash_local == hash_remote_
 
@@ -365,12 +395,22 @@ def archive_folder(folder: dict, compression_func: Callable, progressbar):
             f"... archive for folder '{folder['root_folder']}' found. Skipping compression."
         )
         return archive
-    return compression_func(
+    extra_members = None
+    if folder.get("bundle"):
+        extra_members = {
+            BUNDLE_INDEX_FILE_NAME: bundle_index(folder["root_folder"], folder["files"])
+        }
+    archive = compression_func(
         root_folder=folder["root_folder"],
         archive_destination=folder["archive_destination"],
         files=folder["files"],
         progressbar=progressbar,
+        extra_members=extra_members,
+    )
+    write_manifest(
+        folder["archive_destination"], folder["root_folder"], folder["files"]
     )
+    return archive
 
 
 def handle_folder(
@@ -397,15 +437,48 @@ def wrapped_upload(
     cfg_secure_interface: dict,
     upload_func: Callable,
     progressbar: bool,
+    journal: UploadJournal | None = None,
 ):
+    """
+    journal: UploadJournal [default: None],
+        resources the journal marks as verified are skipped if the package on CKAN still
+        contains them, interrupted scp uploads are resumed instead of being deleted and uploaded again.
+    """
     meta_copy = deepcopy(meta)
     status = "normal"
     filepath = pathlib.Path(meta["file"])
     del meta_copy["file"]
 
-    # Check if resource with corresponding hash is already on ckan
+    journal_entry = {}
+    if journal is not None:
+        journal_entry = journal.last(filepath.name, meta["hash"])
+
     LOGGER.info(f"... uploading resource '{filepath.name}' to '{package_name}'.")
-    if ckan_instance.resource_exists(
+    if journal_entry.get("state") == UploadStates.verified.value:
+        resource_ids = [
+            resource["id"]
+            for resource in ckan_instance.get_package(package_name)["resources"]
+        ]
+        if journal_entry["id"] in resource_ids:
+            LOGGER.info("... resource upload was verified in a previous run, skipped.")
+            return {
+                "id": journal_entry["id"],
+                "name": filepath.name,
+                "status": "skipped",
+            }
+        LOGGER.info(
+            "... resource upload was verified in a previous run, but the resource is gone."
+        )
+
+    if "via_scp" in upload_func.__name__ and journal_entry.get("state") in [
+        UploadStates.created.value,
+        UploadStates.uploaded.value,
+    ]:
+        LOGGER.info("... resuming interrupted upload.")
+        status = "resumed"
+
+    # Check if resource with corresponding hash is already on ckan
+    elif ckan_instance.resource_exists(
         package_name=package_name, resource_name=filepath.name
     ):
         LOGGER.info("... resource already exists.")
@@ -419,6 +492,13 @@ def wrapped_upload(
                 "... resource hash on CKAN matches the local hash, upload skipped."
             )
             status = "skipped"
+            if journal is not None:
+                journal.record(
+                    filepath.name,
+                    meta["hash"],
+                    UploadStates.verified,
+                    id=meta_on_ckan["id"],
+                )
             return {"id": meta_on_ckan["id"], "name": filepath.name, "status": status}
 
         else:  # meta_on_ckan["hash"] == UPLOAD_IN_PROGRESS_STRING:
@@ -433,6 +513,8 @@ def wrapped_upload(
             status = "replaced"
 
     LOGGER.debug("...starting upload.")
+    if journal is not None:
+        journal.record(filepath.name, meta["hash"], UploadStates.queued)
     _ = upload_func(
         ckan_api_input=cfg_ckan_api,
         secure_interface_input=cfg_secure_interface,
@@ -441,13 +523,18 @@ def wrapped_upload(
         filepath=filepath,
         metadata=meta_copy,
         progressbar=progressbar,
+        journal=journal,
     )
 
-    resource_id = ckan_instance.resolve_resource_id_or_name_to_id(
+    meta_on_ckan = ckan_instance.get_resource_meta(
         package_name=package_name, resource_id_or_name=filepath.name
-    )["id"]
+    )
+    if journal is not None and meta_on_ckan["hash"] == meta["hash"]:
+        journal.record(
+            filepath.name, meta["hash"], UploadStates.verified, id=meta_on_ckan["id"]
+        )
 
-    return {"id": resource_id, "name": filepath.name, "status": status}
+    return {"id": meta_on_ckan["id"], "name": filepath.name, "status": status}
 
 
 def handle_upload_all(
@@ -501,6 +588,9 @@ def handle_upload_all(
         LOGGER.info("... upload via API selected.")
 
     ckan_instance = CKAN(**cfg_ckan_api)
+    journal = UploadJournal(
+        package_folder / TEMPORARY_DIRECTORY_NAME, package_name, cfg_ckan_api["server"]
+    )
     _uploaded = []
     for meta in metadata_map_filtered.values():
         _uploaded.append(
@@ -513,6 +603,7 @@ def handle_upload_all(
                 cfg_secure_interface=cfg_secure_interface,
                 upload_func=upload_func,
                 progressbar=progressbar,
+                journal=journal,
             )
         )
 
@@ -559,6 +650,9 @@ def handle_upload_single(
         cfg_secure_interface=cfg_secure_interface,
         upload_func=upload_func,
         progressbar=progressbar,
+        journal=UploadJournal(
+            pathlib.Path(metadata_file).parent, package_name, cfg_ckan_api["server"]
+        ),
     )
 
 
@@ -568,9 +662,13 @@ def handle_folder_file(
     compression_type: CompressionTypes,
     hash_algorithm: HashTypes,
     progressbar: bool,
+    adaptive_compression: bool = False,
+    compression_workers: int = 1,
 ):
     hash_func = get_hash_func(hash_algorithm)
-    compression_func = get_compression_func(compression_type)
+    compression_func = get_compression_func(
+        compression_type, adaptive=adaptive_compression, workers=compression_workers
+    )
 
     if file := info["file"]:  # files are hashed
         return handle_file(
@@ -583,7 +681,7 @@ def handle_folder_file(
         )
 
     elif folder := info["folder"]:  # folders are compressed and then hashed
-        if include_sub_folders:
+        if include_sub_folders or folder.get("bundle"):
             return handle_folder(
                 folder,
                 hash_func,
@@ -611,6 +709,8 @@ def handle_folder_file_upload(
     ckan_instance_name: str,
     verify: bool,
     section: str,
+    adaptive_compression: bool = False,
+    compression_workers: int = 1,
 ):
     cache_file = handle_folder_file(
         info,
@@ -618,6 +718,8 @@ def handle_folder_file_upload(
         compression_type,
         hash_algorithm,
         progressbar,
+        adaptive_compression=adaptive_compression,
+        compression_workers=compression_workers,
     )
 
     if cache_file is not None:
@@ -726,11 +828,9 @@ def handle_resource_download_with_integrity_check(
         if not resource["hash"]:
             raise ValueError(f"No resource hash for '{resource['name']}'.")
 
-        cf = {}
-        if integrity_cache_file.exists():
-            cf = read_cache(integrity_cache_file)
-
-        if (hash_local := cf.get(integrity_cache_key)) and not re_download:
+        if (
+            hash_local := read_cache_key(integrity_cache_file, integrity_cache_key)
+        ) and not re_download:
             LOGGER.info(
                 f"... using cached local hash for resource '{resource['name']}'."
             )
@@ -747,8 +847,7 @@ def handle_resource_download_with_integrity_check(
             )
             temporary_resource_path.unlink()
             sys.exit()
-        cf[integrity_cache_key] = hash_local
-        update_cache(cf, integrity_cache_file)
+        update_cache({integrity_cache_key: hash_local}, integrity_cache_file)
     return {"id": id_, "name": temporary_resource_name}
 
 
@@ -0,0 +1,73 @@
+import json
+
+import ckanapi
+import pytest
+
+from ckool.ckan.bulk import bulk_patch, read_bulk_patch_records
+from ckool.ckan.ckan import CKAN
+
+
+def test_read_bulk_patch_records(tmp_path):
+    records_file = tmp_path / "records.jsonl"
+    records_file.write_text(
+        '{"id": "a", "patch": {"title": "A"}}\n'
+        "\n"
+        '{"id": "r", "patch": {"description": ""}, "type": "resource"}\n'
+    )
+    assert list(read_bulk_patch_records(records_file)) == [
+        {"id": "a", "patch": {"title": "A"}, "type": "package"},
+        {"id": "r", "patch": {"description": ""}, "type": "resource"},
+    ]
+
+    records_file.write_text('{"id": "a"}\n')
+    with pytest.raises(ValueError):
+        list(read_bulk_patch_records(records_file))
+
+
+def test_bulk_patch(tmp_path):
+    ckan = CKAN(server="https://ckan.example", token="token")
+    calls = []
+    flaky = {"b": 1}
+
+    def plain_action_call(endpoint, **kwargs):
+        calls.append((endpoint, kwargs["id"]))
+        if flaky.get(kwargs["id"]):
+            flaky[kwargs["id"]] -= 1
+            raise ckanapi.CKANAPIError("502 Bad Gateway")
+        if kwargs["id"] == "invalid":
+            raise ckanapi.ValidationError({"title": "invalid"})
+        return kwargs
+
+    ckan.plain_action_call = plain_action_call
+    records = [
+        {"id": "a", "patch": {"title": "A"}, "type": "package"},
+        {"id": "b", "patch": {"title": "B"}, "type": "package"},
+        {"id": "r", "patch": {"description": ""}, "type": "resource"},
+        {"id": "invalid", "patch": {"title": ""}, "type": "package"},
+        {"id": "a", "patch": {"notes": "A"}, "type": "package"},
+    ]
+    progress_file = tmp_path / "records.jsonl.progress"
+
+    result = bulk_patch(ckan, records, progress_file, rate=1000, backoff=0.01)
+    assert result == {"patched": 4, "skipped": 0, "failed": 1}
+    assert sorted(calls) == [
+        ("package_patch", "a"),
+        ("package_patch", "a"),
+        ("package_patch", "b"),
+        ("package_patch", "b"),
+        ("package_patch", "invalid"),
+        ("resource_patch", "r"),
+    ]
+    entries = [json.loads(line) for line in progress_file.read_text().splitlines()]
+    assert sorted((e["key"], e["ok"]) for e in entries) == [
+        ("1:package:a", True),
+        ("2:package:b", True),
+        ("3:resource:r", True),
+        ("4:package:invalid", False),
+        ("5:package:a", True),
+    ]
+
+    calls.clear()
+    result = bulk_patch(ckan, records, progress_file, rate=1000, backoff=0.01)
+    assert result == {"patched": 0, "skipped": 4, "failed": 1}
+    assert calls == [("package_patch", "invalid")]
@@ -604,3 +604,72 @@ def test_package_delete_delete_purge(
     dynamic_ckan_instance.purge_package(ckan_entities["test_package"])
     with pytest.raises(ckanapi.errors.NotFound):
         dynamic_ckan_instance.get_package(ckan_entities["test_package"])
+
+
+def test_batch_update_resources():
+    ckan = CKAN(server="https://ckan.example", token="token")
+    resources = [
+        {"id": "id-1", "name": "file.zip", "description": ""},
+        {"id": "id-2", "name": "link", "description": "", "url": "https://a.b"},
+    ]
+    calls = []
+
+    def plain_action_call(endpoint, **kwargs):
+        calls.append(endpoint)
+        if endpoint == "package_show":
+            return {"id": "pkg-id", "resources": deepcopy(resources)}
+        if endpoint == "package_patch":
+            if invalid:
+                raise ckanapi.ValidationError({"resources": "invalid"})
+            return kwargs
+
+    invalid = False
+    ckan.plain_action_call = plain_action_call
+    new_link = {"name": "new link", "url": "https://c.d", "url_type": ""}
+    result = ckan.batch_update_resources(
+        "my-package",
+        resources_to_create=[new_link],
+        resources_to_patch={"link": {"description": "patched"}},
+    )
+    assert calls == ["package_show", "package_patch"]
+    assert result["id"] == "pkg-id"
+    assert result["resources"] == [
+        resources[0],
+        {**resources[1], "description": "patched"},
+        new_link,
+    ]
+
+    calls.clear()
+    invalid = True
+    ckan.batch_update_resources(
+        "my-package",
+        resources_to_create=[new_link],
+        resources_to_patch={"file.zip": {"description": "patched"}},
+    )
+    assert calls == [
+        "package_show",
+        "package_patch",
+        "resource_patch",
+        "resource_create",
+        "package_show",
+    ]
+
+    calls.clear()
+    assert ckan.batch_update_resources("my-package") is None
+    assert calls == []
+
+
+def test_iter_all_packages():
+    ckan = CKAN(server="https://ckan.example", token="token")
+    packages = [{"name": f"package-{i:03d}"} for i in range(25)]
+    calls = []
+
+    def plain_action_call(endpoint, **kwargs):
+        calls.append(kwargs)
+        start, rows = kwargs["start"], kwargs["rows"]
+        return {"count": len(packages), "results": packages[start : start + rows]}
+
+    ckan.plain_action_call = plain_action_call
+    assert list(ckan.iter_all_packages(rows=10, workers=2)) == packages
+    assert sorted(c["start"] for c in calls) == [0, 10, 20]
+    assert all(c["sort"] == "name asc" and c["include_private"] for c in calls)
@@ -0,0 +1,86 @@
+import datetime
+
+from ckool.ckan.ckan import CKAN
+from ckool.ckan.mirror import MetadataMirror
+
+
+def utc_now():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def test_metadata_mirror_sync(tmp_path):
+    ckan = CKAN(server="https://ckan.example", token="token")
+    remote = {
+        "a": {"id": "a", "name": "pkg-a", "metadata_modified": "2024-01-01T10:00:00.1"},
+        "b": {"id": "b", "name": "pkg-b", "metadata_modified": "2024-01-02T10:00:00.2"},
+    }
+    queries = []
+
+    def plain_action_call(endpoint, **kwargs):
+        queries.append(kwargs.get("fq"))
+        results = sorted(remote.values(), key=lambda p: p["name"])
+        if kwargs.get("fl") == "id":
+            results = [{"id": p["id"]} for p in results]
+        elif fq := kwargs.get("fq"):
+            since = fq.split("[")[1].split("Z")[0]
+            results = [p for p in results if p["metadata_modified"][:19] >= since]
+        return {"count": len(results), "results": results}
+
+    ckan.plain_action_call = plain_action_call
+    mirror = MetadataMirror(tmp_path / "mirror.sqlite")
+    assert mirror.watermark() is None
+
+    before = utc_now()
+    assert mirror.sync(ckan) == {"updated": 2, "deleted": 0}
+    assert queries == [None, None]
+    watermark = datetime.datetime.fromisoformat(mirror.watermark())
+    assert before - datetime.timedelta(minutes=6) < watermark < before
+    assert mirror.get("pkg-a") == remote["a"]
+
+    del remote["a"]
+    remote["c"] = {
+        "id": "c",
+        "name": "pkg-c",
+        "metadata_modified": utc_now().isoformat(),
+    }
+    queries.clear()
+    assert mirror.sync(ckan) == {"updated": 1, "deleted": 1}
+    assert queries[0] == f"metadata_modified:[{watermark.isoformat()[:19]}Z TO *]"
+    assert mirror.get("a") is None
+    assert [p["name"] for p in mirror.packages()] == ["pkg-b", "pkg-c"]
+    assert len(mirror) == 2
+
+
+def test_metadata_mirror_sync_package_modified_during_sync(tmp_path):
+    ckan = CKAN(server="https://ckan.example", token="token")
+    remote = {
+        "a": {"id": "a", "name": "pkg-a", "metadata_modified": "2024-01-01T10:00:00"},
+        "b": {"id": "b", "name": "pkg-b", "metadata_modified": "2024-01-02T10:00:00"},
+    }
+
+    def plain_action_call(endpoint, **kwargs):
+        results = [dict(p) for p in sorted(remote.values(), key=lambda p: p["name"])]
+        if kwargs.get("fl") == "id":
+            return {
+                "count": len(results),
+                "results": [{"id": p["id"]} for p in results],
+            }
+        if fq := kwargs.get("fq"):
+            since = fq.split("[")[1].split("Z")[0]
+            results = [p for p in results if p["metadata_modified"][:19] >= since]
+        elif remote["b"]["metadata_modified"].startswith("2024"):
+            # 'pkg-a' is edited after its page was served, 'pkg-b' right after it
+            remote["a"]["metadata_modified"] = utc_now().isoformat()
+            remote["b"]["metadata_modified"] = (
+                utc_now() + datetime.timedelta(seconds=2)
+            ).isoformat()
+            results[1] = dict(remote["b"])
+        return {"count": len(results), "results": results}
+
+    ckan.plain_action_call = plain_action_call
+    mirror = MetadataMirror(tmp_path / "mirror.sqlite")
+    mirror.sync(ckan)
+    assert mirror.get("pkg-a")["metadata_modified"] == "2024-01-01T10:00:00"
+
+    mirror.sync(ckan)
+    assert mirror.get("pkg-a") == remote["a"]
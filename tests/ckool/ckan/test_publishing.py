@@ -20,9 +20,11 @@ from ckool.ckan.publishing import (
     enrich_and_store_metadata,
     patch_resource_metadata_raw,
     pre_publication_checks,
+    render_all_metadata,
     update_datacite_doi,
 )
 from ckool.datacite.doi_store import LocalDoiStore
+from ckool.datacite.xml_writer import validate_xml_file
 from ckool.other.utilities import resource_is_link
 from ckool.templates import upload_resource_file_via_api, upload_resource_link_via_api
 from tests.ckool.data.inputs.ckan_entity_data import (
@@ -493,3 +495,36 @@ def test_update_datacite_doi(
     assert datacite_instance.doi_retrieve(_doi)
 
     datacite_instance.doi_delete(_doi)
+
+
+def test_render_all_metadata(tmp_path, json_test_data):
+    lds = LocalDoiStore(tmp_path)
+    package = json_test_data["package_metadata"]
+    for name, doi in [("test_package", "10.45934/25AZ53"), ("no_doi", None)]:
+        (tmp_path / "person-2323" / name).mkdir(parents=True)
+        lds.write(
+            name="person-2323",
+            package=name,
+            filename_content_map={
+                "orcids.json": json.dumps(json_test_data["orcids"]),
+                "affiliations.json": json.dumps(json_test_data["affiliations"]),
+                **({"doi.txt": doi} if doi else {}),
+            },
+        )
+
+    packages = [
+        package,
+        {**package, "name": "no_doi"},
+        {**package, "name": "not_in_store"},
+    ]
+    reports = render_all_metadata(packages, lds, workers=2)
+
+    assert [r["package"] for r in reports] == ["no_doi", "test_package"]
+    assert reports[0]["error"].startswith("FileNotFoundError")
+    assert reports[1]["error"] is None and reports[1]["seconds"] > 0
+
+    xml_file = lds.get_xml_file("test_package")
+    assert validate_xml_file(xml_file)
+    assert "10.45934/25AZ53" in xml_file.read_text()
+    assert json.loads(xml_file.with_suffix(".json").read_text())
+    assert not (tmp_path / "person-2323" / "no_doi" / "metadata.xml").exists()
@@ -1,6 +1,10 @@
+import base64
+
 import pytest
+import requests
 
-from ckool.datacite.datacite import DataCiteException
+from ckool.datacite.datacite import DataCiteAPI, DataCiteException
+from ckool.datacite.doi_generator import generate_dois
 
 
 @pytest.mark.impure
@@ -57,6 +61,24 @@ def test_generate_unused_dois(datacite_instance):
     ]
 
 
+def test_generate_unused_dois_offline(monkeypatch):
+    dois = [f"10.5524/{d.lower()[-6:]}" for d in generate_dois("10.5524", 0, 3000, 0)]
+    dois = dois[:1500] + dois[2000:]
+    generated = list(
+        DataCiteAPI._generate_unused_dois(
+            dois, number_to_generate=600, prefix="10.5524", offset=0
+        )
+    )
+    assert generated == generate_dois("10.5524", 1500, 2000, 0) + generate_dois(
+        "10.5524", 3000, 3100, 0
+    )
+
+    monkeypatch.setattr("ckool.datacite.doi_generator.RANGESIZE", 3000)
+    assert len(list(DataCiteAPI._generate_unused_dois(dois, 500, "10.5524", 0))) == 500
+    with pytest.raises(ValueError):
+        list(DataCiteAPI._generate_unused_dois(dois, 501, "10.5524", 0))
+
+
 @pytest.mark.impure
 def test_doi_list_via_prefix(datacite_instance):
     dois = datacite_instance.doi_list_fast()
@@ -111,3 +133,145 @@ def test_doi_delete_non_existing(datacite_instance, load_env_file):
     assert d
     with pytest.raises(DataCiteException):
         datacite_instance.doi_delete(doi)
+
+
+def _fake_doi_listing(dois, page_size):
+    calls = []
+
+    def doi_list_page(params, url=None):
+        calls.append(url or params)
+        if url is not None:  # following the 'next' link of cursor pagination
+            start = int(url.rsplit("=", 1)[1])
+        else:
+            start = (params.get("page[number]", 1) - 1) * page_size
+        page = {
+            "data": [{"id": doi} for doi in dois[start : start + page_size]],
+            "meta": {"total": len(dois)},
+            "links": {},
+        }
+        if url is not None or "page[cursor]" in params:
+            page["links"]["next"] = f"https://api.test/dois?cursor={start + page_size}"
+        return page
+
+    return doi_list_page, calls
+
+
+def test_doi_list_all(tmp_path):
+    datacite = DataCiteAPI(
+        host="https://api.test/",
+        prefix="10.5524",
+        user="user",
+        password="password",
+        registry_cache_file=tmp_path / "registry.json",
+    )
+    dois = [f"10.5524/{i:06d}" for i in range(25)]
+    datacite._doi_list_page, calls = _fake_doi_listing(dois, 10)
+    assert datacite.doi_list_all(page_size=10) == set(dois)
+    assert sorted(r["page[number]"] for r in calls) == [1, 2, 3]
+
+    datacite._doi_list_page, calls = _fake_doi_listing(dois, 10)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("ckool.datacite.datacite.DATACITE_MAX_PAGED_RECORDS", 20)
+        assert datacite.doi_list_all(page_size=10) == set(dois)
+    assert calls[1]["page[cursor]"] == 1
+
+
+def test_doi_registry(tmp_path):
+    datacite = DataCiteAPI(
+        host="https://api.test/",
+        prefix="10.5524",
+        user="user",
+        password="password",
+        registry_cache_file=tmp_path / "registry.json",
+    )
+    calls = []
+
+    def doi_list_all(updated_since=None):
+        calls.append(updated_since)
+        return {"10.5524/000000"} if updated_since is None else {"10.5524/000011"}
+
+    datacite.doi_list_all = doi_list_all
+    assert datacite.doi_registry() == {"10.5524/000000"}
+    assert datacite.doi_registry() == {"10.5524/000000", "10.5524/000011"}
+    assert calls[0] is None and calls[1].endswith("Z")
+    assert datacite.doi_registry(refresh=False) == {"10.5524/000000", "10.5524/000011"}
+    assert len(calls) == 2
+    assert datacite.doi_generate_n_strings_unused(n=1) == ["10.5524/000022"]
+
+
+def test_doi_update_payload(tmp_path, mock_datacite):
+    xml_file = tmp_path / "metadata.xml"
+    xml_file.write_text("<resource>äöü " + "x" * 1000 + "</resource>")
+    mock_datacite.dois["10.5524/000000"] = {"doi": "10.5524/000000"}
+    datacite = mock_datacite.api
+    assert datacite.doi_update("10.5524/000000", "https://a.b/c", xml_file)
+    attributes = mock_datacite.dois["10.5524/000000"]
+    assert attributes["url"] == "https://a.b/c"
+    assert base64.b64decode(attributes["xml"]) == xml_file.read_bytes()
+
+    assert datacite.doi_update("10.5524/000000", "https://d.e/f")
+    assert mock_datacite.dois["10.5524/000000"]["url"] == "https://d.e/f"
+    assert datacite.doi_retrieve("10.5524/000000")["attributes"]["url"] == (
+        "https://d.e/f"
+    )
+
+
+def test_update_many(mock_datacite):
+    dois = [f"10.5524/{i:06d}" for i in range(40)]
+    for doi in dois:
+        mock_datacite.dois[doi] = {"doi": doi.lower()}
+    mock_datacite.failures = {dois[1]: [503, 429], dois[2]: [502], dois[3]: [500] * 10}
+
+    results = mock_datacite.api.update_many(
+        [{"doi": doi, "url": f"https://new.domain/{doi}"} for doi in dois]
+        + [{"doi": "10.5524/UNKNOWN", "url": "https://new.domain/x"}],
+        workers=8,
+    )
+
+    assert [r["doi"] for r in results] == dois + ["10.5524/UNKNOWN"]
+    failed = {r["doi"] for r in results if not r["ok"]}
+    assert failed == {dois[3], "10.5524/UNKNOWN"}
+    assert "500" in results[3]["error"] and "404" in results[-1]["error"]
+    assert all(
+        mock_datacite.dois[doi].get("url") == f"https://new.domain/{doi}"
+        for doi in dois
+        if doi != dois[3]
+    )
+    puts = [doi for method, doi in mock_datacite.requests if method == "PUT"]
+    assert puts.count(dois[1]) == 3 and puts.count(dois[2]) == 2
+    assert puts.count(dois[3]) == 6  # first attempt and DATACITE_MAX_RETRIES
+
+    # reserving is not idempotent, it is not retried
+    mock_datacite.failures = {"10.5524/NEW": [503]}
+    with pytest.raises(requests.HTTPError):
+        mock_datacite.api.doi_reserve("10.5524/NEW")
+    assert "10.5524/NEW" not in mock_datacite.dois
+
+
+def test_doi_generate_and_reserve_with_ledger(mock_datacite):
+    datacite = mock_datacite.api
+    mock_datacite.dois["10.5524/000000"] = {"doi": "10.5524/000000"}
+
+    assert datacite.doi_generate_n_strings_unused(n=2) == [
+        "10.5524/000011",
+        "10.5524/000022",
+    ]
+    listings = [r for r in mock_datacite.requests if r == ("GET", None)]
+    assert datacite.doi_generate_n_strings_unused(n=1) == ["10.5524/000033"]
+    assert [r for r in mock_datacite.requests if r == ("GET", None)] == listings
+
+    # registered by someone else since the last sync
+    mock_datacite.dois["10.5524/000044"] = {"doi": "10.5524/000044"}
+    assert datacite.doi_reserve_n(n=2) == ["10.5524/000055", "10.5524/000066"]
+    assert {"10.5524/000055", "10.5524/000066"} <= mock_datacite.dois.keys()
+    states = {doi: e["state"] for doi, e in datacite.ledger.entries().items()}
+    assert states["10.5524/000044"] == "registered"
+    assert states["10.5524/000055"] == states["10.5524/000066"] == "reserved"
+
+    # any other validation error is raised, the unused dois are handed back
+    mock_datacite.failures["10.5524/000077"] = [422]
+    with pytest.raises(DataCiteException):
+        datacite.doi_reserve_n(n=2)
+    states = {doi: e["state"] for doi, e in datacite.ledger.entries().items()}
+    assert "10.5524/000077" not in states and "10.5524/000088" not in states
+    assert datacite.doi_reserve_n(n=1) == ["10.5524/000077"]
@@ -1,4 +1,12 @@
-from ckool.datacite.doi_generator import generate_doi, revert_doi
+import pytest
+
+from ckool.datacite.doi_generator import (
+    RANGESIZE,
+    generate_doi,
+    generate_dois,
+    revert_doi,
+    revert_dois,
+)
 
 
 def test_generate_doi():
@@ -7,3 +15,23 @@ def test_generate_doi():
 
 def test_revert_doi():
     assert revert_doi("abc/000AJ5") == {"prefix": "abc", "intid": 293, "offset": 0}
+
+
+@pytest.mark.parametrize("offset", [0, 2000000, 24000000])
+def test_generate_and_revert_dois(offset):
+    for start, stop in [(0, 2000), (RANGESIZE - 2000, RANGESIZE)]:
+        dois = generate_dois("abc", start, stop, offset)
+        assert dois == [generate_doi("abc", i, offset) for i in range(start, stop)]
+        assert revert_dois(dois) == [revert_doi(doi) for doi in dois]
+        assert revert_dois(d.lower().split("/")[1] for d in dois) == [
+            revert_doi(d.lower().split("/")[1]) for d in dois
+        ]
+
+    assert generate_dois("abc", 293, 294, 0, url=True) == ["https://doi.org/abc/000AJ5"]
+    assert revert_dois(["abc/00AJ5"]) == [revert_doi("abc/00AJ5")]
+    with pytest.raises(ValueError):
+        revert_dois(["abc/000AJ0"])
+    with pytest.raises(ValueError):
+        generate_dois("abc", 0, RANGESIZE + 1, 0)
+    with pytest.raises(ValueError):
+        generate_dois("abc", 0, 1, 1)
@@ -0,0 +1,47 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from ckool.datacite.doi_generator import generate_dois
+from ckool.datacite.doi_ledger import DoiLedger
+
+
+def _generate(database, n):
+    return DoiLedger(database).generate(n, "10.5524", 0)
+
+
+def test_doi_ledger(tmp_path):
+    ledger = DoiLedger(tmp_path / "ledger.sqlite")
+    candidates = generate_dois("10.5524", 0, 10, 0)
+    assert ledger.needs_sync()
+
+    assert ledger.sync([d.lower() for d in candidates[:2]]) == 2
+    assert not ledger.needs_sync()
+    assert ledger.needs_sync(max_age=-1)
+
+    assert ledger.generate(3, "10.5524", 0, operator="you") == candidates[2:5]
+    assert ledger.generate(1, "10.5524", 0) == candidates[5:6]
+
+    ledger.mark_reserved(candidates[2:3], operator="me")
+    ledger.release(candidates[2:5])
+    entries = ledger.entries()
+    assert {doi: e["state"] for doi, e in entries.items()} == {
+        candidates[0]: "registered",
+        candidates[1]: "registered",
+        candidates[2]: "reserved",
+        candidates[5]: "generated",
+    }
+    assert entries[candidates[2]]["operator"] == "me"
+    assert ledger.generate(2, "10.5524", 0) == candidates[3:5]
+
+    assert ledger.sync(candidates[:6]) == 0
+    assert ledger.entries()[candidates[5]]["state"] == "registered"
+
+
+def test_doi_ledger_concurrent_generation(tmp_path):
+    database = tmp_path / "ledger.sqlite"
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        batches = list(executor.map(_generate, [database] * 8, [25] * 8))
+
+    dois = [doi for batch in batches for doi in batch]
+    assert len(dois) == len(set(dois)) == 200
+    assert sorted(dois) == sorted(generate_dois("10.5524", 0, 200, 0))
+    assert len(DoiLedger(database)) == 200
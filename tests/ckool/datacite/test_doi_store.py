@@ -1,4 +1,5 @@
 import json
+import shutil
 
 import pytest
 from pytest_unordered import unordered
@@ -122,3 +123,65 @@ def test_get_json_file_content_not_found(tmp_path, local_structure_doi):
 
     orc = lds.get_orcids(package_name="package-url-232", filename="orcids.json")
     assert orc is None
+
+
+def test_index(tmp_path, local_structure_doi, user_cache_folder):
+    lds = LocalDoiStore(tmp_path)
+    assert lds.get_xml_file("package-url-1", filename="file-1.txt") == (
+        tmp_path / "name-1" / "package-url-1" / "file-1.txt"
+    )
+    assert lds.index_file.parent == user_cache_folder
+    assert lds.index_file.exists()
+    assert set(lds._index["packages"]) == {"package-url-1", "package-url-2"}
+
+    # no substring matches
+    assert lds.get_orcids("package-url", filename="file-1.txt") is None
+
+    # changes made by another store instance are picked up
+    other = LocalDoiStore(tmp_path)
+    other.write(
+        name="name-3",
+        package="package-url-3",
+        filename_content_map={"doi.txt": "10.45934/25AZ53"},
+    )
+    (tmp_path / "name-1" / "package-url-1" / "doi.txt").write_text("10.45934/ABCDEF")
+    assert lds.get_doi("package-url-3") == "10.45934/25AZ53"
+    assert lds.get_doi("package-url-1") == "10.45934/ABCDEF"
+
+    # files added to a sub folder of a package are picked up
+    (sub := tmp_path / "name-1" / "package-url-1" / "sub").mkdir()
+    assert lds.get_orcids("package-url-1", filename="extra.json") is None
+    (sub / "extra.json").write_text('{"orcid": "0000"}')
+    assert lds.get_orcids("package-url-1", filename="extra.json") == {"orcid": "0000"}
+
+    shutil.rmtree(tmp_path / "name-3")
+    with pytest.raises(FileNotFoundError):
+        lds.get_doi("package-url-3")
+    assert "name-3" not in LocalDoiStore(tmp_path).refresh_index()["folders"]
+
+
+def test_audit(tmp_path, local_structure_doi, user_cache_folder):
+    lds = LocalDoiStore(tmp_path)
+    (tmp_path / "name-1" / "package-url-1" / "doi.txt").write_text("10.45934/AAAAAA")
+    (tmp_path / "name-1" / "package-url-2" / "doi.txt").write_text("no doi")
+    (tmp_path / "name-2" / "package-url-2" / "doi.txt").write_text("10.45934/AAAAAA")
+
+    report = lds.audit(registered_dois={"10.45934/aaaaaa", "10.45934/bbbbbb"})
+    assert report["packages"] == 3
+    assert report["missing_doi_file"] == []
+    assert list(report["invalid_doi_file"]) == ["name-1/package-url-2"]
+    assert report["duplicate_dois"] == {
+        "10.45934/aaaaaa": ["name-1/package-url-1", "name-2/package-url-2"]
+    }
+    assert report["not_registered"] == {}
+    assert report["not_in_store"] == ["10.45934/bbbbbb"]
+
+    assert lds.audit_file.parent == user_cache_folder
+    cached = json.loads(lds.audit_file.read_text())
+    assert cached["name-1"]["package-url-1"]["doi"] == "10.45934/AAAAAA"
+
+    (tmp_path / "name-2" / "package-url-2" / "doi.txt").unlink()
+    report = lds.audit()
+    assert report["missing_doi_file"] == ["name-2/package-url-2"]
+    assert report["duplicate_dois"] == {}
+    assert "not_registered" not in report
@@ -0,0 +1,134 @@
+import json
+import time
+
+import pytest
+
+from ckool.datacite.doi_store import LocalDoiStore
+from ckool.datacite.orcid_index import AuthorOrcidIndex
+from ckool.interfaces.mixed_requests import search_orcid_by_author
+from ckool.interfaces.prefetch import LookupPrefetcher
+from ckool.other.prompt import ask_for_orcids
+
+
+def _write_orcids(lds, name, package, orcids):
+    lds.write(
+        name=name,
+        package=package,
+        filename_content_map={"orcids.json": json.dumps(orcids)},
+        overwrite=True,
+    )
+
+
+def test_author_orcid_index(tmp_path, user_cache_folder):
+    lds = LocalDoiStore(tmp_path)
+    _write_orcids(lds, "name-1", "package-1", {"Doe, Jane": "0000-0001"})
+    _write_orcids(lds, "name-1", "package-2", {"Doe,  Jane": "0000-0001"})
+
+    index = AuthorOrcidIndex(lds)
+    assert index.lookup("doe, jane") == [
+        {"id": "0000-0001", "url": "https://orcid.org/0000-0001"}
+    ]
+    assert index.lookup("Roe, Richard") is None
+    assert index.file.parent == user_cache_folder
+    assert index.file.exists()
+
+    index.add_search_results(
+        {"Roe, Richard": [{"id": "0000-0002", "url": "url"}], "Poe, Edgar": []}
+    )
+    _write_orcids(lds, "name-2", "package-3", {"Doe, Jane": "0000-0003"})
+
+    reloaded = AuthorOrcidIndex(lds)
+    assert [r["id"] for r in reloaded.lookup("Doe, Jane")] == ["0000-0001", "0000-0003"]
+    assert reloaded.lookup("Roe, Richard") == [{"id": "0000-0002", "url": "url"}]
+    assert reloaded.lookup("Poe, Edgar") is None
+
+    expired = AuthorOrcidIndex(lds, search_ttl=-1)
+    expired.add_search_results({"Roe, Richard": [{"id": "0000-0002", "url": "url"}]})
+    assert expired.lookup("Roe, Richard") is None
+
+
+def test_ask_for_orcids_uses_index(tmp_path, monkeypatch):
+    lds = LocalDoiStore(tmp_path)
+    _write_orcids(lds, "name-1", "package-1", {"Doe, Jane": "0000-0001"})
+    index = AuthorOrcidIndex(lds)
+    monkeypatch.setattr("ckool.other.prompt.orcid_exists", lambda orcid: "a person")
+
+    with LookupPrefetcher() as prefetcher:
+        prefetcher.submit(
+            search_orcid_by_author,
+            "Roe, Richard",
+            runner=lambda _: [{"id": "0000-0002", "url": "url"}],
+        )
+
+        def prompt_func(question, default=None, **kwargs):
+            return "yes" if question.startswith("Do you") else default
+
+        answers = ask_for_orcids(
+            ["Doe, Jane", "Roe, Richard"],
+            prompt_func,
+            prefetcher=prefetcher,
+            orcid_index=index,
+        )
+    assert answers == {"Doe, Jane": "0000-0001", "Roe, Richard": "0000-0002"}
+    assert AuthorOrcidIndex(lds).lookup("Roe, Richard")[0]["id"] == "0000-0002"
+
+
+def test_ask_for_orcids_failed_search(tmp_path, monkeypatch):
+    index = AuthorOrcidIndex(LocalDoiStore(tmp_path))
+    monkeypatch.setattr("ckool.other.prompt.orcid_exists", lambda orcid: "a person")
+
+    def fail(_):
+        raise ConnectionError("orcid is down")
+
+    with LookupPrefetcher() as prefetcher:
+        prefetcher.submit(search_orcid_by_author, "Doe, Jane", runner=fail)
+        prefetcher.submit(
+            search_orcid_by_author,
+            "Roe, Richard",
+            runner=lambda _: [{"id": "0000-0002", "url": "url"}],
+        )
+
+        def prompt_func(question, default=None, **kwargs):
+            if question.startswith("Do you"):
+                return "yes"
+            return "0000-0001" if "Doe, Jane" in question else default
+
+        answers = ask_for_orcids(
+            ["Doe, Jane", "Roe, Richard"],
+            prompt_func,
+            prefetcher=prefetcher,
+            orcid_index=index,
+        )
+    assert answers == {"Doe, Jane": "0000-0001", "Roe, Richard": "0000-0002"}
+    assert index.lookup("Doe, Jane") is None
+    assert index.lookup("Roe, Richard")[0]["id"] == "0000-0002"
+
+
+@pytest.mark.slow
+def test_author_orcid_index_benchmark(tmp_path):
+    """10k synthetic authors spread over 1000 packages."""
+    lds = LocalDoiStore(tmp_path)
+    authors = [f"Author{i:05d}, First" for i in range(10000)]
+    for p in range(1000):
+        _write_orcids(
+            lds,
+            f"name-{p % 20}",
+            f"package-{p}",
+            {a: f"0000-{i:05d}" for i, a in enumerate(authors) if i % 1000 == p},
+        )
+
+    st = time.perf_counter()
+    index = AuthorOrcidIndex(lds).refresh()
+    dt_build = time.perf_counter() - st
+
+    st = time.perf_counter()
+    AuthorOrcidIndex(lds).refresh()
+    dt_reload = time.perf_counter() - st
+
+    st = time.perf_counter()
+    found = [index.lookup(a) for a in authors]
+    dt_lookup = time.perf_counter() - st
+
+    assert all(found)
+    assert dt_reload < dt_build
+    assert dt_lookup < 1
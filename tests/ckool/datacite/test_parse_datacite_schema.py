@@ -2,7 +2,11 @@ import pathlib
 
 import pytest
 
-from ckool.datacite.parse_datacite_schema import SchemaParser
+from ckool.datacite.parse_datacite_schema import (
+    SCHEMA_LATEST,
+    SchemaParser,
+    load_schema_model,
+)
 
 
 @pytest.mark.parametrize(
@@ -116,3 +120,25 @@ def test_get_schema_choices(typ, choices):
         / "metadata_schema_4.5.xsd"
     )
     assert sp.get_schema_choices(typ) == choices
+
+
+def test_load_schema_model_is_cached(user_cache_folder, monkeypatch):
+    load_schema_model.cache_clear()
+
+    model = load_schema_model(SCHEMA_LATEST)
+    cached = list(user_cache_folder.iterdir())
+    assert len(cached) == 1
+    assert cached[0].name.startswith(f"{SCHEMA_LATEST.stem}-")
+    assert "Dataset" in model["enumerations"]["resourceType"]
+
+    # in process memoisation
+    assert load_schema_model(SCHEMA_LATEST) is model
+
+    # a new process reads the json instead of parsing the schema
+    load_schema_model.cache_clear()
+    monkeypatch.setattr(
+        "ckool.datacite.parse_datacite_schema.compile_schema",
+        lambda path: pytest.fail("the schema should not be compiled again"),
+    )
+    assert load_schema_model(SCHEMA_LATEST) == model
+    load_schema_model.cache_clear()
@@ -1,10 +1,13 @@
 import pytest
 
 from ckool.datacite.xml_writer import (
+    DataCiteSchemaValidationError,
     MetaDataToXMLConverter,
     generate_attribute_defaults,
     generate_attribute_map,
+    load_schema_validator,
     read_official_datacite_schema,
+    validate_xml,
 )
 
 
@@ -52,3 +55,75 @@ def test_metadata_to_xml_converter(json_test_data, data_directory):
     xml_correct = (
         (data_directory / "enriched_package_metadata.xml").read_text().replace("\n", "")
     )
+
+
+@pytest.mark.parametrize("typ", ["datacite4.1", "datacite4.4", "datacite4.5"])
+def test_validate_xml(json_test_data, data_directory, typ):
+    assert load_schema_validator(typ) is load_schema_validator(typ)
+
+    md_converter = MetaDataToXMLConverter(
+        json_test_data["enriched_package_metadata"], typ=typ
+    )
+    xml = md_converter.convert_json_to_xml(validate=True)
+    assert md_converter.validate(xml)
+    assert validate_xml(
+        (data_directory / "enriched_package_metadata.xml").read_text(), typ=typ
+    )
+
+    invalid = xml.replace("<titles>", "<titles><unknownElement />", 1)
+    with pytest.raises(DataCiteSchemaValidationError) as e:
+        md_converter.validate(invalid)
+    assert len(e.value.errors) == 1
+    assert e.value.errors[0].startswith("/resource/titles/unknownElement (line ")
+
+    invalid = xml.replace('nameType="Personal"', 'nameType="Robot"')
+    with pytest.raises(DataCiteSchemaValidationError) as e:
+        md_converter.validate(invalid)
+    assert e.value.errors[0].startswith("/resource/creators/creator[1]/creatorName")
+
+    with pytest.raises(DataCiteSchemaValidationError):
+        validate_xml("<resource>", typ=typ)
+
+    with pytest.raises(ValueError):
+        load_schema_validator("abc")
+
+
+@pytest.mark.parametrize("typ", ["datacite4.1", "datacite4.4", "datacite4.5"])
+def test_iter_xml(json_test_data, tmp_path, typ):
+    md_converter = MetaDataToXMLConverter(
+        json_test_data["enriched_package_metadata"], typ=typ
+    )
+    xml = md_converter.convert_json_to_xml()
+    assert "".join(md_converter.iter_xml()) == xml
+
+    filepath = md_converter.convert_json_to_xml_file(
+        tmp_path / "metadata.xml", validate=True
+    )
+    assert filepath.read_text() == xml
+    assert [f.name for f in tmp_path.iterdir()] == ["metadata.xml"]
+
+    md_converter.meta = {
+        "resource": [{"identifier": "<&>"}, {"titles": [{"title": "a"}]}]
+    }
+    with pytest.raises(DataCiteSchemaValidationError):
+        md_converter.convert_json_to_xml_file(tmp_path / "metadata.xml", validate=True)
+    assert filepath.read_text() == xml
+    assert [f.name for f in tmp_path.iterdir()] == ["metadata.xml"]
+
+
+def test_iter_xml_special_cases():
+    metadata = {
+        "resource": {
+            "att": {"lang": "de", "{http://other.org/ns}key": 'a"b\n<c>\t\r'},
+            "val": "text & more",
+            "children": [
+                {"empty": ""},
+                {"emptyList": []},
+                {"title": {"att": {"lang": "en"}, "val": "<T>", "tail": "tail & end"}},
+                {"{http://other.org/ns}foreign": [{"child": "x"}]},
+                {"{http://third.org/ns}foreign": {"tail": "t"}},
+            ],
+        }
+    }
+    md_converter = MetaDataToXMLConverter(metadata, typ="datacite4.4")
+    assert "".join(md_converter.iter_xml()) == md_converter.convert_json_to_xml()
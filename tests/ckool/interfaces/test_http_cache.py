@@ -0,0 +1,90 @@
+import io
+import sqlite3
+from contextlib import closing
+
+import requests
+
+from ckool import HTTP_CACHE_FILE_NAME
+from ckool.interfaces.http_cache import HttpCache
+from ckool.interfaces.mixed_requests import (
+    doi_exists,
+    get_citation_from_doi,
+    orcid_exists,
+    url_exists,
+)
+
+
+def _offline(monkeypatch):
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(url)
+        raise requests.exceptions.ConnectionError("offline")
+
+    monkeypatch.setattr("ckool.interfaces.http_cache.requests.get", get)
+    return calls
+
+
+def test_recorded_responses(http_cache, monkeypatch):
+    calls = _offline(monkeypatch)
+    assert get_citation_from_doi("10.25678/00039Z").startswith("Pomati, F.")
+    assert orcid_exists("0000-0002-1825-0097") == "Josiah Carberry"
+    assert not doi_exists("10.25678/NOTEXI")
+    assert calls == []
+
+
+def test_http_cache_ttls(tmp_path, monkeypatch):
+    cache = HttpCache(tmp_path / "http-cache.sqlite", ttls={"doi": 60}, negative_ttl=0)
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(url)
+        response = requests.Response()
+        response.status_code = 404 if "missing" in url else 200
+        response._content = b"content"
+        return response
+
+    monkeypatch.setattr("ckool.interfaces.http_cache.requests.get", get)
+    for _ in range(2):
+        assert cache.get("https://doi.org/10.1/found", "doi").text == "content"
+        assert cache.get("https://doi.org/10.1/missing", "doi").status_code == 404
+    assert calls == [
+        "https://doi.org/10.1/found",
+        "https://doi.org/10.1/missing",
+        "https://doi.org/10.1/missing",
+    ]
+
+    # the accept header is part of the key
+    cache.get("https://doi.org/10.1/found", "doi", headers={"Accept": "text/html"})
+    assert len(calls) == 4
+
+    cache.clear("doi")
+    cache.get("https://doi.org/10.1/found", "doi")
+    assert len(calls) == 5
+
+    disabled = HttpCache(None)
+    disabled.get("https://doi.org/10.1/found", "doi")
+    disabled.get("https://doi.org/10.1/found", "doi")
+    assert len(calls) == 7
+
+
+def test_http_cache_status_only(monkeypatch, user_cache_folder):
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(kwargs.get("stream"))
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(b"a large body")
+        return response
+
+    monkeypatch.setattr("ckool.interfaces.http_cache.requests.get", get)
+    assert url_exists("https://www.eawag.ch")
+    assert url_exists("https://www.eawag.ch")
+    assert calls == [True]
+
+    database = user_cache_folder / HTTP_CACHE_FILE_NAME
+    with closing(sqlite3.connect(database)) as connection:
+        assert connection.execute("SELECT content FROM responses").fetchall() == [
+            (b"",)
+        ]
@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from ckool.interfaces.mixed_requests import (
+    fix_publication_link,
+    get_citation_from_doi,
+    search_orcid_by_author,
+)
+from ckool.interfaces.prefetch import LookupPrefetcher, lookup
+from ckool.other.metadata_tools import prepare_metadata_for_publication_package
+from ckool.other.prompt import prompt_orcid
+
+
+def _slow(value):
+    time.sleep(0.2)
+    return value
+
+
+def test_lookup_prefetcher_runs_concurrently():
+    with LookupPrefetcher(workers=10) as prefetcher:
+        start = time.monotonic()
+        for i in range(10):
+            prefetcher.submit(_slow, i)
+        assert [lookup(prefetcher, _slow, i) for i in range(10)] == list(range(10))
+        assert time.monotonic() - start < 1
+
+        # not submitted, runs directly
+        assert prefetcher.result(_slow, 42) == 42
+        assert lookup(None, _slow, 43) == 43
+
+
+def test_lookup_prefetcher_raises_like_a_direct_call():
+    def fail(_):
+        raise ValueError("failed")
+
+    with LookupPrefetcher() as prefetcher:
+        prefetcher.submit(fail, 1)
+        with pytest.raises(ValueError):
+            prefetcher.result(fail, 1)
+
+
+def test_prepared_metadata_and_orcids_use_prefetched_results(monkeypatch):
+    monkeypatch.setattr("ckool.other.prompt.orcid_exists", lambda orcid: False)
+    doi = "10.25678/000011"
+    with LookupPrefetcher() as prefetcher:
+        prefetcher.submit(
+            fix_publication_link,
+            "https://doi.org/10.1000/paper",
+            runner=lambda _: {"paper_doi": "10.1000/paper"},
+        )
+        prefetcher.submit(get_citation_from_doi, doi, runner=lambda _: "dataset")
+        prefetcher.submit(
+            get_citation_from_doi, "10.1000/paper", runner=lambda _: "paper"
+        )
+        prefetcher.submit(
+            search_orcid_by_author,
+            "Doe, Jane",
+            runner=lambda _: [{"id": "0000-0002-1825-0097", "url": "url"}],
+        )
+
+        pkg = prepare_metadata_for_publication_package(
+            pkg={"publicationlink": "https://doi.org/10.1000/paper", "author": []},
+            doi=doi,
+            maintainer_record={"fullname": "Maintainer"},
+            usage_contact_record={"fullname": "Contact", "email": "c@example.org"},
+            prefetcher=prefetcher,
+        )
+        assert pkg["citation"] == "dataset"
+        assert pkg["citation_publication"] == "paper"
+
+        questions = []
+
+        def prompt_func(question, **kwargs):
+            questions.append(question)
+            return "cancel"
+
+        assert prompt_orcid("Doe, Jane", prompt_func, prefetcher) is None
+        assert "found you can check it here: url" in questions[0]
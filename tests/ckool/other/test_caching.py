@@ -1,4 +1,16 @@
-from ckool.other.caching import _write_cache, read_cache, update_cache
+import os
+
+import pytest
+
+from ckool import CORRUPT_CACHE_FILE_ENDING, TEMPORARY_WRITE_FILE_ENDING
+from ckool.other.caching import (
+    _write_cache,
+    read_cache,
+    read_cache_key,
+    recover_cache_directory,
+    update_cache,
+)
+from ckool.parallel_runner import map_function_with_processpool
 
 
 def test_write_cache(data_to_cache, cache_file):
@@ -18,3 +30,56 @@ def test_update_cache(data_to_cache, cache_file):
     data = read_cache(cache_file)
     assert data.get("hello") == "there"
     assert data.get("hash_type") is None
+
+
+def test_write_cache_is_atomic(data_to_cache, cache_file, monkeypatch):
+    _write_cache(data_to_cache, cache_file)
+
+    def interrupted(*args):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(os, "replace", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        update_cache({"hello": "there"}, cache_file)
+
+    assert read_cache(cache_file) == data_to_cache
+    assert list(cache_file.parent.iterdir()) == [cache_file]
+
+
+def test_recover_cache_directory(data_to_cache, tmp_path):
+    _write_cache(data_to_cache, valid := tmp_path / "valid.zip.json")
+    (truncated := tmp_path / "truncated.zip.json").write_text('{"file": "trunc')
+    (leftover := tmp_path / f".valid.zip.json.abc{TEMPORARY_WRITE_FILE_ENDING}").touch()
+    (data := tmp_path / "data.csv").write_text("not json")
+
+    assert recover_cache_directory(tmp_path) == [
+        tmp_path / ("truncated.zip.json" + CORRUPT_CACHE_FILE_ENDING)
+    ]
+    assert not truncated.exists()
+    assert not leftover.exists()
+    assert read_cache(valid) == data_to_cache
+    assert data.exists()
+
+
+def test_update_cache_database(data_to_cache, tmp_path):
+    cache_database = tmp_path / "cache.sqlite"
+    assert read_cache_key(cache_database, "hash") is None
+
+    update_cache(data_to_cache, cache_database)
+    assert read_cache(cache_database) == data_to_cache
+
+    update_cache({"hello": ["there"], "hash_type": None}, cache_database)
+    assert read_cache_key(cache_database, "hello") == ["there"]
+    assert read_cache_key(cache_database, "hash_type", "default") is None
+    assert read_cache_key(cache_database, "missing", "default") == "default"
+    assert read_cache(cache_database)["hash"] == data_to_cache["hash"]
+
+
+def test_update_cache_database_concurrent(tmp_path):
+    cache_database = tmp_path / "cache.sqlite"
+    map_function_with_processpool(
+        update_cache,
+        args=[({f"key-{i}": i}, cache_database) for i in range(50)],
+        workers=8,
+    )
+    assert read_cache(cache_database) == {f"key-{i}": i for i in range(50)}
@@ -1,15 +1,26 @@
+import os
+import zipfile
+
 import pytest
 from conftest import flatten_nested_structure
 
-from ckool import TEMPORARY_DIRECTORY_NAME
+from ckool import BUNDLE_ARCHIVE_NAME, TEMPORARY_DIRECTORY_NAME
 from ckool.other.file_management import (
+    bundle_index,
     find_archive,
     generate_archive_destination,
+    is_compressible,
     iter_files,
     iter_package,
+    manifest_file,
+    manifest_matches,
     match_via_include_exclude_patters,
+    remove_stale_archives,
+    split_into_parts,
     tar_files,
+    write_manifest,
     zip_files,
+    zip_files_parallel,
 )
 
 
@@ -243,3 +254,271 @@ def test_find_archive(tmp_path):
     (tmp_path / "abc.zip").touch()
     with pytest.raises(AssertionError):
         find_archive(tmp_path / "abc")
+
+
+def test_find_archive_with_parts(tmp_path):
+    (tmp_path / "abc.part001.zip").touch()
+    (tmp_path / "abc.part001.zip.json").touch()
+    (tmp_path / "abc.part002.zip").touch()
+    (tmp_path / "abcdef.zip").touch()
+
+    assert find_archive(tmp_path / "abc") is None
+    assert tmp_path / "abc.part002.zip" == find_archive(tmp_path / "abc.part002")
+
+
+def test_is_compressible(tmp_path):
+    (text := tmp_path / "text.csv").write_text("a,b,c\n1,2,3\n" * 1000)
+    (noise := tmp_path / "noise.bin").write_bytes(os.urandom(100_000))
+    (image := tmp_path / "image.jpg").write_text("a,b,c\n1,2,3\n" * 1000)
+    (empty := tmp_path / "empty.txt").touch()
+
+    assert is_compressible(text)
+    assert not is_compressible(noise)
+    assert not is_compressible(image)  # decided by suffix only
+    assert not is_compressible(empty)
+
+
+def test_zip_files_adaptive(tmp_path):
+    (folder := tmp_path / "folder").mkdir()
+    (text := folder / "text.csv").write_text("a,b,c\n1,2,3\n" * 1000)
+    (noise := folder / "noise.bin").write_bytes(os.urandom(100_000))
+
+    archive = zip_files(
+        tmp_path, tmp_path / "folder", [text, noise], progressbar=False, adaptive=True
+    )
+
+    with zipfile.ZipFile(archive) as _zip:
+        assert _zip.testzip() is None
+        types = {info.filename: info.compress_type for info in _zip.infolist()}
+    assert types == {
+        "folder/text.csv": zipfile.ZIP_DEFLATED,
+        "folder/noise.bin": zipfile.ZIP_STORED,
+    }
+
+
+def test_tar_files_adaptive(tmp_path):
+    (folder := tmp_path / "folder").mkdir()
+    (text := folder / "text.csv").write_text("a,b,c\n1,2,3\n" * 10)
+    (noise := folder / "noise.bin").write_bytes(os.urandom(100_000))
+
+    archive = tar_files(
+        tmp_path, tmp_path / "folder", [text, noise], progressbar=False, adaptive=True
+    )
+    assert archive.name == "folder.tar"
+
+    noise.unlink()
+    archive = tar_files(
+        tmp_path, tmp_path / "folder", [text], progressbar=False, adaptive=True
+    )
+    assert archive.name == "folder.tar.gz"
+
+
+@pytest.mark.parametrize("max_member_size", [256 * 1024**2, 1000])
+def test_zip_files_parallel(tmp_path, max_member_size):
+    (folder := tmp_path / "folder").mkdir()
+    (folder / "sub").mkdir()
+    files = []
+    for i in range(20):
+        (file := folder / ("sub" if i % 2 else "") / f"file_{i}.csv").write_text(
+            f"{i},a,b,c\n" * i * 100
+        )
+        files.append(file)
+    (noise := folder / "noise.bin").write_bytes(os.urandom(100_000))
+    files.append(noise)
+    (umlaut := folder / "ümlaut.txt").write_text("äöü" * 1000)
+    files.append(umlaut)
+
+    archive = zip_files_parallel(
+        tmp_path,
+        tmp_path / "folder",
+        files,
+        progressbar=False,
+        adaptive=True,
+        workers=4,
+        max_member_size=max_member_size,
+    )
+
+    with zipfile.ZipFile(archive) as _zip:
+        assert _zip.testzip() is None
+        assert _zip.namelist() == [f.relative_to(tmp_path).as_posix() for f in files]
+        for file in files:
+            assert _zip.read(file.relative_to(tmp_path).as_posix()) == file.read_bytes()
+        assert _zip.getinfo("folder/noise.bin").compress_type == zipfile.ZIP_STORED
+        assert (
+            _zip.getinfo("folder/sub/file_1.csv").compress_type == zipfile.ZIP_DEFLATED
+        )
+        parallel = [(i.filename, i.compress_type, i.CRC) for i in _zip.infolist()]
+
+    # same members as zip_files, without adaptive compression everything is stored
+    for adaptive in [True, False]:
+        with zipfile.ZipFile(
+            zip_files(
+                tmp_path, tmp_path / "sequential", files, False, adaptive=adaptive
+            )
+        ) as _zip:
+            sequential = [(i.filename, i.compress_type, i.CRC) for i in _zip.infolist()]
+        if adaptive:
+            assert sequential == parallel
+    archive = zip_files_parallel(
+        tmp_path,
+        tmp_path / "folder",
+        files,
+        progressbar=False,
+        workers=4,
+        max_member_size=max_member_size,
+    )
+    with zipfile.ZipFile(archive) as _zip:
+        assert _zip.testzip() is None
+        assert [
+            (i.filename, i.compress_type, i.CRC) for i in _zip.infolist()
+        ] == sequential
+
+
+def test_manifest_matches(tmp_path):
+    (folder := tmp_path / "folder").mkdir()
+    (file := folder / "text.txt").write_text("abc")
+    archive_destination = tmp_path / TEMPORARY_DIRECTORY_NAME / "folder"
+    archive_destination.parent.mkdir()
+
+    assert not manifest_matches(archive_destination, tmp_path, [file])
+
+    write_manifest(archive_destination, tmp_path, [file])
+    assert manifest_file(archive_destination).exists()
+    assert manifest_matches(archive_destination, tmp_path, [file])
+
+    (other := folder / "other.txt").write_text("def")
+    assert not manifest_matches(archive_destination, tmp_path, [file, other])
+
+    file.write_text("abcd")
+    assert not manifest_matches(archive_destination, tmp_path, [file])
+
+
+def test_iter_package_rebuilds_changed_archives(tmp_path, my_package_dir):
+    folder = my_package_dir / "test_folder1"
+    archive_destination = generate_archive_destination(folder, my_package_dir)
+    files = [folder / "text.txt"]
+    archive = zip_files(my_package_dir, archive_destination, files, progressbar=False)
+    (stats := archive.with_name(archive.name + ".json")).write_text("{}")
+    write_manifest(archive_destination, my_package_dir, files)
+
+    def info_for_folder():
+        for info in iter_package(my_package_dir, ignore_folders=False):
+            if info["file"] == archive or info["folder"].get("location") == folder:
+                return info
+
+    assert info_for_folder() == {"file": archive, "folder": {}}
+
+    (folder / "text.txt").write_text("changed")
+    info = info_for_folder()
+    assert info["file"] == ""
+    assert info["folder"]["files"] == files
+    assert not archive.exists()
+    assert not stats.exists()
+    assert not manifest_file(archive_destination).exists()
+
+
+def test_split_into_parts(tmp_path):
+    sizes = [50, 10, 40, 30, 20, 60, 200]
+    files = []
+    for i, size in enumerate(sizes):
+        (file := tmp_path / f"file_{i}").write_bytes(b"0" * size)
+        files.append(file)
+
+    parts = split_into_parts(files, 150)
+    assert sorted(f for part in parts for f in part) == sorted(files)
+    assert [files[6]] in parts  # larger than the maximum, on its own
+    for part in parts:
+        assert part == sorted(part, key=files.index)
+        if len(part) > 1:
+            assert sum(f.stat().st_size for f in part) <= 150
+
+    assert split_into_parts(files, 10_000) == [files]
+
+
+def test_iter_package_max_archive_size(tmp_path, my_package_dir):
+    folder = my_package_dir / "test_folder1"
+    for i in range(4):
+        (folder / f"data_{i}.bin").write_bytes(b"0" * 100)
+    tmp = my_package_dir / TEMPORARY_DIRECTORY_NAME
+
+    def folders(max_archive_size):
+        return [
+            info["folder"]
+            for info in iter_package(
+                my_package_dir,
+                ignore_folders=False,
+                exclude_pattern="test_folder2",
+                max_archive_size=max_archive_size,
+            )
+            if info["folder"]
+        ]
+
+    split = folders(250)
+    assert [f["archive_destination"] for f in split] == [
+        tmp / "test_folder1.part001",
+        tmp / "test_folder1.part002",
+    ]
+    assert sorted(f for part in split for f in part["files"]) == sorted(
+        folder.iterdir()
+    )
+
+    # archives of an earlier split are removed if the folder is not split anymore
+    for part in split:
+        zip_files(my_package_dir, part["archive_destination"], part["files"], False)
+        write_manifest(part["archive_destination"], my_package_dir, part["files"])
+    assert [f["archive_destination"] for f in folders(None)] == [tmp / "test_folder1"]
+    assert not list(tmp.glob("test_folder1.part*"))
+
+
+def test_remove_stale_archives(tmp_path):
+    (tmp := tmp_path / TEMPORARY_DIRECTORY_NAME).mkdir()
+    for name in [
+        "data.zip",
+        "data.zip.json",
+        "data.part001.zip",
+        "data.part002.tar.gz",
+        "data.v2.zip",
+        "data.v2.zip.json",
+        "data.v2.part001.zip",
+        "data_old.tar",
+    ]:
+        (tmp / name).write_text("")
+    write_manifest(tmp / "data.v2", tmp_path, [])
+
+    remove_stale_archives(tmp / "data", [tmp / "data.part001"])
+    assert sorted(f.name for f in tmp.iterdir()) == sorted(
+        [
+            "data.part001.zip",
+            "data.v2.zip",
+            "data.v2.zip.json",
+            "data.v2.part001.zip",
+            "data_old.tar",
+            manifest_file(tmp / "data.v2").name,
+        ]
+    )
+
+
+def test_iter_package_bundle_small_files(tmp_path, my_package_dir):
+    (large := my_package_dir / "large.csv").write_text("a" * 1000)
+    (my_package_dir / "small.csv").write_text("a" * 10)
+    small_files = sorted(
+        [my_package_dir / n for n in ["readme.md", "script.py", "small.csv"]]
+    )
+
+    results = list(
+        iter_package(my_package_dir, ignore_folders=True, bundle_small_files_below=100)
+    )
+    assert results[0] == {"file": large, "folder": {}}
+    assert len(results) == 2
+    bundle = results[1]["folder"]
+    assert bundle["bundle"]
+    assert bundle["root_folder"] == my_package_dir
+    assert sorted(bundle["files"]) == small_files
+    assert (
+        bundle["archive_destination"]
+        == my_package_dir / TEMPORARY_DIRECTORY_NAME / BUNDLE_ARCHIVE_NAME
+    )
+
+    assert bundle_index(my_package_dir, [my_package_dir / "small.csv"]) == (
+        "name,size\nsmall.csv,10\n"
+    )
@@ -0,0 +1,31 @@
+from ckool.other.journal import UploadJournal
+from ckool.other.types import UploadStates
+
+
+def test_upload_journal(tmp_path):
+    journal = UploadJournal(tmp_path, "my-package", "https://ckan.org")
+    assert journal.state("file.zip", "abc") is None
+
+    journal.record("file.zip", "abc", UploadStates.queued)
+    journal.record("file.zip", "abc", UploadStates.created)
+    journal.record("file.zip", "abc", UploadStates.uploaded)
+    journal.record("other.zip", "def", UploadStates.queued)
+    assert journal.state("file.zip", "abc") == UploadStates.uploaded
+    assert journal.state("file.zip", "changed-hash") is None
+
+    journal.record("file.zip", "abc", UploadStates.hash_patched, id="1234")
+    journal.record("file.zip", "abc", UploadStates.verified)
+    assert journal.last("file.zip", "abc")["id"] == "1234"
+    assert journal.state("file.zip", "abc") == UploadStates.verified
+
+    with journal.file.open("a") as f:  # interrupted while appending
+        f.write('{"name": "other.zip", "hash": "def", "sta')
+    assert journal.state("other.zip", "def") == UploadStates.queued
+    journal.record("other.zip", "def", UploadStates.uploaded)  # lands on its own line
+    assert journal.state("other.zip", "def") == UploadStates.uploaded
+    reopened = UploadJournal(tmp_path, "my-package", "https://ckan.org")
+    assert reopened.state("file.zip", "abc") == UploadStates.verified
+
+    other = UploadJournal(tmp_path, "my-package", "https://other.ckan.org")
+    assert other.file != journal.file
+    assert other.state("file.zip", "abc") is None
@@ -1,6 +1,13 @@
+import time
+
 import pytest
 
-from ckool.other.utilities import extract_resource_id_and_name, upload_via_api
+from ckool.other.utilities import (
+    TokenBucket,
+    extract_resource_id_and_name,
+    parse_size,
+    upload_via_api,
+)
 
 
 def test_upload_via_api():
@@ -28,3 +35,26 @@ def test_extract_resource_id():
         )
         == {'id': '', 'name': "abc0b6955ef-0d8a-4fed-a2b3-196185321d6d-scripts.zip"}
     )
+
+
+def test_parse_size():
+    assert parse_size(2048) == 2048
+    assert parse_size("2048") == 2048
+    assert parse_size("500MB") == 500 * 1000**2
+    assert parse_size("1.5 kb") == 1500
+    assert parse_size("2GiB") == 2 * 1024**3
+    assert parse_size("1t") == 1000**4
+    with pytest.raises(ValueError):
+        parse_size("a lot")
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=50, capacity=5)
+    start = time.monotonic()
+    for _ in range(15):
+        bucket.acquire()
+    # 5 tokens burst, the other 10 are refilled at 50/s
+    assert 0.15 < time.monotonic() - start < 1
+
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
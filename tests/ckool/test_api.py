@@ -1,12 +1,19 @@
 import json
+import pathlib
 import time
+import zipfile
 from unittest.mock import Mock
 
 import ckanapi
 import pytest
 from conftest import ckan_instance_names_of_fixtures
 
-from ckool import TEMPORARY_DIRECTORY_NAME, UPLOAD_IN_PROGRESS_STRING
+from ckool import (
+    BUNDLE_ARCHIVE_NAME,
+    BUNDLE_INDEX_FILE_NAME,
+    TEMPORARY_DIRECTORY_NAME,
+    UPLOAD_IN_PROGRESS_STRING,
+)
 from ckool.api import (
     _download_resource,
     _prepare_package,
@@ -412,6 +419,38 @@ def test_prepare_package(tmp_path, run_type, hash_type, compression_type, prepar
     [read_cache(f) for f in cache_files]
 
 
+@pytest.mark.parametrize("run_type", ["parallel", "sequential"])
+def test_prepare_package_bundle_small_files(tmp_path, run_type):
+    for i in range(10):
+        (tmp_path / f"small_{i}.csv").write_text(f"{i}")
+    (tmp_path / "large.csv").write_text("a" * 2000)
+
+    cache_files = _prepare_package(
+        tmp_path.as_posix(),
+        include_sub_folders=False,
+        include_pattern=None,
+        exclude_pattern=None,
+        compression_type=CompressionTypes.zip,
+        hash_algorithm=HashTypes.md5,
+        parallel=SWITCH.get(run_type),
+        ignore_prepared=False,
+        progressbar=False,
+        bundle_small_files_below="1KB",
+    )
+    assert sorted(pathlib.Path(read_cache(f)["file"]).name for f in cache_files) == [
+        f"{BUNDLE_ARCHIVE_NAME}.zip",
+        "large.csv",
+    ]
+
+    with zipfile.ZipFile(
+        tmp_path / TEMPORARY_DIRECTORY_NAME / f"{BUNDLE_ARCHIVE_NAME}.zip"
+    ) as _zip:
+        assert sorted(_zip.namelist()) == sorted(
+            [f"small_{i}.csv" for i in range(10)] + [BUNDLE_INDEX_FILE_NAME]
+        )
+        assert len(_zip.read(BUNDLE_INDEX_FILE_NAME).splitlines()) == 11
+
+
 @pytest.mark.impure
 @pytest.mark.parametrize("cki", ckan_instance_names_of_fixtures)
 def test_download_resource(
@@ -1,6 +1,7 @@
 import pathlib
 import time
 from copy import deepcopy
+from unittest.mock import Mock
 
 import ckanapi
 import pytest
@@ -9,6 +10,8 @@ from conftest import ckan_instance_names_of_fixtures
 from ckool import HASH_TYPE, UPLOAD_IN_PROGRESS_STRING
 from ckool.other.caching import read_cache
 from ckool.other.hashing import get_hash_func
+from ckool.other.journal import UploadJournal
+from ckool.other.types import UploadStates
 from ckool.templates import (
     get_upload_func,
     handle_file,
@@ -605,3 +608,79 @@ def test_handle_resource_download_with_integrity_check(
         assert dt_long > dt_short * 10
     else:
         assert abs(1 - dt_long / dt_short) < 0.25
+
+
+def test_wrapped_upload_journal(tmp_path):
+    (f := tmp_path / "file.txt").write_text("test")
+    meta = {"file": f.as_posix(), "hash": hasher(f), "size": 4}
+    journal = UploadJournal(tmp_path, "my-package", "https://ckan.org")
+    ckan_instance = Mock()
+    ckan_instance.resource_exists.return_value = False
+    ckan_instance.get_resource_meta.return_value = {"id": "1234", "hash": meta["hash"]}
+    ckan_instance.get_package.return_value = {"resources": [{"id": "1234"}]}
+
+    def upload_resource_file_via_api(*args, **kwargs):
+        pass
+
+    upload_func = Mock(wraps=upload_resource_file_via_api)
+    upload_func.__name__ = "upload_resource_file_via_api"
+
+    kwargs = {
+        "meta": meta,
+        "package_name": "my-package",
+        "ckan_instance": ckan_instance,
+        "cfg_other": {"ckan_storage_path": ""},
+        "cfg_ckan_api": {},
+        "cfg_secure_interface": {},
+        "upload_func": upload_func,
+        "progressbar": False,
+        "journal": journal,
+    }
+    assert wrapped_upload(**kwargs)["status"] == "normal"
+    assert journal.state("file.txt", meta["hash"]) == UploadStates.verified
+    assert upload_func.call_count == 1
+
+    ckan_instance.reset_mock()
+    assert wrapped_upload(**kwargs) == {
+        "id": "1234",
+        "name": "file.txt",
+        "status": "skipped",
+    }
+    assert upload_func.call_count == 1
+    assert [c[0] for c in ckan_instance.method_calls] == ["get_package"]
+
+    ckan_instance.get_package.return_value = {"resources": []}  # deleted on CKAN
+    assert wrapped_upload(**kwargs)["status"] == "normal"
+    assert upload_func.call_count == 2
+
+
+def test_wrapped_upload_journal_two_instances(tmp_path):
+    (f := tmp_path / "file.txt").write_text("test")
+    meta = {"file": f.as_posix(), "hash": hasher(f), "size": 4}
+
+    def upload_resource_file_via_api(*args, **kwargs):
+        pass
+
+    for server in ["https://ckan.org", "https://other.ckan.org"]:
+        ckan_instance = Mock()
+        ckan_instance.resource_exists.return_value = False
+        ckan_instance.get_resource_meta.return_value = {
+            "id": "1234",
+            "hash": meta["hash"],
+        }
+        upload_func = Mock(wraps=upload_resource_file_via_api)
+        upload_func.__name__ = "upload_resource_file_via_api"
+
+        result = wrapped_upload(
+            meta=meta,
+            package_name="my-package",
+            ckan_instance=ckan_instance,
+            cfg_other={"ckan_storage_path": ""},
+            cfg_ckan_api={"server": server},
+            cfg_secure_interface={},
+            upload_func=upload_func,
+            progressbar=False,
+            journal=UploadJournal(tmp_path, "my-package", server),
+        )
+        assert result["status"] == "normal"
+        assert upload_func.call_count == 1